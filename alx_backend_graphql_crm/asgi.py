@@ -2,6 +2,8 @@
 ASGI config for alx_backend_graphql_crm project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served with an ASGI server (e.g. ``uvicorn alx_backend_graphql_crm.asgi:application``),
+``/graphql/async`` executes queries with async resolvers and the async ORM.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'crm.metrics.GraphQLMetricsMiddleware',
+    'crm.slow_operations.SlowOperationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -126,5 +128,71 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # GraphQL Configuration
 GRAPHENE = {
-    'SCHEMA': 'alx_backend_graphql_crm.schema.schema'
-}
\ No newline at end of file
+    'SCHEMA': 'alx_backend_graphql.schema.schema'
+}
+
+# Static query cost, depth and page size limits (see crm/query_cost.py)
+GRAPHQL_QUERY_COST = {
+    'MAX_COST': 5000,
+    'MAX_DEPTH': 10,
+    'DEFAULT_PAGE_SIZE': 20,
+}
+
+# Persisted queries and parsed-document cache (see crm/persisted_queries.py)
+GRAPHQL_PERSISTED_QUERIES = {
+    'CACHE_SIZE': 1000,
+    'ALLOW_LIST': None,  # path to a {sha256: query} JSON manifest to only allow known documents
+}
+
+# Response cache for read queries (see crm/response_cache.py). In production
+# point CACHES at Redis, e.g. 'django.core.cache.backends.redis.RedisCache'.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+GRAPHQL_RESPONSE_CACHE = {
+    'ENABLED': False,
+    'TIMEOUT': 300,
+}
+
+# Per-operation histograms on /metrics (see crm/metrics.py)
+GRAPHQL_METRICS = {
+    'ENABLED': False,
+    'MAX_OPERATIONS': 50,
+}
+
+# Log of slow GraphQL requests with their SQL and plans (see
+# crm/slow_operations.py); summarize with manage.py slow_operations
+GRAPHQL_SLOW_OPERATIONS = {
+    'ENABLED': False,
+    'THRESHOLD_MS': 1000,
+    'LOG_FILE': '/tmp/crm_slow_operations.jsonl',
+}
+
+# Client used by cron jobs and Celery tasks (see crm/graphql_client.py).
+# 'local' runs operations in-process; 'remote' posts them to URL.
+CRM_GRAPHQL_CLIENT = {
+    'MODE': 'local',
+    'URL': 'http://localhost:8000/graphql',
+}
+
+# Celery (see crm/celery.py)
+CELERY_BROKER_URL = 'redis://localhost:6379/0'
+CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_TIMEZONE = 'UTC'
+
+# Reminder emails stay in memory (django.core.mail.outbox) until an SMTP
+# backend is configured here.
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# Order reminders (see crm/reminders.py)
+CRM_ORDER_REMINDERS = {
+    'WINDOW_DAYS': 7,
+    'CHUNK_SIZE': 50,
+    'RATE_LIMIT': '60/m',
+}
@@ -2,10 +2,15 @@
 
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
+from crm.metrics import metrics_view
+from crm.views import AsyncCRMGraphQLView, CRMGraphQLView, export_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('graphql', csrf_exempt(GraphQLView.as_view(graphiql=True))),
-]
\ No newline at end of file
+    path('graphql', csrf_exempt(CRMGraphQLView.as_view(graphiql=True))),
+    # Async resolvers; serve from alx_backend_graphql_crm.asgi
+    path('graphql/async', csrf_exempt(AsyncCRMGraphQLView.as_view(graphiql=True))),
+    path('export/<str:kind>', export_view, name='crm-export'),
+    path('metrics', metrics_view, name='crm-metrics'),
+]
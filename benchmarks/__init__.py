@@ -0,0 +1,89 @@
+"""
+Benchmarks for the CRM GraphQL API.
+
+Each module is runnable with ``python -m benchmarks.<name>`` from the project
+root. They run against a throwaway test database, never ``db.sqlite3``.
+"""
+
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alx_backend_graphql_crm.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create the test database for the duration of the block."""
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from django.test.runner import DiscoverRunner
+
+    setup_test_environment()
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        yield
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+def measure(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times and return the median wall time in ms."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def bulk_seed(customers=1000, products=100, orders=10000, products_per_order=2):
+    """Bulk insert a synthetic dataset with one order per minute of history."""
+    from datetime import datetime, timedelta, timezone
+    from decimal import Decimal
+
+    from crm.bulk import explicit_dates
+    from crm.models import Customer, Order, Product
+    from crm.rollups import rebuild_rollups
+
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    Customer.objects.bulk_create(
+        [Customer(name=f"Customer {i}", email=f"customer{i}@example.com") for i in range(customers)],
+        batch_size=1000,
+    )
+    Product.objects.bulk_create(
+        [Product(name=f"Product {i}", price=Decimal('10.00'), stock=i % 50) for i in range(products)],
+        batch_size=1000,
+    )
+    customer_ids = list(Customer.objects.values_list('id', flat=True))
+    product_ids = list(Product.objects.values_list('id', flat=True))
+    with explicit_dates(Order._meta.get_field('order_date')):
+        Order.objects.bulk_create(
+            [
+                Order(
+                    customer_id=customer_ids[i % customers],
+                    total_amount=Decimal('10.00') * products_per_order,
+                    order_date=start + timedelta(minutes=i),
+                )
+                for i in range(orders)
+            ],
+            batch_size=1000,
+        )
+    order_ids = list(Order.objects.order_by('id').values_list('id', flat=True))
+    Through = Order.products.through
+    Through.objects.bulk_create(
+        [
+            Through(order_id=order_id, product_id=product_ids[(i + j) % products])
+            for i, order_id in enumerate(order_ids)
+            for j in range(products_per_order)
+        ],
+        batch_size=1000,
+    )
+    # bulk_create bypasses the incremental rollup maintenance
+    rebuild_rollups()
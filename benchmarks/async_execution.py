@@ -0,0 +1,153 @@
+"""
+Requests/sec of the GraphQL endpoint under WSGI and ASGI at high concurrency.
+
+    python -m benchmarks.async_execution --clients 500 --requests 5000 --db-latency 2
+
+Drives Django's WSGI and ASGI handlers in-process with ``--clients``
+concurrent clients posting an orders page:
+
+* WSGI, ``/graphql`` on a pool of ``--wsgi-threads`` threads (a threaded
+  WSGI server);
+* ASGI, ``/graphql``: the sync view, which Django runs in a thread per request;
+* ASGI, ``/graphql/async``: async resolvers on the async ORM.
+
+An in-memory SQLite answers in microseconds, which hides what the async path
+saves. ``--db-latency`` sleeps that many milliseconds in every statement to
+model the round trip to a database server.
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from benchmarks import bulk_seed, setup_django, test_database
+
+QUERY = """
+    query {
+        allOrders(first: 20) {
+            edges { node { id totalAmount
+                customer { email }
+                products { edges { node { name price } } } } }
+        }
+    }
+"""
+BODY = json.dumps({'query': QUERY}).encode()
+
+
+def add_latency(seconds):
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+    connection.ensure_connection()
+    connection.execute_wrappers.append(delay)
+
+
+def run_wsgi(handler, path, requests, threads):
+    def request():
+        environ = {
+            'REQUEST_METHOD': 'POST', 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+            'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(BODY)),
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(BODY), 'wsgi.errors': BytesIO(),
+        }
+        status = []
+        start = time.perf_counter()
+        b''.join(handler(environ, lambda s, headers: status.append(s)))
+        assert status[0].startswith('200'), status
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(lambda _: request(), range(requests)))
+
+
+async def run_asgi(application, path, requests, clients):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'POST', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'root_path': '', 'query_string': b'', 'client': ('127.0.0.1', 40000),
+        'server': ('testserver', 80),
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(BODY)).encode())],
+    }
+    remaining = iter(range(requests))
+    timings = []
+
+    async def request():
+        sent = []
+        body = [{'type': 'http.request', 'body': BODY, 'more_body': False}]
+
+        async def receive():
+            if body:
+                return body.pop()
+            # No disconnect; Django cancels this once the response is sent
+            await asyncio.Future()
+
+        async def send(message):
+            sent.append(message)
+
+        start = time.perf_counter()
+        await application(dict(scope), receive, send)
+        assert sent[0]['status'] == 200, sent
+        timings.append(time.perf_counter() - start)
+
+    async def client():
+        for _ in remaining:
+            await request()
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return timings
+
+
+def report(label, timings, elapsed):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<24} {len(timings) / elapsed:>8.0f} "
+          f"{statistics.median(timings) * 1000:>8.1f} {p95 * 1000:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--wsgi-threads', type=int, default=32)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--db-latency', type=float, default=0, help="Milliseconds added to every statement")
+    options = parser.parse_args()
+
+    setup_django()
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+
+    wsgi = get_wsgi_application()
+    asgi = get_asgi_application()
+
+    with test_database():
+        bulk_seed(customers=1000, orders=options.orders)
+        if options.db_latency:
+            add_latency(options.db_latency / 1000)
+
+        print(f"{'server':<24} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        start = time.perf_counter()
+        timings = run_wsgi(wsgi, '/graphql', options.requests, options.wsgi_threads)
+        report(f"WSGI ({options.wsgi_threads} threads)", timings, time.perf_counter() - start)
+
+        for label, path in (('ASGI, sync view', '/graphql'), ('ASGI, async view', '/graphql/async')):
+            start = time.perf_counter()
+            timings = asyncio.run(run_asgi(asgi, path, options.requests, options.clients))
+            report(label, timings, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
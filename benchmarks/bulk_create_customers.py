@@ -0,0 +1,115 @@
+"""
+Throughput of the ``bulkCreateCustomers`` mutation in rows per second.
+
+    python -m benchmarks.bulk_create_customers --rows 10000
+
+Half of each import collides with customers that already exist, so the
+duplicate check is exercised as well as the insert path. The same import is
+run through the per-row implementation the batched mutation replaced (an
+``exists()`` check and ``save()`` per row) and through the current one, each
+starting from the same customers.
+"""
+
+import argparse
+import time
+
+from benchmarks import setup_django, test_database
+
+MUTATION = """
+    mutation ($input: [CustomerInput]!) {
+        bulkCreateCustomers(input: $input) { customers { id } errors }
+    }
+"""
+
+
+def baseline_schema():
+    """The schema with the per-row ``bulkCreateCustomers`` it used to have."""
+    import graphene
+    from django.core.exceptions import ValidationError
+
+    from crm.models import Customer
+    from crm.schema import CustomerInput, CustomerType, Query
+    from crm.validators import is_valid_phone, validate_email
+
+    class BulkCreateCustomers(graphene.Mutation):
+        class Arguments:
+            input = graphene.List(CustomerInput, required=True)
+
+        customers = graphene.List(CustomerType)
+        errors = graphene.List(graphene.String)
+
+        def mutate(self, info, input):
+            customers = []
+            errors = []
+            for idx, customer_input in enumerate(input):
+                try:
+                    validate_email(customer_input.email)
+                    if Customer.objects.filter(email=customer_input.email).exists():
+                        errors.append(f"Row {idx + 1}: Email {customer_input.email} already exists")
+                        continue
+                    if customer_input.phone and not is_valid_phone(customer_input.phone):
+                        errors.append(f"Row {idx + 1}: Invalid phone format for {customer_input.email}")
+                        continue
+                    customer = Customer(
+                        name=customer_input.name,
+                        email=customer_input.email,
+                        phone=customer_input.phone if customer_input.phone else None
+                    )
+                    customer.save()
+                    customers.append(customer)
+                except ValidationError as e:
+                    errors.append(f"Row {idx + 1}: {e.messages[0]}")
+            return BulkCreateCustomers(customers=customers, errors=errors)
+
+    class Mutation(graphene.ObjectType):
+        bulk_create_customers = BulkCreateCustomers.Field()
+
+    return graphene.Schema(query=Query, mutation=Mutation)
+
+
+def run(schema, rows, existing):
+    """Import ``rows`` over ``existing`` customers; return (created, rejected, seconds)."""
+    from django.test import RequestFactory
+
+    from crm.models import Customer
+
+    Customer.objects.all().delete()
+    Customer.objects.bulk_create(
+        [Customer(name=f"Existing {i}", email=f"customer{i}@example.com") for i in range(existing)]
+    )
+    start = time.perf_counter()
+    result = schema.execute(
+        MUTATION,
+        variable_values={'input': rows},
+        context_value=RequestFactory().post('/graphql'),
+    )
+    elapsed = time.perf_counter() - start
+    assert not result.errors, result.errors
+    data = result.data['bulkCreateCustomers']
+    return len(data['customers']), len(data['errors']), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    options = parser.parse_args()
+
+    setup_django()
+    from alx_backend_graphql.schema import schema
+
+    rows = [
+        {'name': f"Customer {i}", 'email': f"customer{i}@example.com", 'phone': '123-456-7890'}
+        for i in range(options.rows)
+    ]
+    print(f"{'implementation':<32} {'created':>8} {'rejected':>9} {'seconds':>8} {'rows/sec':>9}")
+    with test_database():
+        for name, implementation in [
+            ("Per-row exists() + save()", baseline_schema()),
+            ("Batched bulk_create", schema),
+        ]:
+            created, rejected, elapsed = run(implementation, rows, options.rows // 2)
+            print(f"{name:<32} {created:>8} {rejected:>9} {elapsed:>8.2f} {options.rows / elapsed:>9,.0f}")
+
+
+if __name__ == '__main__':
+    main()
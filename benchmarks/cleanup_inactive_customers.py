@@ -0,0 +1,57 @@
+"""
+Customers per second deleted by ``cleanup_inactive_customers``, by batch size.
+
+    python -m benchmarks.cleanup_inactive_customers --customers 20000 --batch-sizes 100,1000,10000
+
+Every customer gets orders from 2020, so all of them are inactive. Also
+reports the longest single batch, which bounds how long the order tables
+stay locked. The last row is one ``QuerySet.delete()`` of the whole set,
+as the old cleanup script did.
+"""
+
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks import bulk_seed, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--orders-per-customer', type=int, default=5)
+    parser.add_argument('--batch-sizes', default='100,1000,10000', help="Comma-separated batch sizes")
+    options = parser.parse_args()
+
+    setup_django()
+    from django.utils import timezone
+
+    from crm.cleanup import delete_inactive_customers, inactive_customers
+    from crm.models import Customer
+
+    print(f"{'batch':>6} {'customers/s':>12} {'longest batch ms':>17}")
+    for batch_size in (int(size) for size in options.batch_sizes.split(',')):
+        with test_database():
+            bulk_seed(customers=options.customers, orders=options.customers * options.orders_per_customer)
+            Customer.objects.update(created_at='2020-01-01T00:00:00+00:00')
+            longest = 0
+            previous = time.perf_counter()
+            progress = None
+            for progress in delete_inactive_customers(timezone.now() - timedelta(days=365), batch_size):
+                now = time.perf_counter()
+                longest = max(longest, now - previous)
+                previous = now
+            assert progress['customers'] == options.customers and not Customer.objects.exists()
+            print(f"{batch_size:>6} {progress['customers_per_second']:>12.0f} {longest * 1000:>17.1f}")
+
+    with test_database():
+        bulk_seed(customers=options.customers, orders=options.customers * options.orders_per_customer)
+        Customer.objects.update(created_at='2020-01-01T00:00:00+00:00')
+        start = time.perf_counter()
+        inactive_customers(timezone.now() - timedelta(days=365)).delete()
+        elapsed = time.perf_counter() - start
+        print(f"{'single':>6} {options.customers / elapsed:>12.0f} {elapsed * 1000:>17.1f}")
+
+
+if __name__ == '__main__':
+    main()
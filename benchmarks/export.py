@@ -0,0 +1,43 @@
+"""
+Throughput and peak memory of ``stream_export`` as the export grows.
+
+    python -m benchmarks.export --orders 1000,100000
+
+Peak memory is measured with tracemalloc while the stream is consumed and
+discarded; it should stay flat as the number of orders grows.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from benchmarks import bulk_seed, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', default='1000,100000', help="Comma-separated dataset sizes")
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    options = parser.parse_args()
+
+    setup_django()
+    from crm.export import stream_export
+
+    print(f"{'orders':>8} {'format':>13} {'rows/s':>10} {'peak MiB':>9}")
+    for size in (int(size) for size in options.orders.split(',')):
+        with test_database():
+            bulk_seed(customers=1000, orders=size)
+            for fmt, compress in (('ndjson', False), ('csv', False), ('ndjson', True)):
+                tracemalloc.start()
+                start = time.perf_counter()
+                for _ in stream_export('orders', fmt=fmt, chunk_size=options.chunk_size, compress=compress):
+                    pass
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                label = fmt + (' gzip' if compress else '')
+                print(f"{size:>8} {label:>13} {size / elapsed:>10.0f} {peak / 2 ** 20:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
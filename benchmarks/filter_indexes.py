@@ -0,0 +1,75 @@
+"""
+Latency of filtered connections with and without the filter indexes.
+
+    python -m benchmarks.filter_indexes --orders 100000
+
+Each query is timed once with the indexes from migrations 0002/0003 in place
+and once after dropping them, on the same data.
+"""
+
+import argparse
+
+from benchmarks import bulk_seed, measure, setup_django, test_database
+
+QUERIES = {
+    'orders by date range': """
+        query { allOrders(first: 20, keyset: true, orderDate_Gte: "2020-02-01T00:00:00Z",
+                          orderDate_Lte: "2020-02-02T00:00:00Z") { edges { node { id } } } }
+    """,
+    'products in stock range': """
+        query { allProducts(first: 20, stock_Lte: 2) { edges { node { id } } } }
+    """,
+    'products by price': """
+        query { allProducts(first: 20, price_Gte: 995) { edges { node { id } } } }
+    """,
+    'customers since': """
+        query { allCustomers(first: 20, keyset: true, createdAt_Gte: "2100-01-01T00:00:00Z") { edges { node { id } } } }
+    """,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--customers', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+
+    setup_django()
+    from decimal import Decimal
+
+    from django.db import connection
+    from django.test import RequestFactory
+
+    from alx_backend_graphql.schema import schema
+    from crm.models import Customer, Order, Product
+
+    def run(query):
+        result = schema.execute(query, context_value=RequestFactory().post('/graphql'))
+        assert not result.errors, result.errors
+
+    with test_database():
+        bulk_seed(customers=options.customers, products=options.products,
+                  orders=options.orders, products_per_order=1)
+        # A handful of expensive products, so the price filter is selective
+        expensive = list(Product.objects.order_by('-pk').values_list('pk', flat=True)[:20])
+        Product.objects.filter(pk__in=expensive).update(price=Decimal('999.00'))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        indexed = {name: measure(lambda: run(query), options.repeat) for name, query in QUERIES.items()}
+        with connection.schema_editor() as editor:
+            for model in (Customer, Product, Order):
+                for index in model._meta.indexes:
+                    editor.remove_index(model, index)
+        unindexed = {name: measure(lambda: run(query), options.repeat) for name, query in QUERIES.items()}
+
+        print(f"{options.orders} orders, {options.customers} customers, {options.products} products")
+        print(f"{'query':<26} {'no index ms':>12} {'indexed ms':>11}")
+        for name in QUERIES:
+            print(f"{name:<26} {unindexed[name]:>12.2f} {indexed[name]:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
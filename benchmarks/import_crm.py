@@ -0,0 +1,66 @@
+"""
+Rows per second of ``import_crm`` by kind and batch size.
+
+    python -m benchmarks.import_crm --rows 50000 --batch-sizes 1,100,1000
+
+A customers, a products and an orders file of ``--rows`` rows each are
+written as CSV, then imported into an empty database once per batch size.
+Batch size 1 behaves like a loop of per-row inserts.
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from benchmarks import setup_django, test_database
+
+
+def write_files(directory, rows):
+    paths = {}
+    specs = {
+        'customers': (['name', 'email', 'phone'], lambda i: [f"Customer {i}", f"customer{i}@example.com", '123-456-7890']),
+        'products': (['name', 'price', 'stock'], lambda i: [f"Product {i}", f"{i % 100 + 1}.00", i % 50]),
+        'orders': (['customer_email', 'product_ids', 'order_date'], lambda i: [
+            f"customer{i}@example.com", f"{i % 100 + 1};{(i + 7) % 100 + 1}", f"2024-01-01T00:00:{i % 60:02d}+00:00",
+        ]),
+    }
+    for kind, (headers, row) in specs.items():
+        paths[kind] = os.path.join(directory, f'{kind}.csv')
+        with open(paths[kind], 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(headers)
+            writer.writerows(row(i) for i in range(rows))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--batch-sizes', default='1,100,1000', help="Comma-separated batch sizes")
+    options = parser.parse_args()
+
+    setup_django()
+    from crm.importer import get_checkpoint, open_text, read_rows, run_import
+    from crm.models import Customer, ImportCheckpoint, Order, Product
+
+    print(f"{'batch':>6} {'kind':>10} {'rows/s':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_files(directory, options.rows)
+        for batch_size in (int(size) for size in options.batch_sizes.split(',')):
+            with test_database():
+                for kind in ('customers', 'products', 'orders'):
+                    start = time.perf_counter()
+                    with open_text(paths[kind]) as stream:
+                        for _ in run_import(kind, read_rows(stream, 'csv'), get_checkpoint(kind, paths[kind]), batch_size):
+                            pass
+                    elapsed = time.perf_counter() - start
+                    print(f"{batch_size:>6} {kind:>10} {options.rows / elapsed:>10.0f}")
+                assert Customer.objects.count() == Order.objects.count() == options.rows
+                assert Product.objects.count() == options.rows
+                ImportCheckpoint.objects.all().delete()
+
+
+if __name__ == '__main__':
+    main()
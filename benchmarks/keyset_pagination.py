@@ -0,0 +1,75 @@
+"""
+Page latency of ``allOrders`` with offset cursors versus keyset cursors.
+
+    python -m benchmarks.keyset_pagination --orders 100000 --page-size 10
+
+Offset pages get slower the deeper they are, because the database has to walk
+every earlier row; keyset pages stay flat because each one is an index range
+scan starting right after the previous cursor.
+"""
+
+import argparse
+
+from benchmarks import bulk_seed, measure, setup_django, test_database
+
+QUERY = """
+    query ($first: Int, $after: String, $keyset: Boolean) {
+        allOrders(first: $first, after: $after, keyset: $keyset) {
+            edges { node { id totalAmount orderDate } }
+        }
+    }
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--pages', default='1,100,1000,10000',
+                        help="Comma-separated page numbers to time")
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+
+    setup_django()
+    from django.test import RequestFactory
+    from graphql_relay import offset_to_cursor
+
+    from alx_backend_graphql.schema import schema
+    from crm.models import Order
+    from crm.pagination import encode_cursor
+
+    keyset_fields = ('order_date', 'id')
+    pages = [int(page) for page in options.pages.split(',')]
+
+    with test_database():
+        bulk_seed(customers=1000, orders=options.orders)
+        print(f"{options.orders} orders, page size {options.page_size}")
+        print(f"{'page':>8} {'offset ms':>12} {'keyset ms':>12}")
+
+        for page in pages:
+            position = (page - 1) * options.page_size - 1
+            if position >= options.orders:
+                print(f"{page:>8} {'(past end)':>12}")
+                continue
+            offset_after = offset_to_cursor(position) if position >= 0 else None
+            keyset_after = None
+            if position >= 0:
+                previous = Order.objects.order_by(*keyset_fields)[position]
+                keyset_after = encode_cursor(previous, keyset_fields)
+
+            def run(after, keyset):
+                result = schema.execute(
+                    QUERY,
+                    variable_values={'first': options.page_size, 'after': after, 'keyset': keyset},
+                    context_value=RequestFactory().post('/graphql'),
+                )
+                assert not result.errors, result.errors
+                assert len(result.data['allOrders']['edges']) == options.page_size
+
+            offset_ms = measure(lambda: run(offset_after, False), options.repeat)
+            keyset_ms = measure(lambda: run(keyset_after, True), options.repeat)
+            print(f"{page:>8} {offset_ms:>12.2f} {keyset_ms:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+"""
+Throughput, tail latency and SQL per request of the GraphQL endpoint under a mix of real operations.
+
+    python -m benchmarks.load --requests 2000 --concurrency 8 --json results.json
+    python -m benchmarks.load --mix OrdersPage=3,Heartbeat=1 --server asgi --path /graphql/async
+    python -m benchmarks.load --compare results.json
+
+Drives Django's WSGI handler (on ``--concurrency`` threads, like a threaded
+WSGI server) or ASGI application (``--concurrency`` concurrent clients)
+in-process, with no network. Each request is drawn from ``--mix``, weighted
+operation names from ``OPERATIONS``: the documents the cron jobs, the
+Celery tasks, the reminder job and API clients send. The draw is seeded, so
+two runs send the same sequence.
+
+Reports requests/s, p50/p95/p99 latency and SQL queries per request, overall
+and per operation (an operation's requests/s is its share of the run's). SQL is counted by ``crm.metrics``, which is enabled for
+the run. The test database is a SQLite file, so concurrent writers wait for
+each other rather than fail as they would on a shared in-memory database. ``--json`` writes the results together with the commit and options,
+and ``--compare`` prints the change against such a file.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+from benchmarks import bulk_seed, setup_django, test_database
+from benchmarks.async_execution import add_latency
+
+SEED_START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def recent_orders_variables(i, options):
+    # bulk_seed places one order per minute; ask for the last ~500
+    since = SEED_START + timedelta(minutes=max(options.orders - 500, 0))
+    return {'since': since.isoformat(), 'first': 100}
+
+
+# name -> (document, default weight, variables for the i-th request)
+OPERATIONS = {
+    # crm.cron.log_crm_heartbeat
+    'Heartbeat': ("query Heartbeat { hello }", 5, None),
+    # crm.tasks.generate_crm_report
+    'Report': ("query Report { crmStats { totalCustomers totalOrders totalRevenue } }", 5, None),
+    # crm.reminders.recent_orders (first page)
+    'RecentOrders': ("""
+        query RecentOrders($since: DateTime!, $first: Int!, $after: String) {
+            allOrders(keyset: true, orderDate_Gte: $since, first: $first, after: $after) {
+                pageInfo { hasNextPage endCursor }
+                edges { node { id orderDate customer { name email } } }
+            }
+        }
+    """, 10, recent_orders_variables),
+    # crm.cron.update_low_stock
+    'UpdateLowStock': ("""
+        mutation UpdateLowStock { updateLowStockProducts { products { id name stock } message } }
+    """, 1, None),
+    'OrdersPage': ("""
+        query OrdersPage {
+            allOrders(first: 20) {
+                edges { node { id totalAmount
+                    customer { email }
+                    products { edges { node { name price } } } } }
+            }
+        }
+    """, 30, None),
+    'CustomersPage': ("""
+        query CustomersPage {
+            allCustomers(keyset: true, first: 20) {
+                edges { node { id name email orders { edges { node { totalAmount orderDate } } } } }
+            }
+        }
+    """, 20, None),
+    'ProductSearch': ("""
+        query ProductSearch($term: String!) {
+            allProducts(search: $term, first: 20) { edges { node { id name price stock } } }
+        }
+    """, 20, lambda i, options: {'term': f"Product {i % 100}"}),
+    'CreateCustomer': ("""
+        mutation CreateCustomer($input: CustomerInput!) {
+            createCustomer(input: $input) { customer { id } message }
+        }
+    """, 4, lambda i, options: {'input': {'name': f"Load {i}", 'email': f"load{i}@example.com"}}),
+    'CreateOrder': ("""
+        mutation CreateOrder($input: OrderInput!) {
+            createOrder(input: $input) { order { id totalAmount products { edges { node { name } } } } }
+        }
+    """, 5, lambda i, options: {'input': {
+        'customerId': i % options.customers + 1,
+        'productIds': [(i + j) % options.products + 1 for j in range(3)],
+    }}),
+}
+
+
+def parse_mix(value):
+    if not value:
+        return {name: weight for name, (_, weight, _) in OPERATIONS.items()}
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def plan(options):
+    """The ``(operation, body)`` of every request, drawn from the mix with ``--seed``."""
+    rng = random.Random(options.seed)
+    names = list(options.mix)
+    weights = [options.mix[name] for name in names]
+    requests = []
+    for i, name in enumerate(rng.choices(names, weights, k=options.warmup + options.requests)):
+        document, _, variables = OPERATIONS[name]
+        body = {'query': document, 'operationName': name}
+        if variables is not None:
+            body['variables'] = variables(i, options)
+        requests.append((name, json.dumps(body).encode()))
+    return requests[:options.warmup], requests[options.warmup:]
+
+
+def check(status, content):
+    """``None`` for a 200 without GraphQL errors, else the first error message."""
+    body = json.loads(content)
+    if status == 200 and 'errors' not in body:
+        return None
+    return body['errors'][0]['message'] if body.get('errors') else f"HTTP {status}"
+
+
+def run_wsgi(handler, path, requests, concurrency):
+    def request(item):
+        name, body = item
+        environ = {
+            'REQUEST_METHOD': 'POST', 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+            'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(body)),
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body), 'wsgi.errors': BytesIO(),
+        }
+        status = []
+        start = time.perf_counter()
+        content = b''.join(handler(environ, lambda s, headers: status.append(s)))
+        elapsed = time.perf_counter() - start
+        return name, elapsed, check(int(status[0].split()[0]), content)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(request, requests))
+
+
+async def run_asgi(application, path, requests, concurrency):
+    pending = iter(requests)
+    results = []
+
+    async def request(name, body):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'POST', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'root_path': '', 'query_string': b'', 'client': ('127.0.0.1', 40000),
+            'server': ('testserver', 80),
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())],
+        }
+        sent = []
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # No disconnect; Django cancels this once the response is sent
+            await asyncio.Future()
+
+        async def send(message):
+            sent.append(message)
+
+        start = time.perf_counter()
+        await application(scope, receive, send)
+        elapsed = time.perf_counter() - start
+        content = b''.join(message.get('body', b'') for message in sent[1:])
+        results.append((name, elapsed, check(sent[0]['status'], content)))
+
+    async def client():
+        for name, body in pending:
+            await request(name, body)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return results
+
+
+def summarize(results, elapsed, sql):
+    """
+    Requests/s, latency percentiles in ms and SQL per request of ``results``
+    (``(operation, seconds, error)``); ``sql`` is ``(queries, requests)``.
+    """
+    timings = sorted(seconds for _, seconds, _ in results)
+    errors = [error for _, _, error in results if error is not None]
+    if len(timings) > 1:
+        percentiles = statistics.quantiles(timings, n=100, method='inclusive')
+    else:
+        percentiles = timings * 99
+    return {
+        'requests': len(timings),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'rps': round(len(timings) / elapsed, 1),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 2),
+        'p50_ms': round(percentiles[49] * 1000, 2),
+        'p95_ms': round(percentiles[94] * 1000, 2),
+        'p99_ms': round(percentiles[98] * 1000, 2),
+        'sql_per_request': round(sql[0] / sql[1], 2) if sql[1] else None,
+    }
+
+
+def sql_counts(registry):
+    """``operation -> (queries, requests)`` recorded by ``crm.metrics``."""
+    return {
+        labels[0]: (total, count) for labels, (_, count, total) in registry.sql_queries._series.items()
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    columns = ['requests', 'errors', 'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'sql_per_request']
+    print(f"{'operation':<16} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'SQL/req':>8}")
+    rows = [('total', results['total'])] + sorted(results['operations'].items())
+    for name, stats in rows:
+        print(f"{name:<16} " + ' '.join(
+            f"{'-' if stats[column] is None else stats[column]:>{6 if column == 'errors' else 8}}" for column in columns
+        ))
+        previous = baseline and (baseline['total'] if name == 'total' else baseline['operations'].get(name))
+        if previous:
+            changes = []
+            for column in ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'sql_per_request'):
+                if previous[column] and stats[column] is not None:
+                    changes.append(f"{column} {(stats[column] - previous[column]) / previous[column] * 100:+.1f}%")
+            print(f"{'':<16}   vs baseline: {', '.join(changes)}")
+    for name, stats in rows[1:]:
+        if stats['errors']:
+            print(f"{name}: {stats['errors']} error(s), first: {stats['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100, help="Requests sent before measuring.")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+    parser.add_argument('--path', default='/graphql')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(''),
+                        help="Weighted operations, e.g. OrdersPage=3,Heartbeat=1; default: every operation.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--db-latency', type=float, default=0, help="Milliseconds added to every statement")
+    parser.add_argument('--json', help="Write the results to this file.")
+    parser.add_argument('--compare', help="A --json file to compare against.")
+    options = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    settings.GRAPHQL_METRICS = {'ENABLED': True}
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+
+    from crm.metrics import registry
+
+    handler = get_wsgi_application() if options.server == 'wsgi' else get_asgi_application()
+    warmup, requests = plan(options)
+
+    # In-memory SQLite locks whole tables between connections, which fails
+    # concurrent writes instead of making them wait
+    with tempfile.TemporaryDirectory() as directory:
+        settings.DATABASES['default']['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        with test_database():
+            bulk_seed(customers=options.customers, products=options.products, orders=options.orders)
+            if options.db_latency:
+                add_latency(options.db_latency / 1000)
+
+            def run(requests):
+                if options.server == 'wsgi':
+                    return run_wsgi(handler, options.path, requests, options.concurrency)
+                return asyncio.run(run_asgi(handler, options.path, requests, options.concurrency))
+
+            run(warmup)
+            registry.clear()
+            start = time.perf_counter()
+            results = run(requests)
+            elapsed = time.perf_counter() - start
+
+    sql = sql_counts(registry)
+    by_operation = {
+        name: list(group)
+        for name, group in itertools.groupby(sorted(results, key=lambda result: result[0]), key=lambda result: result[0])
+    }
+    output = {
+        'commit': current_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'options': {key: value for key, value in vars(options).items() if key not in ('json', 'compare')},
+        'total': summarize(results, elapsed, tuple(map(sum, zip(*sql.values()))) if sql else (0, 0)),
+        'operations': {
+            name: summarize(group, elapsed, sql.get(name, (0, 0))) for name, group in by_operation.items()
+        },
+    }
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        changed = sorted(
+            key for key, value in output['options'].items() if baseline['options'].get(key) != value
+        )
+        if changed:
+            print(f"Baseline ({baseline['commit']}) ran with different {', '.join(changed)}")
+    print_results(output, baseline)
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(output, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Per-request overhead of the GraphQL metrics middlewares.
+
+    python -m benchmarks.metrics --requests 500 --rounds 5
+
+Posts each document through the full Django middleware stack with
+``GRAPHQL_METRICS`` disabled and enabled, and reports the mean latency of
+both (best of ``--rounds`` alternating rounds) and how many fields had their
+resolvers timed.
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks import bulk_seed, setup_django, test_database
+
+DOCUMENTS = {
+    'heartbeat': "query Heartbeat { hello }",
+    'report': "query Report { crmStats { totalCustomers totalOrders totalRevenue } }",
+    'orders page': """
+        query OrdersPage {
+            allOrders(first: 50) {
+                edges { node { id orderDate totalAmount
+                    customer { id name email }
+                    products { edges { node { id name price } } } } }
+            }
+        }
+    """,
+}
+
+
+def per_request_us(client, body, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.post('/graphql', body, content_type='application/json')
+        assert response.status_code == 200, response.content
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--rounds', type=int, default=5)
+    options = parser.parse_args()
+
+    setup_django()
+    from django.test import Client, override_settings
+
+    from crm.metrics import registry
+
+    print(f"{'document':<12} {'disabled us':>12} {'enabled us':>11} {'overhead':>9} {'timed fields':>13}")
+    with test_database():
+        bulk_seed(customers=200, products=50, orders=2000)
+        for name, query in DOCUMENTS.items():
+            body = json.dumps({'query': query})
+            clients = []
+            for enabled in (False, True):
+                with override_settings(GRAPHQL_METRICS={'ENABLED': enabled}):
+                    # The middleware is loaded with the client's handler
+                    client = Client()
+                    client.post('/graphql', body, content_type='application/json')
+                    clients.append(client)
+            # Alternate the configurations and keep the best round of each
+            timings = [float('inf'), float('inf')]
+            for _ in range(options.rounds):
+                registry.clear()
+                for i, client in enumerate(clients):
+                    timings[i] = min(timings[i], per_request_us(client, body, options.requests))
+            resolvers = sum(
+                series[1] for series in registry.resolver_duration._series.values()
+            ) / options.requests
+            overhead = (timings[1] - timings[0]) / timings[0] * 100
+            print(f"{name:<12} {timings[0]:>12.1f} {timings[1]:>11.1f} {overhead:>8.1f}% {resolvers:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
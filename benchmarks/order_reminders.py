@@ -0,0 +1,58 @@
+"""
+Wall time of ``send_order_reminders`` as the order history grows.
+
+    python -m benchmarks.order_reminders --history 10000,200000 --recent 1000
+
+Seeds ``--history`` old orders plus ``--recent`` orders from the last week,
+then queues and sends every reminder with Celery in eager mode and the
+in-memory email backend. The window is filtered and paged in the database,
+so the time should track ``--recent`` and not ``--history``.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from benchmarks import bulk_seed, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--history', default='10000,200000', help="Comma-separated old order counts")
+    parser.add_argument('--recent', type=int, default=1000)
+    options = parser.parse_args()
+
+    setup_django()
+    from django.core import mail
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+
+    from crm.celery import app
+    from crm.models import Order
+    from crm.reminders import send_order_reminders
+
+    app.conf.task_always_eager = True
+    print(f"{'history':>8} {'recent':>7} {'seconds':>8} {'queries':>8}")
+    for history in (int(count) for count in options.history.split(',')):
+        with test_database(), tempfile.TemporaryDirectory() as directory:
+            bulk_seed(customers=1000, orders=history + options.recent)
+            # bulk_seed dates orders from 2020 on; move the newest into this week
+            cutoff = Order.objects.order_by('-id').values_list('id', flat=True)[options.recent - 1]
+            Order.objects.filter(id__gte=cutoff).update(order_date=timezone.now() - timedelta(days=1))
+
+            log_file = os.path.join(directory, 'reminders.log')
+            with override_settings(CRM_ORDER_REMINDERS={'LOG_FILE': log_file}), \
+                    CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                sent = send_order_reminders()
+                elapsed = time.perf_counter() - start
+            assert sent == len(mail.outbox) == options.recent
+            print(f"{history:>8} {options.recent:>7} {elapsed:>8.2f} {len(queries):>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Speedup of ``generate_partitioned_crm_report`` by partition count.
+
+    python -m benchmarks.partitioned_report --orders 1000000 --workers 8 --partitions 1,2,4,8
+
+Runs a real Celery worker inside this process (in-memory broker and result
+backend, ``--workers`` threads) against a file-backed SQLite test database,
+and times a year-long report from dispatch until the chord's callback has
+merged every partition. SQLite releases the GIL while it executes a query,
+so the partitions run in parallel.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import bulk_seed, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--customers', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--partitions', default='1,2,4,8', help="Comma-separated partition counts")
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args()
+
+    setup_django()
+    from celery.contrib.testing.worker import start_worker
+    from django.conf import settings
+
+    settings.CELERY_BROKER_URL = 'memory://'
+    settings.CELERY_RESULT_BACKEND = 'cache+memory://'
+    # The in-memory transport polls for messages; don't let its default 1s
+    # interval dominate the timings
+    settings.CELERY_BROKER_TRANSPORT_OPTIONS = {'polling_interval': 0.005}
+    from crm.celery import app
+    from crm.tasks import generate_partitioned_crm_report
+    with tempfile.TemporaryDirectory() as directory:
+        settings.DATABASES['default']['TEST']['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        with test_database(), start_worker(app, pool='threads', concurrency=options.workers,
+                                           perform_ping_check=False, loglevel='ERROR'):
+            bulk_seed(customers=options.customers, orders=options.orders, products_per_order=1)
+            # bulk_seed writes one order per minute from 2020-01-01
+            start, end = '2020-01-01T00:00:00+00:00', '2021-01-01T00:00:00+00:00'
+            print(f"{'partitions':>10} {'seconds':>8} {'speedup':>8}")
+            baseline = None
+            for partitions in (int(count) for count in options.partitions.split(',')):
+                timings = []
+                for _ in range(options.repeat):
+                    begin = time.perf_counter()
+                    # Called in-process: dispatches the chord and returns its result
+                    report = generate_partitioned_crm_report(start, end, partitions).get(timeout=600, interval=0.005)
+                    timings.append(time.perf_counter() - begin)
+                assert report['orders'] == min(options.orders, 366 * 24 * 60), report['orders']
+                elapsed = sorted(timings)[len(timings) // 2]
+                baseline = baseline or elapsed
+                print(f"{partitions:>10} {elapsed:>8.2f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Parse + validate overhead per request, with and without the document cache.
+
+    python -m benchmarks.persisted_queries --requests 2000
+
+Reports the cost of getting from query text to a validated document, and the
+end-to-end latency of a POST to the GraphQL view, for the documents our cron
+jobs and clients send most.
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks import setup_django, test_database
+
+DOCUMENTS = {
+    'heartbeat': "query { hello }",
+    'report': "query { crmStats { totalCustomers totalOrders totalRevenue } }",
+    'orders page': """
+        query ($after: String) {
+            allOrders(first: 20, after: $after, orderDate_Gte: "2025-01-01T00:00:00Z") {
+                pageInfo { hasNextPage endCursor }
+                edges { node { id orderDate totalAmount
+                    customer { id name email }
+                    products { edges { node { id name price } } } } }
+            }
+        }
+    """,
+}
+
+
+def per_request_us(fn, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    options = parser.parse_args()
+
+    setup_django()
+    from django.test import RequestFactory
+
+    from alx_backend_graphql.schema import schema
+    from crm.persisted_queries import DocumentCache, PersistedQueryStore, get_config, query_hash
+    from crm.views import CRMGraphQLView
+
+    graphql_schema = schema.graphql_schema
+    print(f"{'document':<12} {'uncached us':>12} {'cached us':>10} "
+          f"{'view uncached us':>17} {'view cached us':>15}")
+
+    with test_database():
+        store = PersistedQueryStore(get_config())
+        for name, query in DOCUMENTS.items():
+            key = query_hash(query)
+            timings = []
+            for size in (0, 1000):
+                document_cache = DocumentCache(size)
+                timings.append(per_request_us(
+                    lambda: document_cache.get_or_parse(graphql_schema, query, key),
+                    options.requests,
+                ))
+            for size in (0, 1000):
+                view = CRMGraphQLView.as_view(document_cache=DocumentCache(size), persisted_queries=store)
+                body = json.dumps({'query': query})
+                factory = RequestFactory()
+
+                def request():
+                    response = view(factory.post('/graphql', body, content_type='application/json'))
+                    assert response.status_code == 200, response.content
+
+                timings.append(per_request_us(request, options.requests))
+            print(f"{name:<12} {timings[0]:>12.1f} {timings[1]:>10.1f} {timings[2]:>17.1f} {timings[3]:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
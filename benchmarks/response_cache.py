@@ -0,0 +1,73 @@
+"""
+View latency of catalog queries with and without the response cache.
+
+    python -m benchmarks.response_cache --products 1000 --requests 500
+
+Every request uses the same document and variables, so the cached run is
+served entirely from the cache after the first miss; the "after write" column
+bumps the product tag before each request, i.e. the worst case for a cache
+that is invalidated as often as it is read.
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks import bulk_seed, setup_django, test_database
+
+QUERY = """
+    query ($min: Decimal) {
+        allProducts(first: 50, price_Gte: $min) {
+            edges { node { id name price stock } }
+        }
+    }
+"""
+
+
+def per_request_us(fn, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=500)
+    options = parser.parse_args()
+
+    setup_django()
+    from django.core.cache import cache
+    from django.test import RequestFactory
+
+    from crm.models import Product
+    from crm.response_cache import ResponseCache, _bump, get_config, model_tag, stats
+    from crm.views import CRMGraphQLView
+
+    with test_database():
+        bulk_seed(customers=10, products=options.products, orders=0)
+        body = json.dumps({'query': QUERY, 'variables': {'min': '1'}})
+        factory = RequestFactory()
+        timings = []
+        for enabled, write in ((False, False), (True, False), (True, True)):
+            cache.clear()
+            view = CRMGraphQLView.as_view(response_cache=ResponseCache(dict(get_config(), ENABLED=enabled)))
+
+            def request():
+                if write:
+                    _bump([model_tag(Product)])
+                response = view(factory.post('/graphql', body, content_type='application/json'))
+                assert response.status_code == 200, response.content
+
+            timings.append(per_request_us(request, options.requests))
+            if enabled and not write:
+                ratio = stats()['hit_ratio']
+
+        print(f"{options.products} products, {options.requests} requests, hit ratio {ratio:.1%}")
+        print(f"{'uncached us':>12} {'cached us':>10} {'after write us':>15}")
+        print(f"{timings[0]:>12.1f} {timings[1]:>10.1f} {timings[2]:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Time of ``crmStats`` read from the daily rollups versus the raw order table.
+
+    python -m benchmarks.rollups --orders 10000,1000000
+
+Orders are seeded one per minute, so 1 000 000 orders span about 694 days.
+"""
+
+import argparse
+
+from benchmarks import bulk_seed, measure, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', default='10000,1000000', help="Comma-separated order counts")
+    options = parser.parse_args()
+
+    setup_django()
+    from crm.stats import _add_raw, compute_crm_stats
+
+    def raw(group_by):
+        stats = {'total_customers': 0, 'total_orders': 0, 'total_revenue': 0}
+        _add_raw(stats, {}, None, None, group_by)
+
+    print(f"{'orders':>8} {'group by':>9} {'raw ms':>8} {'rollups ms':>11}")
+    for orders in (int(count) for count in options.orders.split(',')):
+        with test_database():
+            bulk_seed(customers=10000, orders=orders, products_per_order=1)
+            for group_by in (None, 'month'):
+                raw_ms = measure(lambda: raw(group_by))
+                rollup_ms = measure(lambda: compute_crm_stats(group_by=group_by))
+                print(f"{orders:>8} {group_by or '-':>9} {raw_ms:>8.2f} {rollup_ms:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Typeahead latency of ``search`` (text index) versus ``name`` (icontains).
+
+    python -m benchmarks.search --customers 200000
+
+Customers get random two-word names; each term is run through both filters
+of ``allCustomers`` and the median latency reported.
+"""
+
+import argparse
+import random
+
+from benchmarks import measure, setup_django, test_database
+
+SYLLABLES = ['al', 'be', 'ca', 'do', 'ev', 'fi', 'ga', 'ho', 'is', 'ju', 'ka', 'lo', 'mi', 'no', 'ol', 'pe']
+TERMS = ['ali', 'kamino', 'zzz']
+
+QUERY = """
+    query ($search: String, $name: String) {
+        allCustomers(first: 20, search: $search, name: $name) {
+            edges { node { id name } }
+        }
+    }
+"""
+
+
+def word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+
+    setup_django()
+    from django.test import RequestFactory
+
+    from alx_backend_graphql.schema import schema
+    from crm.models import Customer
+
+    def run(variables):
+        result = schema.execute(QUERY, variable_values=variables, context_value=RequestFactory().post('/graphql'))
+        assert not result.errors, result.errors
+
+    rng = random.Random(0)
+    with test_database():
+        Customer.objects.bulk_create(
+            [Customer(name=f"{word(rng)} {word(rng)}", email=f"customer{i}@example.com")
+             for i in range(options.customers)],
+            batch_size=1000,
+        )
+        print(f"{options.customers} customers")
+        print(f"{'term':<10} {'icontains ms':>13} {'search ms':>10}")
+        for term in TERMS:
+            icontains_ms = measure(lambda: run({'name': term}), options.repeat)
+            search_ms = measure(lambda: run({'search': term}), options.repeat)
+            print(f"{term:<10} {icontains_ms:>13.2f} {search_ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+# crm/async_utils.py
+
+"""
+Helpers for running the CRM schema under async execution.
+
+The same schema serves both paths. Resolvers check ``in_async_context()``
+and, when an event loop is running in the current thread, return awaitables
+built on Django's async ORM instead of querying synchronously (which Django
+refuses to do from inside an event loop).
+"""
+
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+
+
+def in_async_context():
+    """True when called from a thread with a running event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def sync_resolver(resolver):
+    """
+    Mark a resolver that needs the synchronous ORM (aggregates, transactions).
+    Under async execution it runs in a worker thread via ``sync_to_async``;
+    otherwise it is called directly.
+    """
+    @wraps(resolver)
+    def wrapper(*args, **kwargs):
+        if in_async_context():
+            return sync_to_async(resolver)(*args, **kwargs)
+        return resolver(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,23 @@
+# crm/bulk.py
+
+"""Helpers for bulk loading that bypasses ``Model.save()``."""
+
+from contextlib import contextmanager
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """
+    Let bulk_create keep explicit values for ``auto_now_add`` fields.
+
+    The flag lives on the shared field instance, so only use this in commands
+    and scripts, never while serving requests.
+    """
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
@@ -0,0 +1,102 @@
+# crm/cleanup.py
+
+"""
+Deleting customers who have not ordered since a cutoff.
+
+A customer is inactive when their latest order (``Max('orders__order_date')``,
+as a correlated subquery on the ``(customer_id, order_date)`` index) is older
+than the cutoff, or when they never ordered and signed up before it.
+
+Customers are deleted in primary-key order, ``batch_size`` at a time, each
+batch in its own transaction together with its orders, order-product rows
+and the matching decrements of the daily rollups. A batch locks its
+customers (``select_for_update``) and re-checks inactivity inside its
+transaction, so a customer who ordered after the batch was picked is kept,
+and cached responses are invalidated as each batch commits.
+"""
+
+import time
+
+from django.db import connection, transaction
+from django.db.models import Max, OuterRef, Q, Subquery
+
+from .models import Customer, Order, Product
+from .response_cache import invalidate_models
+from .rollups import RollupDelta
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def inactive_customers(cutoff):
+    last_order_date = (
+        Order.objects.filter(customer=OuterRef('pk'))
+        .order_by()
+        .values('customer')
+        .annotate(last=Max('order_date'))
+        .values('last')
+    )
+    return Customer.objects.annotate(last_order_date=Subquery(last_order_date)).filter(
+        Q(last_order_date__lt=cutoff) | Q(last_order_date__isnull=True, created_at__lt=cutoff)
+    )
+
+
+def count_inactive_customers(cutoff):
+    """Return ``(customers, orders)`` a cleanup at ``cutoff`` would delete."""
+    customers = inactive_customers(cutoff)
+    orders = Order.objects.filter(customer__in=customers.values('pk'))
+    return customers.count(), orders.count()
+
+
+def delete_inactive_customers(cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Delete inactive customers batch by batch, yielding a progress dict after
+    each committed batch.
+    """
+    inactive = inactive_customers(cutoff)
+    Through = Order.products.through
+    start = time.perf_counter()
+    customers = orders = 0
+    last_pk = 0
+    while True:
+        candidates = list(
+            inactive.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not candidates:
+            return
+        last_pk = candidates[-1]
+        with transaction.atomic():
+            # Lock the batch before re-checking it: an order can't be added
+            # to a locked customer until the batch commits
+            locked = list(Customer.objects.select_for_update().filter(pk__in=candidates).values_list('pk', flat=True))
+            pks = list(inactive.filter(pk__in=locked).values_list('pk', flat=True))
+            delta = RollupDelta()
+            delta.add_orders(Order.objects.filter(customer_id__in=pks), sign=-1)
+            delta.add_customers(Customer.objects.filter(pk__in=pks), sign=-1)
+            delta.apply()
+            # Deleted set-wise, without loading rows for the delete signals,
+            # so the rollups above and the invalidation below stand in for them
+            Through.objects.filter(order__customer_id__in=pks).delete()
+            orders += _delete(Order, 'customer', pks)
+            customers += _delete(Customer, 'id', pks)
+            if pks:
+                invalidate_models(Customer, Order, Product)
+        yield {
+            'customers': customers,
+            'orders': orders,
+            'customers_per_second': customers / max(time.perf_counter() - start, 1e-9),
+        }
+
+
+def _delete(model, field, values):
+    """DELETE the rows of ``model`` whose ``field`` is in ``values``; return how many."""
+    if not values:
+        return 0
+    quote = connection.ops.quote_name
+    column = model._meta.get_field(field).column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} "
+            f"WHERE {quote(column)} IN ({', '.join(['%s'] * len(values))})",
+            values,
+        )
+        return cursor.rowcount
@@ -3,8 +3,8 @@ Cron jobs for the CRM application.
 """
 
 from datetime import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+
+from crm.graphql_client import execute
 
 
 def log_crm_heartbeat():
@@ -21,24 +21,13 @@ def log_crm_heartbeat():
     
     # Optional: Query GraphQL endpoint to verify it's responsive
     try:
-        # Set up the GraphQL client
-        transport = RequestsHTTPTransport(
-            url='http://localhost:8000/graphql',
-            use_json=True,
-        )
-        
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-        
-        # Define the GraphQL query
-        query = gql("""
+        # In-process by default; see crm.graphql_client for the remote mode
+        result = execute("""
             query {
                 hello
             }
         """)
         
-        # Execute the query
-        result = client.execute(query)
-        
         if 'hello' in result:
             heartbeat_message += f" - GraphQL endpoint responsive: {result['hello']}"
         else:
@@ -64,16 +53,8 @@ def update_low_stock():
     timestamp = datetime.now().strftime("%d/%m/%Y-%H:%M:%S")
     
     try:
-        # Set up the GraphQL client
-        transport = RequestsHTTPTransport(
-            url='http://localhost:8000/graphql',
-            use_json=True,
-        )
-        
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-        
-        # Define the GraphQL mutation
-        mutation = gql("""
+        # Execute the mutation
+        result = execute("""
             mutation {
                 updateLowStockProducts {
                     products {
@@ -86,9 +67,6 @@ def update_low_stock():
             }
         """)
         
-        # Execute the mutation
-        result = client.execute(mutation)
-        
         # Extract results
         mutation_data = result.get('updateLowStockProducts', {})
         products = mutation_data.get('products', [])
@@ -0,0 +1,138 @@
+# crm/fields.py
+
+import inspect
+from functools import partial
+
+import graphene
+from django.db.models import QuerySet
+from graphene_django import DjangoConnectionField
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+
+from .async_utils import in_async_context
+from .loaders import get_loaders
+from .optimizer import optimize_queryset, page_window
+from .pagination import apaginate_keyset, aresolve_connection, paginate_keyset
+from .query_cost import get_config as get_cost_config
+
+
+class AsyncConnectionMixin:
+    """
+    Lets a DjangoConnectionField resolve under async execution: an awaitable
+    returned by the resolver (e.g. a DataLoader miss) is awaited before
+    paginating, and querysets are counted and sliced with the async ORM.
+    """
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager,
+                            queryset_resolver, max_limit, enforce_first_or_last,
+                            root, info, **args):
+        iterable = resolver(root, info, **args)
+        resolve = partial(
+            super().connection_resolver, connection=connection,
+            default_manager=default_manager, queryset_resolver=queryset_resolver,
+            max_limit=max_limit, enforce_first_or_last=enforce_first_or_last,
+            root=root, info=info, **args
+        )
+        if inspect.isawaitable(iterable):
+            async def await_iterable():
+                resolved = await iterable
+                return resolve(lambda root, info, **args: resolved)
+            return await_iterable()
+        return resolve(lambda root, info, **args: iterable)
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None):
+        queryset = maybe_queryset(iterable)
+        if isinstance(queryset, QuerySet) and in_async_context():
+            return aresolve_connection(connection, args, queryset, max_limit)
+        return super().resolve_connection(connection, args, iterable, max_limit=max_limit)
+
+
+class CRMConnectionField(AsyncConnectionMixin, DjangoConnectionField):
+    """
+    DjangoConnectionField for relations, resolvable under async execution.
+    Its resolver is passed the ``window`` of rows per parent the page reads
+    (see ``crm.optimizer.page_window``), so the loaders fetch only those.
+    """
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager,
+                            queryset_resolver, max_limit, enforce_first_or_last,
+                            root, info, **args):
+        return super().connection_resolver(
+            partial(resolver, window=page_window(args, max_limit)), connection,
+            default_manager, queryset_resolver, max_limit, enforce_first_or_last,
+            root, info, **args
+        )
+
+
+class CRMFilterConnectionField(AsyncConnectionMixin, DjangoFilterConnectionField):
+    """
+    DjangoFilterConnectionField that plans its queryset from the client's
+    selection set and hands each resolved page to the request's DataLoaders,
+    so relations the optimizer could not plan are still batch loaded. Under
+    async execution the page is read with the async ORM.
+
+    Passing ``keyset_fields`` adds an opt-in ``keyset: true`` argument that
+    switches the connection from offset cursors to keyset cursors over those
+    fields (see ``crm.pagination``).
+
+    Without ``first``/``last`` a page holds ``default_page_size`` rows, and
+    no page may hold more than ``max_limit`` (see ``crm.query_cost``).
+    """
+
+    def __init__(self, type_, *args, keyset_fields=None, default_page_size=None, **kwargs):
+        config = get_cost_config()
+        self.keyset_fields = tuple(keyset_fields) if keyset_fields else None
+        self.default_page_size = default_page_size or config['DEFAULT_PAGE_SIZE']
+        kwargs.setdefault('max_limit', config['MAX_PAGE_SIZE'])
+        if self.keyset_fields:
+            kwargs.setdefault('keyset', graphene.Boolean(
+                description="Paginate with keyset cursors over "
+                            f"({', '.join(self.keyset_fields)}) instead of offsets."
+            ))
+        super().__init__(type_, *args, **kwargs)
+
+    @classmethod
+    def resolve_queryset(cls, connection, iterable, info, args,
+                         filtering_args, filterset_class):
+        queryset = super().resolve_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
+        return optimize_queryset(queryset, info)
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager,
+                            queryset_resolver, max_limit, enforce_first_or_last,
+                            root, info, keyset_fields=None, default_page_size=None, **args):
+        if default_page_size and args.get('first') is None and args.get('last') is None:
+            args['first'] = default_page_size
+        if keyset_fields and args.get('keyset'):
+            iterable = resolver(root, info, **args)
+            if iterable is None:
+                iterable = default_manager
+            queryset = queryset_resolver(connection, iterable, info, args)
+            paginate = apaginate_keyset if in_async_context() else paginate_keyset
+            resolved = paginate(queryset, keyset_fields, connection, args, max_limit)
+        else:
+            resolved = super().connection_resolver(
+                resolver, connection, default_manager, queryset_resolver,
+                max_limit, enforce_first_or_last, root, info, **args
+            )
+        loaders = get_loaders(info)
+        if inspect.isawaitable(resolved):
+            async def prime_page():
+                page = await resolved
+                loaders.prime(edge.node for edge in page.edges)
+                return page
+            return prime_page()
+        loaders.prime(edge.node for edge in resolved.edges)
+        return resolved
+
+    def wrap_resolve(self, parent_resolver):
+        return partial(
+            super().wrap_resolve(parent_resolver),
+            keyset_fields=self.keyset_fields,
+            default_page_size=self.default_page_size,
+        )
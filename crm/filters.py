@@ -1,10 +1,21 @@
 # crm/filters.py
 
 import django_filters
+from django.db.models import Exists, OuterRef
+
 from .models import Customer, Product, Order
+from .search import search
+
+
+class SearchFilterMixin(django_filters.FilterSet):
+    """Adds ``search``: indexed full-text search ranked by relevance (see crm/search.py)."""
+    search = django_filters.CharFilter(method='filter_search')
 
+    def filter_search(self, queryset, name, value):
+        return search(queryset, value)
 
-class CustomerFilter(django_filters.FilterSet):
+
+class CustomerFilter(SearchFilterMixin, django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains')
     email = django_filters.CharFilter(lookup_expr='icontains')
     created_at__gte = django_filters.DateTimeFilter(field_name='created_at', lookup_expr='gte')
@@ -16,7 +27,7 @@ class CustomerFilter(django_filters.FilterSet):
         fields = ['name', 'email', 'created_at', 'phone']
 
 
-class ProductFilter(django_filters.FilterSet):
+class ProductFilter(SearchFilterMixin, django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains')
     price__gte = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
     price__lte = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
@@ -28,15 +39,20 @@ class ProductFilter(django_filters.FilterSet):
         fields = ['name', 'price', 'stock']
 
 
-class OrderFilter(django_filters.FilterSet):
+class OrderFilter(SearchFilterMixin, django_filters.FilterSet):
     total_amount__gte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='gte')
     total_amount__lte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='lte')
     order_date__gte = django_filters.DateTimeFilter(field_name='order_date', lookup_expr='gte')
     order_date__lte = django_filters.DateTimeFilter(field_name='order_date', lookup_expr='lte')
     customer_name = django_filters.CharFilter(field_name='customer__name', lookup_expr='icontains')
-    product_name = django_filters.CharFilter(field_name='products__name', lookup_expr='icontains')
+    product_name = django_filters.CharFilter(method='filter_product_name')
     product_id = django_filters.NumberFilter(field_name='products__id', lookup_expr='exact')
 
     class Meta:
         model = Order
-        fields = ['total_amount', 'order_date', 'customer_name', 'product_name']
\ No newline at end of file
+        fields = ['total_amount', 'order_date', 'customer_name', 'product_name']
+
+    def filter_product_name(self, queryset, name, value):
+        # A join through Order.products would return an order once per matching product
+        lines = Order.products.through.objects.filter(order=OuterRef('pk'), product__name__icontains=value)
+        return queryset.filter(Exists(lines))
\ No newline at end of file
@@ -0,0 +1,146 @@
+# crm/graphql_client.py
+
+"""
+A GraphQL client for cron jobs and Celery tasks.
+
+By default operations run in-process against ``alx_backend_graphql.schema``:
+no HTTP hop, no introspection, and no dependency on the web tier being up.
+Documents are parsed and validated once per process (``DocumentCache``) and
+each operation gets its own request context, so DataLoaders batch as they do
+behind the view.
+
+The remote mode posts to a GraphQL URL instead, through one pooled HTTP
+session per process; the server's schema is introspected once, when that
+session is opened.
+
+Settings (all optional)::
+
+    CRM_GRAPHQL_CLIENT = {
+        'MODE': 'local',    # or 'remote'
+        'URL': 'http://localhost:8000/graphql',
+        'TIMEOUT': 30,      # seconds, remote mode only
+    }
+"""
+
+import threading
+
+from django.conf import settings
+from django.http import HttpRequest
+from graphql import ExecutionResult, get_operation_ast
+from graphql import execute as execute_document
+
+from .persisted_queries import DocumentCache, query_hash
+from .persisted_queries import get_config as get_document_cache_config
+
+DEFAULTS = {
+    'MODE': 'local',
+    'URL': 'http://localhost:8000/graphql',
+    'TIMEOUT': 30,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CRM_GRAPHQL_CLIENT', {}))
+    return config
+
+
+class GraphQLClientError(Exception):
+    """An operation returned errors; ``errors`` holds their messages."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors))
+
+
+class LocalClient:
+    """Executes operations against the schema in this process."""
+
+    def __init__(self, schema=None, document_cache=None):
+        if schema is None:
+            from alx_backend_graphql.schema import schema
+        self.schema = schema
+        self.document_cache = document_cache or DocumentCache(get_document_cache_config()['CACHE_SIZE'])
+
+    def execute(self, query, variables=None, operation_name=None):
+        """Run ``query`` and return its ``data``; raise ``GraphQLClientError`` on errors."""
+        graphql_schema = self.schema.graphql_schema
+        document, errors = self.document_cache.get_or_parse(graphql_schema, query, query_hash(query))
+        if not errors and get_operation_ast(document, operation_name) is None:
+            errors = [f"Unknown operation {operation_name!r}" if operation_name else "No operation to run"]
+        result = ExecutionResult(errors=errors) if errors else execute_document(
+            graphql_schema, document,
+            # A fresh context per operation scopes the DataLoaders to it
+            context_value=HttpRequest(),
+            variable_values=variables,
+            operation_name=operation_name,
+        )
+        if result.errors:
+            raise GraphQLClientError([getattr(error, 'message', str(error)) for error in result.errors])
+        return result.data
+
+
+class RemoteClient:
+    """
+    Posts operations to ``url`` over one pooled ``requests`` session, opened
+    on first use with the server's schema fetched once.
+    """
+
+    def __init__(self, url, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        self._session = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                from gql import Client
+                from gql.transport.requests import RequestsHTTPTransport
+
+                transport = RequestsHTTPTransport(url=self.url, timeout=self.timeout, retries=2)
+                client = Client(transport=transport, fetch_schema_from_transport=True)
+                self._session = client.connect_sync()
+            return self._session
+
+    def execute(self, query, variables=None, operation_name=None):
+        """Run ``query`` and return its ``data``; raise ``GraphQLClientError`` on errors."""
+        from gql import GraphQLRequest
+        from gql.transport.exceptions import TransportQueryError
+
+        request = GraphQLRequest(query, variable_values=variables, operation_name=operation_name)
+        try:
+            return self.session().execute(request)
+        except TransportQueryError as e:
+            messages = [error.get('message', str(error)) for error in e.errors] if e.errors else [str(e)]
+            raise GraphQLClientError(messages)
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.client.close_sync()
+                self._session = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide client for the configured mode."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            config = get_config()
+            if config['MODE'] == 'remote':
+                _client = RemoteClient(config['URL'], config['TIMEOUT'])
+            elif config['MODE'] == 'local':
+                _client = LocalClient()
+            else:
+                raise ValueError(f"Unknown CRM_GRAPHQL_CLIENT mode {config['MODE']!r}")
+        return _client
+
+
+def execute(query, variables=None, operation_name=None):
+    """Run ``query`` with the process-wide client and return its ``data``."""
+    return get_client().execute(query, variables, operation_name)
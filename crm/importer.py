@@ -0,0 +1,326 @@
+# crm/importer.py
+
+"""
+Batched, resumable imports of customers, products and orders.
+
+Input is streamed from CSV or NDJSON (optionally gzipped), in the same shape
+``manage.py export_crm`` writes. Rows are validated with the rules the
+mutations use (``crm.validators``), checked against the database once per
+batch, and written with ``bulk_create``; orders also get their
+order-product rows in one ``bulk_create`` per batch. The daily rollups
+(``crm.rollups``) are updated in the same transaction.
+
+Progress is stored in an ``ImportCheckpoint`` row that is updated in the same
+transaction as each batch, so an interrupted import resumes at the first
+uncommitted row and never writes a batch twice.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .bulk import explicit_dates
+from .models import Customer, ImportCheckpoint, Order, Product
+from .response_cache import invalidate_models
+from .rollups import RollupDelta
+from .validators import validate_email, validate_phone, validate_price, validate_stock
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    raise ValidationError(f"Can't tell the format of {path}; pass --format")
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(stream, fmt):
+    """Yield ``(row_number, dict_or_error)`` for every record of ``stream``."""
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            yield number, row
+        return
+    number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = ValidationError(f"Invalid JSON: {e}")
+        if not isinstance(row, (dict, ValidationError)):
+            row = ValidationError("Expected a JSON object")
+        yield number, row
+
+
+def _required(row, field):
+    value = row.get(field)
+    if value in (None, ''):
+        raise ValidationError(f"{field} is required")
+    return value
+
+
+def _text(value, field):
+    if value is not None and not isinstance(value, str):
+        raise ValidationError(f"{field} must be a string")
+    return value
+
+
+def _decimal(value, field):
+    try:
+        value = Decimal(str(value))
+    except InvalidOperation:
+        raise ValidationError(f"{field} must be a number")
+    # NaN and Infinity parse, but can't be compared or stored
+    if not value.is_finite():
+        raise ValidationError(f"{field} must be a number")
+    return value
+
+
+def _integer(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{field} must be an integer")
+
+
+def _datetime(value, field):
+    if value in (None, ''):
+        return timezone.now()
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise ValidationError(f"{field} must be an ISO 8601 date-time")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Importer:
+    """
+    One kind of record. ``clean`` validates a row on its own, ``prepare``
+    checks a whole batch against the database and ``write`` inserts it.
+    """
+    model = None
+
+    def clean(self, row):
+        raise NotImplementedError
+
+    def prepare(self, batch):
+        """Return ``(accepted, errors)`` for a list of ``(row_number, cleaned)``."""
+        return batch, []
+
+    def write(self, batch):
+        raise NotImplementedError
+
+
+class CustomerImporter(Importer):
+    model = Customer
+
+    def clean(self, row):
+        email = _text(_required(row, 'email'), 'email')
+        validate_email(email)
+        phone = _text(row.get('phone'), 'phone')
+        validate_phone(phone)
+        return Customer(
+            name=_required(row, 'name'),
+            email=email,
+            phone=phone or None,
+            created_at=_datetime(row.get('created_at'), 'created_at'),
+        )
+
+    def prepare(self, batch):
+        existing = set(Customer.objects.filter(
+            email__in=[customer.email for _, customer in batch]
+        ).values_list('email', flat=True))
+        accepted, errors = [], []
+        for number, customer in batch:
+            if customer.email in existing:
+                errors.append((number, f"Email {customer.email} already exists"))
+            else:
+                existing.add(customer.email)
+                accepted.append((number, customer))
+        return accepted, errors
+
+    def write(self, batch):
+        with explicit_dates(Customer._meta.get_field('created_at')):
+            customers = Customer.objects.bulk_create([customer for _, customer in batch])
+        delta = RollupDelta()
+        for customer in customers:
+            delta.add_customer(customer.created_at)
+        delta.apply()
+
+
+class ProductImporter(Importer):
+    model = Product
+
+    def clean(self, row):
+        price = _decimal(_required(row, 'price'), 'price')
+        validate_price(price)
+        stock = row.get('stock')
+        stock = 0 if stock in (None, '') else _integer(stock, 'stock')
+        validate_stock(stock)
+        return Product(name=_required(row, 'name'), price=price, stock=stock)
+
+    def write(self, batch):
+        Product.objects.bulk_create([product for _, product in batch])
+
+
+class OrderImporter(Importer):
+    """
+    Orders name their customer by ``customer_email`` (preferred) or
+    ``customer_id``, and their products by ``product_ids``: a JSON list, or
+    ``;``-separated in CSV. ``total_amount`` defaults to the sum of the
+    products' prices, as in ``CreateOrder``.
+    """
+    model = Order
+
+    def clean(self, row):
+        product_ids = row.get('product_ids')
+        if isinstance(product_ids, str):
+            product_ids = [pk for pk in product_ids.split(';') if pk.strip()]
+        if not product_ids:
+            raise ValidationError("At least one product must be selected")
+        cleaned = {
+            'customer_email': row.get('customer_email') or None,
+            'customer_id': None,
+            # An order holds each product once
+            'product_ids': list(dict.fromkeys(_integer(pk, 'product_ids') for pk in product_ids)),
+            'total_amount': None,
+            'order_date': _datetime(row.get('order_date'), 'order_date'),
+        }
+        if cleaned['customer_email'] is None:
+            cleaned['customer_id'] = _integer(_required(row, 'customer_id'), 'customer_id')
+        if row.get('total_amount') not in (None, ''):
+            cleaned['total_amount'] = _decimal(row['total_amount'], 'total_amount')
+        return cleaned
+
+    def prepare(self, batch):
+        emails = {row['customer_email'] for _, row in batch if row['customer_email']}
+        ids = {row['customer_id'] for _, row in batch if row['customer_id'] is not None}
+        by_email = dict(Customer.objects.filter(email__in=emails).values_list('email', 'id'))
+        known_ids = set(Customer.objects.filter(pk__in=ids).values_list('id', flat=True))
+        prices = dict(Product.objects.filter(
+            pk__in={pk for _, row in batch for pk in row['product_ids']}
+        ).values_list('id', 'price'))
+
+        accepted, errors = [], []
+        for number, row in batch:
+            if row['customer_email']:
+                customer_id = by_email.get(row['customer_email'])
+                missing_customer = f"Customer with email {row['customer_email']} does not exist"
+            else:
+                customer_id = row['customer_id'] if row['customer_id'] in known_ids else None
+                missing_customer = f"Customer with ID {row['customer_id']} does not exist"
+            if customer_id is None:
+                errors.append((number, missing_customer))
+                continue
+            missing = [pk for pk in row['product_ids'] if pk not in prices]
+            if missing:
+                errors.append((number, f"Products with IDs {', '.join(map(str, missing))} do not exist"))
+                continue
+            total = row['total_amount']
+            if total is None:
+                total = sum((prices[pk] for pk in row['product_ids']), Decimal('0.00'))
+            order = Order(customer_id=customer_id, total_amount=total, order_date=row['order_date'])
+            accepted.append((number, (order, row['product_ids'])))
+        return accepted, errors
+
+    def write(self, batch):
+        with explicit_dates(Order._meta.get_field('order_date')):
+            orders = Order.objects.bulk_create([order for _, (order, _) in batch])
+        Through = Order.products.through
+        Through.objects.bulk_create([
+            Through(order_id=order.pk, product_id=product_id)
+            for order, (_, (_, product_ids)) in zip(orders, batch)
+            for product_id in product_ids
+        ])
+        delta = RollupDelta()
+        for order, (_, (_, product_ids)) in zip(orders, batch):
+            delta.add_order(order.order_date, order.total_amount)
+            delta.add_units(order.order_date, product_ids)
+        delta.apply()
+
+
+IMPORTERS = {
+    'customers': CustomerImporter,
+    'products': ProductImporter,
+    'orders': OrderImporter,
+}
+
+
+def get_checkpoint(kind, path, restart=False):
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+        source=f'{kind}:{os.path.abspath(path)}'[:255], defaults={'kind': kind},
+    )
+    if restart and checkpoint.rows_done:
+        checkpoint.rows_done = checkpoint.rows_rejected = 0
+        checkpoint.save()
+    return checkpoint
+
+
+def run_import(kind, rows, checkpoint, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import ``rows`` (``(row_number, row)`` pairs) after skipping the ones the
+    checkpoint already covers. Yields a progress dict after every batch with
+    the cumulative ``rows``, ``imported``, ``rejected``, ``errors`` of that
+    batch and ``rows_per_second``.
+    """
+    importer = IMPORTERS[kind]()
+    rows = islice(rows, checkpoint.rows_done, None)
+    start = time.perf_counter()
+    processed = imported = rejected = 0
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            cleaned, errors = [], []
+            for number, row in batch:
+                try:
+                    if isinstance(row, ValidationError):
+                        raise row
+                    cleaned.append((number, importer.clean(row)))
+                except ValidationError as e:
+                    errors.append((number, '; '.join(e.messages)))
+            with transaction.atomic():
+                accepted, batch_errors = importer.prepare(cleaned)
+                if accepted:
+                    importer.write(accepted)
+                errors.extend(batch_errors)
+                checkpoint.rows_done += len(batch)
+                checkpoint.rows_rejected += len(errors)
+                checkpoint.save(update_fields=['rows_done', 'rows_rejected', 'updated_at'])
+            processed += len(batch)
+            imported += len(accepted)
+            rejected += len(errors)
+            yield {
+                'rows': checkpoint.rows_done,
+                'imported': imported,
+                'rejected': rejected,
+                'errors': sorted(errors),
+                'rows_per_second': processed / max(time.perf_counter() - start, 1e-9),
+            }
+    finally:
+        if imported:
+            # bulk_create sends no post_save, so cached responses are dropped here
+            invalidate_models(importer.model)
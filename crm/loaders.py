@@ -0,0 +1,277 @@
+# crm/loaders.py
+
+"""
+Request-scoped DataLoaders for the CRM relations.
+
+Under synchronous execution siblings in a list are resolved one after another
+and there is no event-loop tick to batch on. Instead, every time a page of
+model instances is produced (by a connection field or by a loader), their
+keys are primed on the loaders that will need them. The first miss then
+fetches all pending keys in a single query, so a page costs a constant number
+of queries no matter how many nodes it holds or how deeply it is nested.
+
+Under async execution (see ``crm.async_utils``) the same loaders are awaited
+with ``aload``: misses from one event-loop tick are collected and fetched
+together with the async ORM, on top of the same priming.
+
+To-many relations are loaded per ``PageWindow``: only the rows of each parent
+the nested connection's page can show are fetched, so ``orders(first: 1)``
+reads one order per customer however many they have.
+"""
+
+import asyncio
+from collections import defaultdict
+from functools import partial
+
+from crm.async_utils import in_async_context
+from crm.models import Customer
+from crm.models import Product
+from crm.models import Order
+from crm.optimizer import PageWindow, WindowedRows, prefetched_pages, window_queryset
+
+# Every row of the relation
+WHOLE_RELATION = PageWindow(0, None, None)
+
+
+class DataLoader:
+    """
+    Caches batch results per key for the lifetime of a request.
+
+    ``batch_query`` receives a list of keys and returns the queryset that
+    fetches them; ``group`` turns the fetched rows into a dict mapping each
+    key to its value. Keys left out resolve to ``default``. Loaders sharing a
+    ``pending`` dict fetch the keys primed on any of them.
+    """
+
+    def __init__(self, batch_query, group, default=None, pending=None):
+        self.batch_query = batch_query
+        self.group = group
+        self.default = default
+        self._cache = {}
+        self._pending = {} if pending is None else pending
+        self._batch = None
+
+    def prime(self, keys):
+        """Queue keys to be fetched together with the next cache miss."""
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._pending[key] = None
+
+    def prime_value(self, key, value):
+        """Store an already loaded value so it is never fetched."""
+        self._cache[key] = value
+        self._pending.pop(key, None)
+
+    def peek(self, key):
+        """Return the cached value for ``key`` without fetching, or ``None``."""
+        return self._cache.get(key)
+
+    def load(self, key):
+        if key not in self._cache:
+            self._pending[key] = None
+            keys = self._take_pending()
+            self._store(keys, list(self.batch_query(keys)))
+        return self._value(key)
+
+    async def aload(self, key):
+        if key not in self._cache:
+            self._pending[key] = None
+            if self._batch is None:
+                # Runs after every resolver already scheduled for this tick
+                self._batch = asyncio.get_running_loop().create_task(self._dispatch())
+            await self._batch
+        return self._value(key)
+
+    def resolve(self, key):
+        """
+        ``load`` under synchronous execution. Under async execution cached
+        values are returned as is and misses as an ``aload`` awaitable.
+        """
+        if key in self._cache or not in_async_context():
+            return self.load(key)
+        return self.aload(key)
+
+    async def _dispatch(self):
+        self._batch = None
+        keys = self._take_pending()
+        self._store(keys, [row async for row in self.batch_query(keys)])
+
+    def _take_pending(self):
+        keys = list(self._pending)
+        self._pending.clear()
+        return keys
+
+    def _store(self, keys, rows):
+        results = self.group(rows)
+        for key in keys:
+            self._cache[key] = results.get(key, self.default)
+
+    def _value(self, key):
+        value = self._cache[key]
+        return list(value) if isinstance(value, list) else value
+
+
+class RelationLoader:
+    """
+    The DataLoaders of one to-many relation, one per ``PageWindow``.
+
+    Keys primed on it are fetched by the first window that misses. Whole
+    relations primed with ``prime_value`` (e.g. by CreateOrder or a full
+    prefetch) serve every window.
+    """
+
+    def __init__(self, batch_query, group):
+        self.batch_query = batch_query
+        self.group = group
+        self._whole = {}
+        self._pending = {}
+        self._windows = {}
+
+    def prime(self, keys):
+        """Queue keys to be fetched together with the next cache miss."""
+        for key in keys:
+            if key is not None and key not in self._whole:
+                self._pending[key] = None
+
+    def prime_value(self, key, value):
+        """Store the whole, already loaded relation of ``key``."""
+        self._whole[key] = value
+        self._pending.pop(key, None)
+
+    def window(self, window):
+        """The DataLoader reading ``window`` of each key's rows."""
+        loader = self._windows.get(window)
+        if loader is None:
+            loader = DataLoader(
+                partial(self.batch_query, window=window), self.group, default=[], pending=self._pending
+            )
+            self._windows[window] = loader
+        return loader
+
+    def load(self, key, window=WHOLE_RELATION):
+        if key in self._whole:
+            return list(self._whole[key])
+        return self.window(window).load(key)
+
+    def resolve(self, key, window=WHOLE_RELATION):
+        if key in self._whole:
+            return list(self._whole[key])
+        return self.window(window).resolve(key)
+
+
+class CRMLoaders:
+    """The set of loaders shared by every resolver of one GraphQL request."""
+
+    def __init__(self):
+        self.customer = DataLoader(self._customers_query, self._group_customers)
+        self.order_products = RelationLoader(self._order_products_query, self._group_order_products)
+        self.customer_orders = RelationLoader(self._customer_orders_query, self._group_customer_orders)
+        self.product_orders = RelationLoader(self._product_orders_query, self._group_product_orders)
+
+    def prime(self, instances):
+        """
+        Register freshly fetched instances with the loaders that use them.
+
+        Relations the queryset optimizer already select_related or prefetched
+        are stored as loaded values instead of being queued for a fetch.
+        """
+        for instance in instances:
+            if isinstance(instance, Order):
+                if Order.customer.is_cached(instance):
+                    # A prefetched customer's orders point back at it, so
+                    # only prime each customer instance once
+                    if self.customer.peek(instance.customer_id) is not instance.customer:
+                        self.prime([instance.customer])
+                elif 'customer_id' not in instance.get_deferred_fields():
+                    self.customer.prime([instance.customer_id])
+                self._prime_relation(self.order_products, instance, 'products')
+            elif isinstance(instance, Customer):
+                self.customer.prime_value(instance.pk, instance)
+                self._prime_relation(self.customer_orders, instance, 'orders')
+            elif isinstance(instance, Product):
+                self._prime_relation(self.product_orders, instance, 'orders')
+
+    def _prime_relation(self, loader, instance, name):
+        prefetched = getattr(instance, '_prefetched_objects_cache', {})
+        pages = list(prefetched_pages(instance, name))
+        if name in prefetched:
+            related = list(prefetched[name])
+            loader.prime_value(instance.pk, related)
+            self.prime(related)
+        elif pages:
+            for window, rows in pages:
+                loader.window(window).prime_value(instance.pk, WindowedRows.from_annotated(rows))
+                self.prime(rows)
+        else:
+            loader.prime([instance.pk])
+
+    @staticmethod
+    def _customers_query(keys):
+        return Customer.objects.filter(pk__in=keys)
+
+    def _group_customers(self, customers):
+        self.prime(customers)
+        return {customer.pk: customer for customer in customers}
+
+    @staticmethod
+    def _order_products_query(keys, window):
+        return window_queryset(
+            Order.products.through.objects.filter(order_id__in=keys).select_related('product'),
+            'order', window, order_by='product',
+        )
+
+    def _group_order_products(self, rows):
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[row.order_id].append(row)
+        self.prime(row.product for row in rows)
+        return {
+            key: WindowedRows.from_annotated(group, [row.product for row in group])
+            for key, group in grouped.items()
+        }
+
+    @staticmethod
+    def _customer_orders_query(keys, window):
+        return window_queryset(Order.objects.filter(customer_id__in=keys), 'customer', window)
+
+    def _group_customer_orders(self, orders):
+        grouped = defaultdict(list)
+        for order in orders:
+            grouped[order.customer_id].append(order)
+        self.prime(orders)
+        return {key: WindowedRows.from_annotated(group) for key, group in grouped.items()}
+
+    @staticmethod
+    def _product_orders_query(keys, window):
+        return window_queryset(
+            Order.products.through.objects.filter(product_id__in=keys).select_related('order'),
+            'product', window, order_by='order',
+        )
+
+    def _group_product_orders(self, rows):
+        grouped = defaultdict(list)
+        for row in rows:
+            grouped[row.product_id].append(row)
+        self.prime(row.order for row in rows)
+        return {
+            key: WindowedRows.from_annotated(group, [row.order for row in group])
+            for key, group in grouped.items()
+        }
+
+
+def get_loaders(info):
+    """
+    Return the loaders bound to the current request.
+
+    The loaders live on ``info.context`` (the HttpRequest under GraphQLView).
+    Without a context there is nothing to scope them to, so a fresh, unshared
+    set is returned and resolution simply falls back to one query per field.
+    """
+    context = info.context
+    if context is None:
+        return CRMLoaders()
+    loaders = getattr(context, 'crm_loaders', None)
+    if loaders is None:
+        loaders = CRMLoaders()
+        setattr(context, 'crm_loaders', loaders)
+    return loaders
@@ -0,0 +1,47 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from crm.cleanup import DEFAULT_BATCH_SIZE, count_inactive_customers, delete_inactive_customers
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete customers with no order in the last --days days (and customers "
+        "who never ordered and signed up before then), in short per-batch transactions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365,
+                            help="Inactivity period in days (default 365).")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help="Customers deleted per transaction.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only count what would be deleted.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        if options['dry_run']:
+            customers, orders = count_inactive_customers(cutoff)
+            self.stdout.write(f"[{timestamp}] Would delete {customers} inactive customers "
+                              f"and {orders} orders (dry run)")
+            return
+
+        progress = {'customers': 0, 'orders': 0, 'customers_per_second': 0}
+        last_report = time.monotonic()
+        for progress in delete_inactive_customers(cutoff, options['batch_size']):
+            if time.monotonic() - last_report >= 5:
+                last_report = time.monotonic()
+                self.stdout.write(self.summary(progress))
+        self.stdout.write(self.style.SUCCESS(f"[{timestamp}] {self.summary(progress)}"))
+
+    @staticmethod
+    def summary(progress):
+        return (f"Deleted {progress['customers']} inactive customers and {progress['orders']} orders, "
+                f"{progress['customers_per_second']:.0f} customers/s")
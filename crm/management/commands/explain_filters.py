@@ -0,0 +1,90 @@
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+import django_filters
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from alx_backend_graphql.schema import schema
+from crm.fields import CRMFilterConnectionField
+
+# Plan lines that walk a table rather than searching an index. A page query in
+# primary key order may still stop early at its LIMIT, but the count query
+# offset pagination issues never does.
+SCAN_PATTERNS = [
+    re.compile(r'\bSCAN (?!.*\bUSING\b)(\w+)'),    # SQLite
+    re.compile(r'\bSeq Scan on (\w+)'),            # PostgreSQL
+]
+
+
+def sample_value(filter_):
+    """A representative argument for one filter, as a client would send it."""
+    if isinstance(filter_, (django_filters.DateTimeFilter, django_filters.DateFilter)):
+        return timezone.now() - timedelta(days=30)
+    if isinstance(filter_, django_filters.NumberFilter):
+        return Decimal('10')
+    return 'a'
+
+
+def filter_connections():
+    """Yield ``(graphql name, field)`` for every filtered connection on Query."""
+    query_type = schema.graphql_schema.query_type.graphene_type
+    for name, field in query_type._meta.fields.items():
+        if isinstance(field, CRMFilterConnectionField):
+            yield name, field
+
+
+def table_scans(plan):
+    tables = []
+    for line in plan.splitlines():
+        for pattern in SCAN_PATTERNS:
+            tables.extend(pattern.findall(line))
+    return tables
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the count and page queries every filter of the GraphQL "
+        "filtersets generates, and flag the ones that scan a table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connection', action='append', dest='connections',
+                            help="Only explain this connection field, e.g. all_orders (repeatable).")
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help="Exit with an error if any plan contains a table scan.")
+
+    def handle(self, *args, **options):
+        scans = []
+        for name, field in filter_connections():
+            if options['connections'] and name not in options['connections']:
+                continue
+            filterset_class = field.filterset_class
+            model = filterset_class._meta.model
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({filterset_class.__name__})"))
+            for filter_name, filter_ in filterset_class.base_filters.items():
+                data = {filter_name: sample_value(filter_)}
+                queryset = filterset_class(data=data, queryset=model.objects.all()).qs
+                # COUNT(*) shares the access path of selecting the matching keys
+                queries = [
+                    ('count', queryset.order_by().values('pk')),
+                    ('offset', queryset.order_by('pk')[:field.default_page_size]),
+                ]
+                if field.keyset_fields:
+                    queries.append(('keyset', queryset.order_by(*field.keyset_fields)[:field.default_page_size]))
+                for label, query in queries:
+                    plan = query.explain()
+                    tables = table_scans(plan)
+                    status = self.style.WARNING('TABLE SCAN') if tables else self.style.SUCCESS('ok')
+                    self.stdout.write(f"  {filter_name} [{label}]: {status}")
+                    for line in plan.splitlines():
+                        self.stdout.write(f"      {line}")
+                    if tables:
+                        scans.append(f"{name}.{filter_name} [{label}] scans {', '.join(sorted(set(tables)))}")
+
+        self.stdout.write(f"{len(scans)} plan(s) with table scans on {connection.vendor}")
+        if scans and options['fail_on_scan']:
+            raise CommandError("Table scans:\n" + "\n".join(scans))
@@ -0,0 +1,64 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.importer import DEFAULT_BATCH_SIZE, IMPORTERS, detect_format, get_checkpoint, open_text, read_rows, run_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk load customers, products or orders from CSV or NDJSON (optionally "
+        ".gz). Interrupted imports resume from the last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help="Input format; guessed from the file extension by default.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--restart', action='store_true',
+                            help="Ignore the saved checkpoint and import the file from the start.")
+        parser.add_argument('--max-errors', type=int, default=20,
+                            help="Rejected rows to print (all are counted).")
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        try:
+            fmt = options['format'] or detect_format(path)
+        except ValidationError as e:
+            raise CommandError(e.messages[0])
+
+        checkpoint = get_checkpoint(kind, path, restart=options['restart'])
+        if checkpoint.rows_done:
+            self.stdout.write(f"Resuming {path} after row {checkpoint.rows_done}")
+
+        printed = 0
+        progress = None
+        last_report = time.monotonic()
+        try:
+            with open_text(path) as stream:
+                for progress in run_import(kind, read_rows(stream, fmt), checkpoint, options['batch_size']):
+                    for number, message in progress['errors']:
+                        if printed < options['max_errors']:
+                            self.stderr.write(f"Row {number}: {message}")
+                            printed += 1
+                    if time.monotonic() - last_report >= 5:
+                        last_report = time.monotonic()
+                        self.stdout.write(self.summary(progress))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        if progress is None:
+            self.stdout.write(f"Nothing to import; {checkpoint.rows_done} rows were already processed "
+                              f"(use --restart to import again)")
+            return
+        self.stdout.write(self.style.SUCCESS(self.summary(progress)))
+
+    @staticmethod
+    def summary(progress):
+        return (f"{progress['rows']} rows: {progress['imported']} imported, "
+                f"{progress['rejected']} rejected, {progress['rows_per_second']:.0f} rows/s")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from crm.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily order, revenue, customer and product-unit rollups "
+        "from the raw tables, e.g. after a backfill or QuerySet.update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD); default: the beginning.")
+        parser.add_argument('--end', help="Last day to rebuild, inclusive (YYYY-MM-DD); default: today.")
+
+    def handle(self, *args, **options):
+        days = {}
+        for name in ('start', 'end'):
+            if options[name]:
+                days[name] = parse_date(options[name])
+                if days[name] is None:
+                    raise CommandError(f"--{name} expects YYYY-MM-DD, got {options[name]!r}")
+        count = rebuild_rollups(**days)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily rollups"))
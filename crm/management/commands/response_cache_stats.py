@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from crm.response_cache import stats
+
+
+class Command(BaseCommand):
+    help = "Report the GraphQL response cache hit ratio across all processes."
+
+    def handle(self, *args, **options):
+        counters = stats()
+        self.stdout.write(
+            f"hits={counters['hits']} misses={counters['misses']} "
+            f"hit_ratio={counters['hit_ratio']:.2%}"
+        )
@@ -0,0 +1,84 @@
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from crm.seed import DEFAULT_BATCH_SIZE, seed_crm
+
+
+class Command(BaseCommand):
+    help = (
+        "Add deterministic synthetic customers, products and orders for "
+        "benchmarking, with backfilled dates and basket-consistent totals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=0, help="Customers to add.")
+        parser.add_argument('--products', type=int, default=0, help="Products to add.")
+        parser.add_argument('--orders', type=int, default=0,
+                            help="Orders to add, over all customers and products in the database.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed.")
+        parser.add_argument('--end', help="Day the history ends (YYYY-MM-DD); default: today.")
+        parser.add_argument('--days', type=int, default=730, help="Length of the sign-up history in days.")
+        parser.add_argument('--growth', type=float, default=1.0,
+                            help="How fast sign-ups and orders grow over the history (0: uniform).")
+        parser.add_argument('--customer-sigma', type=float, default=1.0,
+                            help="Spread of the log-normal customer order frequency.")
+        parser.add_argument('--product-sigma', type=float, default=1.5,
+                            help="Spread of the log-normal product popularity.")
+        parser.add_argument('--basket-mean', type=float, default=2.5, help="Mean distinct products per order.")
+        parser.add_argument('--max-basket', type=int, default=10, help="Most distinct products per order.")
+        parser.add_argument('--price-median', default='25', help="Median product price.")
+        parser.add_argument('--price-sigma', type=float, default=1.0, help="Spread of the log-normal prices.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        for name in ('customers', 'products', 'orders', 'days'):
+            if options[name] < 0:
+                raise CommandError(f"--{name} can't be negative")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        if options['basket_mean'] < 1 or options['max_basket'] < 1:
+            raise CommandError("--basket-mean and --max-basket must be at least 1")
+        if options['growth'] < 0:
+            raise CommandError("--growth can't be negative")
+        try:
+            price_median = Decimal(options['price_median'])
+        except InvalidOperation:
+            price_median = None
+        if price_median is None or price_median <= 0:
+            raise CommandError(f"--price-median expects a positive number, got {options['price_median']!r}")
+        end = None
+        if options['end']:
+            end = parse_date(options['end'])
+            if end is None:
+                raise CommandError(f"--end expects YYYY-MM-DD, got {options['end']!r}")
+
+        progress = None
+        last_report = time.monotonic()
+        try:
+            for progress in seed_crm(
+                customers=options['customers'], products=options['products'], orders=options['orders'],
+                seed=options['seed'], end=end, days=options['days'], growth=options['growth'],
+                customer_sigma=options['customer_sigma'], product_sigma=options['product_sigma'],
+                basket_mean=options['basket_mean'], max_basket=options['max_basket'],
+                price_median=price_median, price_sigma=options['price_sigma'],
+                batch_size=options['batch_size'],
+            ):
+                if time.monotonic() - last_report >= 5:
+                    last_report = time.monotonic()
+                    self.stdout.write(self.summary(progress))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if progress is None:
+            self.stdout.write("Nothing to add")
+            return
+        self.stdout.write(self.style.SUCCESS(self.summary(progress)))
+
+    @staticmethod
+    def summary(progress):
+        return (f"{progress['customers']} customers, {progress['products']} products, "
+                f"{progress['orders']} orders with {progress['order_products']} order products "
+                f"({progress['orders_per_second']:.0f} orders/s)")
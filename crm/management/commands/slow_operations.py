@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from crm.slow_operations import get_config, read_entries, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize the slow-operation log by document fingerprint: how often "
+        "each operation was slow, how slow, and the slowest sample's SQL plan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help="Log to read, with its rotated files; default: LOG_FILE.")
+        parser.add_argument('--top', type=int, default=10, help="Number of fingerprints to show.")
+        parser.add_argument('--plans', action='store_true',
+                            help="Also print the EXPLAIN plans of each group's slowest sample.")
+
+    def handle(self, *args, **options):
+        path = options['file'] or get_config()['LOG_FILE']
+        summary = summarize(read_entries(path))
+        if not summary:
+            self.stdout.write(f"No slow operations in {path}")
+            return
+
+        self.stdout.write(
+            f"{'fingerprint':<16}  {'operation':<24} {'count':>6} {'p50 ms':>9} "
+            f"{'max ms':>9} {'total ms':>10} {'queries':>8}"
+        )
+        for group in summary[:options['top']]:
+            self.stdout.write(
+                f"{group['fingerprint'] or '-':<16}  {group['operation'] or '-':<24} {group['count']:>6} "
+                f"{group['p50_ms']:>9.1f} {group['max_ms']:>9.1f} {group['total_ms']:>10.1f} "
+                f"{group['mean_sql_count']:>8.1f}"
+            )
+            if options['plans']:
+                for explained in group['slowest']['explain']:
+                    self.stdout.write(f"    {explained['duration_ms']:.1f} ms  {explained['sql']}")
+                    for line in explained['plan']:
+                        self.stdout.write(f"        {line}")
+        self.stdout.write(f"{len(summary)} fingerprint(s), {sum(g['count'] for g in summary)} slow request(s)")
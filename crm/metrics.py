@@ -0,0 +1,373 @@
+# crm/metrics.py
+
+"""
+Per-operation metrics for the GraphQL endpoints, exposed in the Prometheus
+text format on ``/metrics``.
+
+``GraphQLMetricsMiddleware`` (Django) times each request to the GraphQL
+endpoints, counts and times its SQL with a ``connection.execute_wrapper``
+and measures the response body. ``ResolverTimingMiddleware`` (graphene) times
+root fields and the relation fields of the types in ``crm.schema``; scalar
+fields are not timed, they only read attributes. A field's resolver time is
+its total over the request (``CustomerType.orders`` summed over every
+customer on the page; concurrent async resolvers overlap). Everything is
+labelled with the operation name from the document:
+
+* ``crm_graphql_request_duration_seconds{operation}``
+* ``crm_graphql_resolver_duration_seconds{operation, field}``
+* ``crm_graphql_sql_queries{operation}``
+* ``crm_graphql_sql_duration_seconds{operation}``
+* ``crm_graphql_response_size_bytes{operation}``
+
+Label cardinality is bounded: the first ``MAX_OPERATIONS`` operation names
+get their own series and later ones are counted as ``other``; unnamed
+operations are ``anonymous`` and requests that never reach execution (parse
+or persisted-query errors) are ``unknown``. ``field`` ranges over the schema.
+
+Histograms live in process memory, so every worker process serves its own;
+scrape each worker, or run one. When disabled the Django middleware removes
+itself at startup (``MiddlewareNotUsed``), no resolver is wrapped and
+``/metrics`` answers 404.
+
+Settings (all optional)::
+
+    GRAPHQL_METRICS = {
+        'ENABLED': False,
+        'PATH_PREFIX': '/graphql',
+        'MAX_OPERATIONS': 50,
+        'DURATION_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+        'TOKEN': None,  # when set, /metrics requires "Authorization: Bearer <TOKEN>"
+    }
+"""
+
+import inspect
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from graphql import get_named_type, is_leaf_type
+
+DEFAULTS = {
+    'ENABLED': False,
+    'PATH_PREFIX': '/graphql',
+    'MAX_OPERATIONS': 50,
+    'DURATION_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'TOKEN': None,
+}
+
+SQL_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+OTHER = 'other'
+ANONYMOUS = 'anonymous'
+UNKNOWN = 'unknown'
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'GRAPHQL_METRICS', {}))
+    return config
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """A Prometheus histogram with fixed label names; thread-safe."""
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        """Record ``value`` for the label values ``labels`` (a tuple)."""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (not yet cumulative), count, sum
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def samples(self):
+        """Yield ``(suffix, labels, value)`` in exposition order."""
+        with self._lock:
+            series = sorted((labels, list(counts), count, total) for labels, (counts, count, total) in self._series.items())
+        for labels, counts, count, total in series:
+            pairs = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield '_bucket', pairs + [('le', _format(bound))], cumulative
+            yield '_bucket', pairs + [('le', '+Inf')], count
+            yield '_count', pairs, count
+            yield '_sum', pairs, total
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for suffix, pairs, value in self.samples():
+            labels = ','.join(f'{key}="{_escape(str(label))}"' for key, label in pairs)
+            lines.append(f'{self.name}{suffix}{{{labels}}} {_format(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class Registry:
+    """The GraphQL histograms, plus the operation names given their own series."""
+
+    def __init__(self, config=None):
+        self.settings = None
+        self.configure(config or DEFAULTS)
+
+    def configure(self, config):
+        """Set buckets and label limits; recorded data is kept unless they change."""
+        durations = tuple(config['DURATION_BUCKETS'])
+        if self.settings == (durations, config['MAX_OPERATIONS']):
+            return
+        self.settings = (durations, config['MAX_OPERATIONS'])
+        self.max_operations = config['MAX_OPERATIONS']
+        self.request_duration = Histogram(
+            'crm_graphql_request_duration_seconds', "Wall time of GraphQL requests.",
+            ['operation'], durations,
+        )
+        self.resolver_duration = Histogram(
+            'crm_graphql_resolver_duration_seconds', "Time spent in root and relation resolvers.",
+            ['operation', 'field'], durations,
+        )
+        self.sql_queries = Histogram(
+            'crm_graphql_sql_queries', "SQL queries issued per GraphQL request.",
+            ['operation'], SQL_QUERY_BUCKETS,
+        )
+        self.sql_duration = Histogram(
+            'crm_graphql_sql_duration_seconds', "Time spent in SQL per GraphQL request.",
+            ['operation'], durations,
+        )
+        self.response_size = Histogram(
+            'crm_graphql_response_size_bytes', "Size of GraphQL response bodies.",
+            ['operation'], SIZE_BUCKETS,
+        )
+        self._operations = set()
+        self._lock = threading.Lock()
+
+    @property
+    def histograms(self):
+        return [self.request_duration, self.resolver_duration, self.sql_queries, self.sql_duration, self.response_size]
+
+    def operation_label(self, name):
+        """``name``, or ``other`` once ``MAX_OPERATIONS`` names have series."""
+        if name in self._operations:
+            return name
+        with self._lock:
+            if len(self._operations) < self.max_operations:
+                self._operations.add(name)
+                return name
+        return OTHER
+
+    def clear(self):
+        with self._lock:
+            self._operations.clear()
+        for histogram in self.histograms:
+            histogram.clear()
+
+    def render(self):
+        return ''.join(histogram.render() for histogram in self.histograms)
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """What one GraphQL request has done so far."""
+
+    __slots__ = ('operation', 'queries', 'sql_seconds', 'resolvers')
+
+    def __init__(self):
+        self.operation = UNKNOWN
+        self.queries = 0
+        self.sql_seconds = 0.0
+        # "Type.field" -> seconds
+        self.resolvers = {}
+
+
+# Set by GraphQLMetricsMiddleware for the duration of a request. Context
+# variables are copied into sync_to_async threads, so the async view's ORM
+# queries are attributed to their request too.
+_current = ContextVar('crm_graphql_metrics', default=None)
+
+
+def set_operation(operation_ast):
+    """Label the current request with the operation about to run, if recording."""
+    current = _current.get()
+    if current is None:
+        return
+    name = operation_ast.name.value if operation_ast is not None and operation_ast.name else ANONYMOUS
+    current.operation = registry.operation_label(name)
+
+
+def resolver_middleware():
+    """Graphene middleware to run for the current request: ``[]`` unless recording."""
+    current = _current.get()
+    return [ResolverTimingMiddleware(current)] if current is not None else []
+
+
+def record_sql(execute, sql, params, many, context):
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current.sql_seconds += time.perf_counter() - start
+        current.queries += 1
+
+
+def _instrument(sender=None, connection=None, **kwargs):
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+def instrument_connections():
+    """Install ``record_sql`` on every connection, current and future."""
+    connection_created.connect(_instrument, dispatch_uid='crm.metrics')
+    for connection in connections.all(initialized_only=True):
+        _instrument(connection=connection)
+
+
+class ResolverTimingMiddleware:
+    """
+    Graphene middleware summing the time spent in root and relation fields
+    into ``current``; the sums are observed once per field when the request
+    ends.
+    """
+
+    # (parent type, field) -> "Type.field", or None for fields not timed
+    _labels = {}
+
+    def __init__(self, current):
+        self.current = current
+
+    def resolve(self, next, root, info, **kwargs):
+        key = (info.parent_type.name, info.field_name)
+        try:
+            label = self._labels[key]
+        except KeyError:
+            label = self._labels[key] = self._label(info)
+        if label is None:
+            return next(root, info, **kwargs)
+        start = time.perf_counter()
+        result = next(root, info, **kwargs)
+        if inspect.isawaitable(result):
+            return self._await(result, label, start)
+        self._add(label, start)
+        return result
+
+    async def _await(self, result, label, start):
+        try:
+            return await result
+        finally:
+            self._add(label, start)
+
+    def _add(self, label, start):
+        resolvers = self.current.resolvers
+        resolvers[label] = resolvers.get(label, 0.0) + time.perf_counter() - start
+
+    @staticmethod
+    def _label(info):
+        schema = info.schema
+        root = info.parent_type in (schema.query_type, schema.mutation_type)
+        if root or not is_leaf_type(get_named_type(info.return_type)):
+            return f'{info.parent_type.name}.{info.field_name}'
+        return None
+
+
+class GraphQLMetricsMiddleware:
+    """Django middleware recording requests to ``PATH_PREFIX``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.path_prefix = config['PATH_PREFIX']
+        registry.configure(config)
+        instrument_connections()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not request.path.startswith(self.path_prefix):
+            return self.get_response(request)
+        current = RequestMetrics()
+        token = _current.set(current)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._observe(current, start, response)
+        return response
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.path_prefix):
+            return await self.get_response(request)
+        current = RequestMetrics()
+        token = _current.set(current)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._observe(current, start, response)
+        return response
+
+    @staticmethod
+    def _observe(current, start, response):
+        labels = (current.operation,)
+        registry.request_duration.observe(labels, time.perf_counter() - start)
+        registry.sql_queries.observe(labels, current.queries)
+        registry.sql_duration.observe(labels, current.sql_seconds)
+        if not response.streaming:
+            registry.response_size.observe(labels, len(response.content))
+        for field, seconds in current.resolvers.items():
+            registry.resolver_duration.observe((current.operation, field), seconds)
+
+
+def metrics_view(request):
+    """The histograms in the Prometheus text format."""
+    config = get_config()
+    if not config['ENABLED']:
+        raise Http404
+    if config['TOKEN'] and request.headers.get('Authorization') != f"Bearer {config['TOKEN']}":
+        return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:00
+
+from django.db import migrations
+
+# The text indexes behind crm/search.py, frozen as of this migration. A
+# change to SEARCH_FIELDS or to a backend's indexes needs a new migration.
+INSTALL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE crm_customer_fts USING fts5(name, email, content='crm_customer', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER crm_customer_fts_ai AFTER INSERT ON crm_customer BEGIN "
+        "INSERT INTO crm_customer_fts(rowid, name, email) VALUES (new.id, new.name, new.email); END",
+        "CREATE TRIGGER crm_customer_fts_ad AFTER DELETE ON crm_customer BEGIN "
+        "INSERT INTO crm_customer_fts(crm_customer_fts, rowid, name, email) "
+        "VALUES ('delete', old.id, old.name, old.email); END",
+        # Only text changes touch the index; stock and price updates don't
+        "CREATE TRIGGER crm_customer_fts_au AFTER UPDATE OF name, email ON crm_customer BEGIN "
+        "INSERT INTO crm_customer_fts(crm_customer_fts, rowid, name, email) "
+        "VALUES ('delete', old.id, old.name, old.email); "
+        "INSERT INTO crm_customer_fts(rowid, name, email) VALUES (new.id, new.name, new.email); END",
+        "INSERT INTO crm_customer_fts(crm_customer_fts) VALUES ('rebuild')",
+        "CREATE VIRTUAL TABLE crm_product_fts USING fts5(name, content='crm_product', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER crm_product_fts_ai AFTER INSERT ON crm_product BEGIN "
+        "INSERT INTO crm_product_fts(rowid, name) VALUES (new.id, new.name); END",
+        "CREATE TRIGGER crm_product_fts_ad AFTER DELETE ON crm_product BEGIN "
+        "INSERT INTO crm_product_fts(crm_product_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+        "CREATE TRIGGER crm_product_fts_au AFTER UPDATE OF name ON crm_product BEGIN "
+        "INSERT INTO crm_product_fts(crm_product_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        "INSERT INTO crm_product_fts(rowid, name) VALUES (new.id, new.name); END",
+        "INSERT INTO crm_product_fts(crm_product_fts) VALUES ('rebuild')",
+    ],
+    'postgresql': [
+        "CREATE INDEX IF NOT EXISTS crm_customer_search_idx ON crm_customer "
+        "USING GIN (to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(email, '')))",
+        "CREATE INDEX IF NOT EXISTS crm_product_search_idx ON crm_product "
+        "USING GIN (to_tsvector('simple', coalesce(name, '')))",
+    ],
+}
+
+UNINSTALL = {
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS crm_customer_fts_ai',
+        'DROP TRIGGER IF EXISTS crm_customer_fts_ad',
+        'DROP TRIGGER IF EXISTS crm_customer_fts_au',
+        'DROP TABLE IF EXISTS crm_customer_fts',
+        'DROP TRIGGER IF EXISTS crm_product_fts_ai',
+        'DROP TRIGGER IF EXISTS crm_product_fts_ad',
+        'DROP TRIGGER IF EXISTS crm_product_fts_au',
+        'DROP TABLE IF EXISTS crm_product_fts',
+    ],
+    'postgresql': [
+        'DROP INDEX IF EXISTS crm_customer_search_idx',
+        'DROP INDEX IF EXISTS crm_product_search_idx',
+    ],
+}
+
+
+def run_for_vendor(statements):
+    # Other databases search with unindexed icontains filters
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_for_vendor(INSTALL), run_for_vendor(UNINSTALL)),
+    ]
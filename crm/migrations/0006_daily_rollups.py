@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:04
+
+from collections import defaultdict
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    Customer = apps.get_model('crm', 'Customer')
+    Order = apps.get_model('crm', 'Order')
+    DailyCrmRollup = apps.get_model('crm', 'DailyCrmRollup')
+    DailyProductRollup = apps.get_model('crm', 'DailyProductRollup')
+    Through = Order._meta.get_field('products').remote_field.through
+
+    days = defaultdict(lambda: DailyCrmRollup(revenue=Decimal('0')))
+    orders = (
+        Order.objects.annotate(day=TruncDate('order_date')).values('day')
+        .annotate(orders=Count('id'), revenue=Sum('total_amount')).order_by()
+    )
+    for row in orders:
+        days[row['day']].orders = row['orders']
+        days[row['day']].revenue = row['revenue'] or Decimal('0')
+    customers = (
+        Customer.objects.annotate(day=TruncDate('created_at')).values('day')
+        .annotate(new_customers=Count('id')).order_by()
+    )
+    for row in customers:
+        days[row['day']].new_customers = row['new_customers']
+    for day, rollup in days.items():
+        rollup.date = day
+    DailyCrmRollup.objects.bulk_create(days.values(), batch_size=1000)
+
+    units = (
+        Through.objects.annotate(day=TruncDate('order__order_date')).values('day', 'product_id')
+        .annotate(units=Count('id')).order_by()
+    )
+    DailyProductRollup.objects.bulk_create(
+        (DailyProductRollup(date=row['day'], product_id=row['product_id'], units=row['units']) for row in units),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCrmRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('new_customers', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='crm.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='crm_product_rollup_day_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
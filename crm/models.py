@@ -9,6 +9,12 @@ class Customer(models.Model):
     phone = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Serves keyset pagination over (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='crm_customer_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -18,6 +24,13 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # Serve the ProductFilter range filters and the low-stock restock
+            models.Index(fields=['stock'], name='crm_product_stock_idx'),
+            models.Index(fields=['price'], name='crm_product_price_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -28,5 +41,51 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     order_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Serves keyset pagination over (order_date, id)
+            models.Index(fields=['order_date', 'id'], name='crm_order_date_id_idx'),
+            # A customer's orders by date (reminders, cleanup, per-customer history)
+            models.Index(fields=['customer', 'order_date'], name='crm_order_customer_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.id} - {self.customer.name}"
+
+
+class ImportCheckpoint(models.Model):
+    """How far ``manage.py import_crm`` got through one input file."""
+    source = models.CharField(max_length=255, unique=True)
+    kind = models.CharField(max_length=20)
+    rows_done = models.BigIntegerField(default=0)
+    rows_rejected = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} from {self.source}: {self.rows_done} rows"
+
+
+class DailyCrmRollup(models.Model):
+    """Orders, revenue and sign-ups of one local day (see crm/rollups.py)."""
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    new_customers = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} orders, {self.revenue} revenue"
+
+
+class DailyProductRollup(models.Model):
+    """Units of one product ordered on one local day (see crm/rollups.py)."""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_rollups')
+    units = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='crm_product_rollup_day_uniq'),
+        ]
+
     def __str__(self):
-        return f"Order {self.id} - {self.customer.name}"
\ No newline at end of file
+        return f"{self.date}: {self.units} x {self.product_id}"
@@ -0,0 +1,266 @@
+# crm/optimizer.py
+
+"""
+Selection-set-aware queryset optimizer.
+
+Walks the fields a client actually selected on a connection (through
+``edges { node { ... } }``, fragments included) and plans the queryset to
+match: ``.only()`` for the selected columns, ``select_related`` for forward
+foreign keys and nested ``Prefetch`` querysets for reverse and many-to-many
+connections. Fields that do not map to a model field are ignored, so custom
+resolvers keep working and simply fall back to the DataLoaders.
+
+A nested connection's prefetch reads only the ``PageWindow`` of each
+parent's rows its ``first``/``last``/cursor arguments select, and stores it
+under ``page_attr(accessor, window)`` for the loaders to pick up.
+"""
+
+from collections.abc import Sequence
+from typing import NamedTuple, Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.settings import graphene_settings
+from graphql import value_from_ast_untyped
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+from graphql_relay import get_offset_with_default
+
+
+def optimize_queryset(queryset, info):
+    """Apply the plan for the connection currently being resolved."""
+    fields = connection_node_fields(info, info.field_nodes)
+    only, related, prefetches = plan_selection(queryset.model, fields, info)
+    return apply_plan(queryset, only, related, prefetches)
+
+
+def apply_plan(queryset, only, related, prefetches):
+    """Apply a plan returned by ``plan_selection`` to ``queryset``."""
+    queryset = queryset.only(*only)
+    # select_related() without arguments would follow every foreign key
+    if related:
+        queryset = queryset.select_related(*related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+def ensure_loaded(queryset, fields):
+    """Add ``fields`` to a queryset's ``.only()`` projection, if it has one."""
+    names, defer = queryset.query.deferred_loading
+    if defer:
+        return queryset
+    return queryset.only(*names, *fields)
+
+
+def collect_fields(info, field_nodes):
+    """Merge the sub-selections of ``field_nodes`` into ``{name: [FieldNode]}``."""
+    fields = {}
+
+    def visit(selection_set):
+        if selection_set is None:
+            return
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                fields.setdefault(selection.name.value, []).append(selection)
+            elif isinstance(selection, InlineFragmentNode):
+                visit(selection.selection_set)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = info.fragments.get(selection.name.value)
+                if fragment is not None:
+                    visit(fragment.selection_set)
+
+    for field_node in field_nodes:
+        visit(field_node.selection_set)
+    return fields
+
+
+def connection_node_fields(info, field_nodes):
+    """Return the fields selected on ``edges { node { ... } }`` of a connection."""
+    edges = collect_fields(info, field_nodes).get('edges', [])
+    nodes = collect_fields(info, edges).get('node', [])
+    return collect_fields(info, nodes)
+
+
+def plan_selection(model, fields, info):
+    """
+    Return ``(only, select_related, prefetches)`` for ``model`` given the
+    selected ``fields``. Nested relations are planned recursively.
+    """
+    only = {model._meta.pk.name}
+    related = []
+    prefetches = []
+
+    for name, field_nodes in fields.items():
+        try:
+            field = model._meta.get_field(to_snake_case(name))
+        except FieldDoesNotExist:
+            continue
+
+        if not field.is_relation:
+            only.add(field.name)
+        elif field.many_to_one or (field.one_to_one and field.concrete):
+            sub_only, sub_related, sub_prefetches = plan_selection(
+                field.related_model, collect_fields(info, field_nodes), info
+            )
+            only.add(field.name)
+            only.update(f"{field.name}__{column}" for column in sub_only)
+            related.append(field.name)
+            related.extend(f"{field.name}__{path}" for path in sub_related)
+            prefetches.extend(
+                Prefetch(
+                    f"{field.name}__{prefetch.prefetch_through}",
+                    queryset=prefetch.queryset, to_attr=prefetch.to_attr,
+                )
+                for prefetch in sub_prefetches
+            )
+        elif field.one_to_many or field.many_to_many:
+            related_model = field.related_model
+            sub_only, sub_related, sub_prefetches = plan_selection(
+                related_model, connection_node_fields(info, field_nodes), info
+            )
+            if field.one_to_many:
+                # The reverse FK has to be loaded to attach rows to their parent
+                sub_only.add(field.field.name)
+            accessor = field.name if field.concrete else field.get_accessor_name()
+            # The lookup the prefetch filters the related rows by
+            partition = field.related_query_name() if field.concrete else field.field.name
+            # Aliases of the field may page differently; each window is prefetched once
+            windows = dict.fromkeys(
+                page_window(field_arguments(node, info), graphene_settings.RELAY_CONNECTION_MAX_LIMIT)
+                for node in field_nodes
+            )
+            for window in windows:
+                queryset = apply_plan(
+                    window_queryset(related_model._default_manager.all(), partition, window),
+                    sub_only, sub_related, sub_prefetches,
+                )
+                prefetches.append(Prefetch(accessor, queryset=queryset, to_attr=page_attr(accessor, window)))
+
+    return only, related, prefetches
+
+
+def field_arguments(field_node, info):
+    """The arguments of ``field_node`` with variables substituted."""
+    return {
+        argument.name.value: value_from_ast_untyped(argument.value, info.variable_values)
+        for argument in field_node.arguments
+    }
+
+
+class PageWindow(NamedTuple):
+    """
+    The rows of one parent a nested connection page can show, by 0-based
+    position in primary-key order: ``start <= position < stop`` (``stop`` is
+    ``None`` for the end) and, when ``last`` is set, among the last ``last``.
+    """
+    start: int
+    stop: Optional[int]
+    last: Optional[int]
+
+
+def page_window(args, max_limit):
+    """
+    The ``PageWindow`` graphene-django's slicing of a connection with
+    ``args`` reads, with ``first``/``last`` capped at ``max_limit`` and
+    defaulting to it like graphene-django does.
+    """
+    first, last = args.get('first'), args.get('last')
+    if max_limit is not None:
+        if first is None and last is None:
+            first = max_limit
+        first = None if first is None else min(first, max_limit)
+        last = None if last is None else min(last, max_limit)
+
+    after = get_offset_with_default(args.get('after'), -1)
+    if args.get('offset'):
+        # graphene-django turns offset into an after cursor
+        after = args['offset'] - 1 + (after + 1 if args.get('after') else 0)
+    start = max(after + 1, 0)
+    stop = get_offset_with_default(args.get('before'), -1)
+    stop = stop if stop >= 0 else None
+
+    if first is not None:
+        stop = start + max(first, 0) if stop is None else min(stop, start + max(first, 0))
+    if last is not None and stop is not None:
+        start = max(start, stop - max(last, 0))
+        last = None
+    return PageWindow(start, stop, last)
+
+
+def window_queryset(queryset, partition, window, order_by='pk'):
+    """
+    Restrict ``queryset`` to the rows of ``window`` of each ``partition``
+    value, ordered by ``order_by``. Each row is annotated with its 1-based
+    ``_crm_position`` and its partition's ``_crm_total``.
+    """
+    queryset = queryset.annotate(
+        _crm_position=Window(RowNumber(), partition_by=F(partition), order_by=F(order_by).asc()),
+        _crm_total=Window(Count('pk'), partition_by=F(partition)),
+    ).filter(_crm_position__gt=window.start)
+    if window.stop is not None:
+        queryset = queryset.filter(_crm_position__lte=window.stop)
+    if window.last is not None:
+        queryset = queryset.filter(_crm_position__gt=F('_crm_total') - window.last)
+    return queryset.order_by(order_by)
+
+
+PAGE_ATTR_PREFIX = '_crm_page_'
+
+
+def page_attr(accessor, window):
+    """The attribute a prefetched ``window`` of ``accessor`` is stored under."""
+    return f"{PAGE_ATTR_PREFIX}{accessor}_{window.start}_{window.stop}_{window.last}"
+
+
+def prefetched_pages(instance, accessor):
+    """Yield ``(window, rows)`` for each page of ``accessor`` prefetched onto ``instance``."""
+    prefix = f"{PAGE_ATTR_PREFIX}{accessor}_"
+    for attr, rows in vars(instance).items():
+        parts = attr[len(prefix):].split('_') if attr.startswith(prefix) else ()
+        if len(parts) == 3:
+            start, stop, last = (None if part == 'None' else int(part) for part in parts)
+            yield PageWindow(start, stop, last), rows
+
+
+class WindowedRows(Sequence):
+    """
+    The rows of one window of a relation, standing in for the whole relation
+    of ``total`` rows so connection slicing and cursors keep their offsets.
+    Only positions inside the window can be read.
+    """
+
+    def __init__(self, rows, start, total):
+        self.rows = list(rows)
+        self.start = start
+        self.total = total
+
+    @classmethod
+    def from_annotated(cls, annotated, rows=None):
+        """Build from ``window_queryset`` rows (or ``rows`` read through them)."""
+        annotated = list(annotated)
+        if not annotated:
+            return cls([], 0, 0)
+        first = annotated[0]
+        return cls(annotated if rows is None else rows, first._crm_position - 1, first._crm_total)
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            begin, end, step = index.indices(self.total)
+            if step != 1:
+                raise ValueError("WindowedRows only supports contiguous slices")
+            end = max(begin, end)
+            rows = self.rows[max(begin - self.start, 0):max(end - self.start, 0)]
+            return WindowedRows(rows, max(self.start - begin, 0), end - begin)
+        if index < 0:
+            index += self.total
+        if not self.start <= index < self.start + len(self.rows):
+            raise IndexError(f"Position {index} is outside the fetched window")
+        return self.rows[index - self.start]
+
+    def __iter__(self):
+        return iter(self.rows)
@@ -0,0 +1,202 @@
+# crm/pagination.py
+
+"""
+Keyset (seek) pagination for relay connections.
+
+Offset cursors make the database walk and discard every earlier row, so deep
+pages get linearly slower and shift under concurrent inserts. Keyset cursors
+instead encode the sort key of the last row seen, e.g. ``(order_date, id)``,
+and the next page is a range scan starting right after it.
+"""
+
+import json
+from base64 import b64decode, b64encode
+from functools import partial, reduce
+from operator import or_
+
+from django.db.models import Q
+from graphene.relay import PageInfo
+from graphene.relay.connection import connection_adapter, page_info_adapter
+from graphql import GraphQLError
+from graphql_relay import connection_from_array_slice, cursor_to_offset, get_offset_with_default, offset_to_cursor
+
+from .optimizer import ensure_loaded
+
+CURSOR_PREFIX = 'keyset:'
+
+
+def encode_cursor(instance, keyset_fields):
+    values = [getattr(instance, field) for field in keyset_fields]
+    payload = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return b64encode((CURSOR_PREFIX + payload).encode()).decode()
+
+
+def decode_cursor(cursor, model, keyset_fields):
+    try:
+        raw = b64decode(cursor.encode()).decode()
+        if not raw.startswith(CURSOR_PREFIX):
+            raise ValueError(raw)
+        values = json.loads(raw[len(CURSOR_PREFIX):])
+        if len(values) != len(keyset_fields):
+            raise ValueError(values)
+        return [
+            model._meta.get_field(field).to_python(value)
+            for field, value in zip(keyset_fields, values)
+        ]
+    except Exception:
+        raise GraphQLError(f"Invalid keyset cursor: {cursor}")
+
+
+def seek(keyset_fields, values, direction):
+    """
+    Build the row-value comparison ``(a, b) > (x, y)`` (or ``<``) as
+    ``a >= x AND (a > x OR (a = x AND b > y))``. The redundant leading bound
+    lets the database start an index range scan on ``(a, b)`` at the cursor
+    instead of filtering the OR row by row.
+    """
+    lookup = 'gt' if direction == 'after' else 'lt'
+    clauses = []
+    for position, field in enumerate(keyset_fields):
+        equal = {name: value for name, value in zip(keyset_fields[:position], values)}
+        equal[f'{field}__{lookup}'] = values[position]
+        clauses.append(Q(**equal))
+    condition = reduce(or_, clauses)
+    if len(keyset_fields) > 1:
+        condition = Q(**{f'{keyset_fields[0]}__{lookup}e': values[0]}) & condition
+    return condition
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated connection: ``queryset`` fetches the rows
+    (plus one to tell whether another page exists) and ``connection()`` turns
+    them into the relay connection. Fetching is left to the caller so the
+    same page can be read with the sync or the async ORM.
+
+    Only ``first``/``after`` and ``last``/``before`` are honoured, and no
+    COUNT query is issued.
+    """
+
+    def __init__(self, queryset, keyset_fields, args, max_limit=None):
+        if args.get('offset') is not None:
+            raise GraphQLError("The `offset` argument cannot be combined with keyset pagination")
+
+        model = queryset.model
+        # Cursors are built from the keyset columns, so they must not be deferred
+        queryset = ensure_loaded(queryset, keyset_fields)
+        first = args.get('first')
+        last = args.get('last')
+        after = args.get('after')
+        before = args.get('before')
+        if first is None and last is None:
+            if max_limit is None:
+                raise GraphQLError("You must provide a `first` or `last` value for keyset pagination")
+            first = max_limit
+        for name, value in (('first', first), ('last', last)):
+            if value is not None and max_limit is not None and value > max_limit:
+                raise GraphQLError(
+                    f"Requesting {value} records exceeds the `{name}` limit of {max_limit} records."
+                )
+
+        if after:
+            queryset = queryset.filter(seek(keyset_fields, decode_cursor(after, model, keyset_fields), 'after'))
+        if before:
+            queryset = queryset.filter(seek(keyset_fields, decode_cursor(before, model, keyset_fields), 'before'))
+
+        self.keyset_fields = keyset_fields
+        self.first, self.last, self.after, self.before = first, last, after, before
+        self.backwards = last is not None and first is None
+        if self.backwards:
+            descending = [f'-{field}' for field in keyset_fields]
+            self.queryset = queryset.order_by(*descending)[:last + 1]
+        else:
+            self.queryset = queryset.order_by(*keyset_fields)[:first + 1]
+
+    def connection(self, connection, rows):
+        first, last = self.first, self.last
+        if self.backwards:
+            has_previous_page = len(rows) > last
+            rows = rows[:last][::-1]
+            has_next_page = bool(self.before)
+        else:
+            has_next_page = len(rows) > first
+            rows = rows[:first]
+            if last is not None:
+                rows = rows[-last:]
+            has_previous_page = bool(self.after)
+
+        edges = [
+            connection.Edge(node=row, cursor=encode_cursor(row, self.keyset_fields))
+            for row in rows
+        ]
+        page_info = PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        )
+        return connection(edges=edges, page_info=page_info)
+
+
+def paginate_keyset(queryset, keyset_fields, connection, args, max_limit=None):
+    """Slice ``queryset`` into a relay connection using keyset cursors."""
+    page = KeysetPage(queryset, keyset_fields, args, max_limit)
+    return page.connection(connection, list(page.queryset))
+
+
+async def apaginate_keyset(queryset, keyset_fields, connection, args, max_limit=None):
+    """``paginate_keyset`` reading the page with the async ORM."""
+    page = KeysetPage(queryset, keyset_fields, args, max_limit)
+    return page.connection(connection, [row async for row in page.queryset])
+
+
+def offset_page_bounds(args, array_length):
+    """
+    Return the ``(start, end)`` rows ``connection_from_array_slice`` keeps
+    for ``args`` out of ``array_length``, so only that window is fetched.
+    """
+    start = min(get_offset_with_default(args.get('after'), -1) + 1, array_length)
+    end = array_length
+    before = get_offset_with_default(args.get('before'), end)
+    if 0 <= before < array_length:
+        end = min(end, before)
+    if isinstance(args.get('first'), int):
+        end = min(end, start + args['first'])
+    if isinstance(args.get('last'), int):
+        start = max(start, end - args['last'])
+    return start, max(start, end)
+
+
+async def aresolve_connection(connection, args, queryset, max_limit=None):
+    """
+    graphene-django's ``DjangoConnectionField.resolve_connection`` for
+    async execution: the count is ``acount()`` and the page is read with
+    ``async for``, fetching only the rows the page returns.
+    """
+    # Convert the offset argument into an after cursor, as graphene-django does
+    offset = args.pop('offset', None)
+    after = args.get('after')
+    if offset:
+        if after:
+            offset += cursor_to_offset(after) + 1
+        args['after'] = offset_to_cursor(offset - 1)
+
+    array_length = await queryset.acount()
+    if max_limit is not None and args.get('first') is None and args.get('last') is None:
+        args['first'] = max_limit
+
+    start, end = offset_page_bounds(args, array_length)
+    rows = [row async for row in queryset[start:end]]
+    resolved = connection_from_array_slice(
+        rows,
+        args,
+        slice_start=start,
+        array_length=array_length,
+        array_slice_length=len(rows),
+        connection_type=partial(connection_adapter, connection),
+        edge_type=connection.Edge,
+        page_info_type=page_info_adapter,
+    )
+    resolved.iterable = queryset
+    resolved.length = array_length
+    return resolved
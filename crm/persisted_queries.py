@@ -0,0 +1,169 @@
+# crm/persisted_queries.py
+
+"""
+Persisted queries and a parsed-document cache for the GraphQL endpoint.
+
+Clients may send ``extensions.persistedQuery.sha256Hash`` instead of (or along
+with) the query text, following the automatic persisted queries protocol:
+an unknown hash is answered with ``PersistedQueryNotFound`` and the client
+retries with the full text, which is then registered under its hash.
+
+Independently of how the text arrives, parsed and validated documents are
+kept in a bounded LRU keyed by the SHA-256 of the text, so repeated documents
+skip parsing and validation entirely.
+
+Settings (all optional)::
+
+    GRAPHQL_PERSISTED_QUERIES = {
+        'CACHE_SIZE': 1000,    # parsed documents kept in memory; 0 disables
+        'ALLOW_LIST': None,    # path to a JSON {sha256: query} manifest
+        'CACHE_ALIAS': 'default',
+        'TIMEOUT': 86400,      # seconds a registered query text is kept
+    }
+
+With ``ALLOW_LIST`` set, only documents from the manifest are executed and
+nothing new is registered.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import GraphQLError, parse, validate
+
+DEFAULTS = {
+    'CACHE_SIZE': 1000,
+    'ALLOW_LIST': None,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 60 * 24,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'GRAPHQL_PERSISTED_QUERIES', {}))
+    return config
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+class PersistedQueryError(GraphQLError):
+    def __init__(self, message, code):
+        super().__init__(message, extensions={'code': code})
+
+
+class DocumentCache:
+    """Thread-safe LRU of ``sha256 -> (document, validation_errors)``."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_parse(self, schema, query, key, validation_rules=None, max_errors=None):
+        """
+        Return ``(document, errors)`` for ``query``. Syntax errors raise
+        ``GraphQLError`` and are never cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        document = parse(query)
+        errors = validate(schema, document, validation_rules, max_errors=max_errors)
+        entry = (document, errors)
+
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PersistedQueryStore:
+    """Resolves hashes to query texts from the allow-list or the Django cache."""
+
+    def __init__(self, config):
+        self.cache = caches[config['CACHE_ALIAS']]
+        self.timeout = config['TIMEOUT']
+        self.allow_list = None
+        if config['ALLOW_LIST']:
+            with open(config['ALLOW_LIST']) as manifest:
+                self.allow_list = json.load(manifest)
+
+    def get(self, sha256):
+        if self.allow_list is not None:
+            return self.allow_list.get(sha256)
+        return self.cache.get(f'graphql:apq:{sha256}')
+
+    def register(self, sha256, query):
+        if self.allow_list is None:
+            self.cache.set(f'graphql:apq:{sha256}', query, self.timeout)
+
+    def is_allowed(self, sha256):
+        return self.allow_list is None or sha256 in self.allow_list
+
+
+def requested_hash(data):
+    """Return the persisted query hash from a request body, if any."""
+    extensions = data.get('extensions') or {}
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise PersistedQueryError("Invalid extensions", 'BAD_REQUEST')
+    persisted = extensions.get('persistedQuery') or {}
+    if not persisted:
+        return None
+    if persisted.get('version', 1) != 1:
+        raise PersistedQueryError("Unsupported persisted query version", 'PERSISTED_QUERY_NOT_SUPPORTED')
+    return persisted.get('sha256Hash')
+
+
+def resolve_query(store, data, query):
+    """
+    Apply the persisted query protocol to one request and return
+    ``(query, sha256)``. Raises ``PersistedQueryError`` when the request
+    cannot be served.
+    """
+    sha256 = requested_hash(data)
+    register = False
+    if sha256 and query:
+        if query_hash(query) != sha256:
+            raise PersistedQueryError("provided sha does not match query", 'INVALID_PERSISTED_QUERY')
+        register = True
+    elif sha256:
+        query = store.get(sha256)
+        if query is None:
+            raise PersistedQueryError("PersistedQueryNotFound", 'PERSISTED_QUERY_NOT_FOUND')
+    elif query:
+        sha256 = query_hash(query)
+    else:
+        return None, None
+
+    if not store.is_allowed(sha256):
+        raise PersistedQueryError("Document is not on the allow-list", 'PERSISTED_QUERY_NOT_ALLOWED')
+    if register:
+        store.register(sha256, query)
+    return query, sha256
@@ -0,0 +1,232 @@
+# crm/query_cost.py
+
+"""
+Static cost and depth analysis of GraphQL operations, run before execution.
+
+Every field has a cost (1 for fields returning objects or lists, 0 for
+scalars and for the ``edges``/``node``/``pageInfo`` plumbing of connections,
+overridable per field). A connection multiplies the cost of everything
+selected under it by its page size: ``first`` or ``last`` when given,
+otherwise the page size the field applies by default. So
+
+    allCustomers(first: 10) { edges { node { orders { edges { node { id } } } } } }
+
+costs ``1 + 10 * 1`` and adding ``products`` under each order multiplies
+again by the orders page size.
+
+Operations deeper than ``MAX_DEPTH``, asking for more than ``MAX_PAGE_SIZE``
+rows of one connection, or costing more than ``MAX_COST`` are rejected with a
+``QueryCostError`` carrying a machine readable ``code``.
+
+Settings (all optional)::
+
+    GRAPHQL_QUERY_COST = {
+        'MAX_COST': 5000,
+        'MAX_DEPTH': 10,
+        'DEFAULT_PAGE_SIZE': 20,   # rows a CRM connection returns without first/last
+        'MAX_PAGE_SIZE': None,     # defaults to GRAPHENE['RELAY_CONNECTION_MAX_LIMIT']
+        'FIELD_COSTS': {'Query.crmStats': 10},
+    }
+"""
+
+from dataclasses import dataclass
+
+from django.conf import settings
+from graphene import Dynamic
+from graphene.utils.str_converters import to_camel_case
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLObjectType,
+    InlineFragmentNode,
+    get_argument_values,
+    get_named_type,
+    is_leaf_type,
+    type_from_ast,
+)
+from graphql.execution.values import get_directive_values
+from graphql.type import GraphQLIncludeDirective, GraphQLSkipDirective
+
+DEFAULTS = {
+    'MAX_COST': 5000,
+    'MAX_DEPTH': 10,
+    'DEFAULT_PAGE_SIZE': 20,
+    'MAX_PAGE_SIZE': None,
+    'FIELD_COSTS': {
+        # Aggregates scan the orders and customers tables
+        'Query.crmStats': 10,
+    },
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'GRAPHQL_QUERY_COST', {}))
+    if config['MAX_PAGE_SIZE'] is None:
+        config['MAX_PAGE_SIZE'] = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+    return config
+
+
+class QueryCostError(GraphQLError):
+    def __init__(self, message, code, **extensions):
+        super().__init__(message, extensions={'code': code, **extensions})
+
+
+@dataclass
+class QueryCost:
+    cost: int
+    depth: int
+
+
+def _is_connection(graphql_type):
+    return (
+        isinstance(graphql_type, GraphQLObjectType)
+        and graphql_type.name.endswith('Connection')
+        and 'edges' in graphql_type.fields
+        and 'pageInfo' in graphql_type.fields
+    )
+
+
+def _is_plumbing(parent_type):
+    # Connection and Edge types only wrap the nodes they lead to
+    return _is_connection(parent_type) or (
+        isinstance(parent_type, GraphQLObjectType)
+        and parent_type.name.endswith('Edge')
+        and 'node' in parent_type.fields
+        and 'cursor' in parent_type.fields
+    )
+
+
+def _graphene_field(parent_type, field_name):
+    graphene_type = getattr(parent_type, 'graphene_type', None)
+    if graphene_type is None:
+        return None
+    for attname, field in graphene_type._meta.fields.items():
+        if isinstance(field, Dynamic):
+            field = field.get_type()
+        if field is not None and (getattr(field, 'name', None) or to_camel_case(attname)) == field_name:
+            return field
+    return None
+
+
+def default_page_size(parent_type, field_name, config):
+    """Rows a connection returns when the client gives neither first nor last."""
+    field = _graphene_field(parent_type, field_name)
+    size = getattr(field, 'default_page_size', None) or getattr(field, 'max_limit', None)
+    return size or config['MAX_PAGE_SIZE']
+
+
+class CostAnalyzer:
+    def __init__(self, schema, document, variables, config):
+        self.schema = schema
+        self.variables = variables or {}
+        self.config = config
+        self.field_costs = config['FIELD_COSTS']
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if definition.kind == 'fragment_definition'
+        }
+
+    def operation(self, operation_ast):
+        root = self.schema.get_root_type(operation_ast.operation)
+        return self.selection_set(root, operation_ast.selection_set, 1, ())
+
+    def selection_set(self, parent_type, selection_set, depth, seen_fragments):
+        """Return ``(cost, depth)`` of the selections under ``parent_type``."""
+        cost = 0
+        max_depth = depth - 1
+        for selection in selection_set.selections:
+            if not self.included(selection):
+                continue
+            if isinstance(selection, FieldNode):
+                field_cost, field_depth = self.field(parent_type, selection, depth, seen_fragments)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = type_from_ast(self.schema, selection.type_condition)
+                field_cost, field_depth = self.selection_set(
+                    fragment_type, selection.selection_set, depth, seen_fragments
+                )
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in seen_fragments:
+                    continue
+                field_cost, field_depth = self.selection_set(
+                    type_from_ast(self.schema, fragment.type_condition),
+                    fragment.selection_set, depth, seen_fragments + (name,),
+                )
+            else:
+                continue
+            cost += field_cost
+            max_depth = max(max_depth, field_depth)
+        return cost, max_depth
+
+    def included(self, node):
+        skip = get_directive_values(GraphQLSkipDirective, node, self.variables)
+        if skip and skip['if']:
+            return False
+        include = get_directive_values(GraphQLIncludeDirective, node, self.variables)
+        return not (include and not include['if'])
+
+    def field(self, parent_type, node, depth, seen_fragments):
+        name = node.name.value
+        if name.startswith('__') or not hasattr(parent_type, 'fields'):
+            return 0, depth
+        field_def = parent_type.fields.get(name)
+        if field_def is None:
+            return 0, depth
+
+        if depth > self.config['MAX_DEPTH']:
+            raise QueryCostError(
+                f"Query depth exceeds the maximum of {self.config['MAX_DEPTH']}.",
+                'QUERY_TOO_DEEP', maxDepth=self.config['MAX_DEPTH'],
+            )
+
+        return_type = get_named_type(field_def.type)
+        own_cost = self.field_costs.get(f'{parent_type.name}.{name}')
+        if own_cost is None:
+            own_cost = 0 if is_leaf_type(return_type) or _is_plumbing(parent_type) else 1
+        if node.selection_set is None:
+            return own_cost, depth
+
+        multiplier = 1
+        if _is_connection(return_type):
+            multiplier = self.page_size(parent_type, field_def, node)
+        child_cost, child_depth = self.selection_set(
+            return_type, node.selection_set, depth + 1, seen_fragments
+        )
+        return own_cost + multiplier * child_cost, child_depth
+
+    def page_size(self, parent_type, field_def, node):
+        args = get_argument_values(field_def, node, self.variables)
+        max_page_size = self.config['MAX_PAGE_SIZE']
+        requested = [args[name] for name in ('first', 'last') if args.get(name) is not None]
+        for value in requested:
+            if value > max_page_size:
+                raise QueryCostError(
+                    f"Requesting {value} records on `{node.name.value}` exceeds "
+                    f"the maximum page size of {max_page_size}.",
+                    'PAGE_SIZE_EXCEEDED', maxPageSize=max_page_size,
+                )
+        if requested:
+            return max(requested)
+        return default_page_size(parent_type, node.name.value, self.config)
+
+
+def analyze(schema, document, operation_ast, variables=None, config=None):
+    """
+    Return the ``QueryCost`` of ``operation_ast``; raise ``QueryCostError``
+    when it is too deep, asks for too large a page or is over budget.
+    """
+    config = config or get_config()
+    cost, depth = CostAnalyzer(schema, document, variables, config).operation(operation_ast)
+    if cost > config['MAX_COST']:
+        raise QueryCostError(
+            f"Query cost {cost} exceeds the maximum of {config['MAX_COST']}.",
+            'QUERY_TOO_COMPLEX', cost=cost, maxCost=config['MAX_COST'],
+        )
+    return QueryCost(cost=cost, depth=depth)
@@ -0,0 +1,119 @@
+# crm/reminders.py
+
+"""
+Reminders for the orders placed in the last ``WINDOW_DAYS`` days.
+
+``send_order_reminders()`` pages through ``allOrders`` with keyset cursors and
+leaves the date window to ``OrderFilter`` (``orderDate_Gte``), so its cost
+follows the number of recent orders rather than the whole order history.
+Every ``CHUNK_SIZE`` orders become one ``crm.tasks.send_reminder_batch``
+Celery task, which sends its emails over a single connection; the task's
+``RATE_LIMIT`` caps how many batches each worker sends. The log is written
+in one pass once every batch has been queued.
+
+Settings (all optional)::
+
+    CRM_ORDER_REMINDERS = {
+        'WINDOW_DAYS': 7,
+        'PAGE_SIZE': 100,       # orders per GraphQL page
+        'CHUNK_SIZE': 50,       # orders per Celery task
+        'RATE_LIMIT': '60/m',   # batches per worker, Celery rate_limit syntax
+        'FROM_EMAIL': None,     # DEFAULT_FROM_EMAIL when None
+        'LOG_FILE': '/tmp/order_reminders_log.txt',
+    }
+"""
+
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.utils import timezone
+
+from .graphql_client import execute
+
+DEFAULTS = {
+    'WINDOW_DAYS': 7,
+    'PAGE_SIZE': 100,
+    'CHUNK_SIZE': 50,
+    'RATE_LIMIT': '60/m',
+    'FROM_EMAIL': None,
+    'LOG_FILE': '/tmp/order_reminders_log.txt',
+}
+
+RECENT_ORDERS_QUERY = """
+    query RecentOrders($since: DateTime!, $first: Int!, $after: String) {
+        allOrders(keyset: true, orderDate_Gte: $since, first: $first, after: $after) {
+            pageInfo { hasNextPage endCursor }
+            edges { node { id orderDate customer { name email } } }
+        }
+    }
+"""
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CRM_ORDER_REMINDERS', {}))
+    return config
+
+
+def recent_orders(since, page_size):
+    """Yield every order placed at or after ``since``, one page per query."""
+    after = None
+    while True:
+        page = execute(RECENT_ORDERS_QUERY, {
+            'since': since.isoformat(), 'first': page_size, 'after': after,
+        })['allOrders']
+        for edge in page['edges']:
+            yield edge['node']
+        if not page['pageInfo']['hasNextPage']:
+            return
+        after = page['pageInfo']['endCursor']
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def reminder_message(order, from_email=None):
+    customer = order['customer']
+    return EmailMessage(
+        subject="Reminder about your recent order",
+        body=(
+            f"Hi {customer['name']},\n\n"
+            f"This is a reminder about your order {order['id']} placed on {order['orderDate']}.\n"
+        ),
+        from_email=from_email,
+        to=[customer['email']],
+    )
+
+
+def send_order_reminders(now=None):
+    """
+    Queue reminders for every recent order and log them. Returns the number
+    of orders reminded.
+    """
+    from .tasks import send_reminder_batch
+
+    config = get_config()
+    now = now or timezone.now()
+    since = now - timedelta(days=config['WINDOW_DAYS'])
+
+    lines = []
+    for chunk in chunked(recent_orders(since, config['PAGE_SIZE']), config['CHUNK_SIZE']):
+        send_reminder_batch.delay(chunk)
+        lines.extend(
+            f"Order ID: {order['id']} | Customer: {order['customer']['email']} | Date: {order['orderDate']}\n"
+            for order in chunk
+        )
+
+    header = [f"\n[{now.strftime('%Y-%m-%d %H:%M:%S')}] Order Reminders Processing\n", f"{'=' * 50}\n"]
+    if lines:
+        footer = [f"Total reminders: {len(lines)}\n"]
+    else:
+        footer = [f"No pending orders found in the last {config['WINDOW_DAYS']} days.\n"]
+    with open(config['LOG_FILE'], 'a') as log_file:
+        log_file.write(''.join(header + lines + footer))
+    return len(lines)
@@ -0,0 +1,93 @@
+# crm/reports.py
+
+"""
+Period reports computed in parallel partitions.
+
+The customers are split into ``partitions`` contiguous primary-key ranges.
+Each range is aggregated on its own (``compute_partition``), by a separate
+Celery task when run through ``crm.tasks.generate_partitioned_crm_report``,
+and ``merge_partitions`` combines the partial results: counts and Decimal
+sums are added, and each range's top customers compete for the overall
+top-N. A customer's orders all fall in the range holding the customer, so
+the merged top-N is exact.
+
+Partial results cross the broker as JSON: Decimals travel as strings and
+datetimes as ISO 8601.
+"""
+
+import heapq
+from decimal import Decimal
+
+from django.db.models import Count, Max, Min, Sum
+from django.utils.dateparse import parse_datetime
+
+from .models import Customer, Order
+from .stats import _money
+
+DEFAULT_TOP_N = 10
+
+
+def _bounded(queryset, field, start, end):
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': parse_datetime(start)})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': parse_datetime(end)})
+    return queryset
+
+
+def partition_bounds(partitions):
+    """Split the customer primary keys into at most ``partitions`` inclusive ranges."""
+    bounds = Customer.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return []
+    first, last = bounds['first'], bounds['last']
+    size = -(-(last - first + 1) // max(partitions, 1))
+    return [(low, min(low + size - 1, last)) for low in range(first, last + 1, size)]
+
+
+def compute_partition(first_pk, last_pk, start=None, end=None, top_n=DEFAULT_TOP_N):
+    """Aggregate customers ``first_pk`` to ``last_pk`` over ``[start, end)``."""
+    orders = Order.objects.filter(customer_id__gte=first_pk, customer_id__lte=last_pk)
+    orders = _bounded(orders, 'order_date', start, end)
+    customers = _bounded(Customer.objects.filter(pk__range=(first_pk, last_pk)), 'created_at', start, end)
+    totals = orders.aggregate(orders=Count('id'), revenue=Sum('total_amount'))
+    top = (
+        orders.values('customer_id', 'customer__email')
+        .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+        .order_by('-revenue', 'customer_id')[:top_n]
+    )
+    return {
+        'new_customers': customers.count(),
+        'orders': totals['orders'],
+        'revenue': str(_money(totals['revenue'])),
+        'top_customers': [
+            {
+                'id': row['customer_id'],
+                'email': row['customer__email'],
+                'orders': row['orders'],
+                'revenue': str(_money(row['revenue'])),
+            }
+            for row in top
+        ],
+    }
+
+
+def merge_partitions(partials, top_n=DEFAULT_TOP_N):
+    """Combine ``compute_partition`` results into one report."""
+    candidates = [customer for partial in partials for customer in partial['top_customers']]
+    return {
+        'new_customers': sum(partial['new_customers'] for partial in partials),
+        'orders': sum(partial['orders'] for partial in partials),
+        'revenue': str(sum((Decimal(partial['revenue']) for partial in partials), Decimal('0.00'))),
+        'top_customers': heapq.nsmallest(
+            top_n, candidates, key=lambda customer: (-Decimal(customer['revenue']), customer['id'])
+        ),
+    }
+
+
+def compute_report(start=None, end=None, partitions=1, top_n=DEFAULT_TOP_N):
+    """Compute the report in this process, one partition after another."""
+    return merge_partitions(
+        [compute_partition(first, last, start, end, top_n) for first, last in partition_bounds(partitions)],
+        top_n,
+    )
@@ -0,0 +1,188 @@
+# crm/response_cache.py
+
+"""
+Opt-in response cache for read-only GraphQL operations.
+
+Responses are stored in Django's cache framework under a key built from the
+normalized document (``print_ast`` of the parsed query, so whitespace and
+comments don't matter), the variables and the operation name.
+
+Invalidation is tag-based and generational: every model has a version number
+in the cache, and the versions of the models a document touches are part of
+its key. Bumping a model's version (on ``post_save``, ``post_delete`` and
+``m2m_changed``, or explicitly from set-based mutations) makes every cached
+response that read that model unreachable; they then age out by TTL.
+
+Settings (all optional)::
+
+    GRAPHQL_RESPONSE_CACHE = {
+        'ENABLED': False,
+        'CACHE_ALIAS': 'default',
+        'TIMEOUT': 300,
+    }
+"""
+
+import hashlib
+import json
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from graphene_django.registry import get_global_registry
+from graphql import (
+    OperationType,
+    TypeInfo,
+    TypeInfoVisitor,
+    Visitor,
+    get_named_type,
+    parse,
+    print_ast,
+    visit,
+)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Fields that read models without returning a model type
+FIELD_TAGS = {
+    ('Query', 'crmStats'): ('customer', 'order'),
+}
+
+KEY_PREFIX = 'graphql:response:'
+TAG_PREFIX = 'graphql:tag:'
+HITS_KEY = 'graphql:response-stats:hits'
+MISSES_KEY = 'graphql:response-stats:misses'
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'GRAPHQL_RESPONSE_CACHE', {}))
+    return config
+
+
+def get_cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def model_tag(model):
+    return model._meta.model_name
+
+
+def _type_tags():
+    registry = get_global_registry()
+    return {
+        django_type._meta.name: model_tag(model)
+        for model, django_type in registry._registry.items()
+    }
+
+
+@lru_cache(maxsize=1024)
+def analyze_document(schema, query):
+    """Return ``(normalized_digest, tags)`` for a query text."""
+    document = parse(query)
+    type_tags = _type_tags()
+    type_info = TypeInfo(schema)
+    tags = set()
+
+    class CollectTags(Visitor):
+        def enter_field(self, node, *args):
+            parent = type_info.get_parent_type()
+            named = get_named_type(type_info.get_type())
+            if named is not None and named.name in type_tags:
+                tags.add(type_tags[named.name])
+            if parent is not None:
+                tags.update(FIELD_TAGS.get((parent.name, node.name.value), ()))
+
+    visit(document, TypeInfoVisitor(type_info, CollectTags()))
+    digest = hashlib.sha256(print_ast(document).encode('utf-8')).hexdigest()
+    return digest, tuple(sorted(tags))
+
+
+def _tag_versions(cache, tags):
+    keys = [TAG_PREFIX + tag for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A fresh, never reused version so evicted counters can't
+            # resurrect stale entries
+            versions[key] = time.time_ns()
+            cache.add(key, versions[key], None)
+            versions[key] = cache.get(key, versions[key])
+    return [str(versions[key]) for key in keys]
+
+
+def _bump(tags):
+    cache = get_cache()
+    for tag in tags:
+        key = TAG_PREFIX + tag
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def invalidate(*tags):
+    """Invalidate cached responses that read any of ``tags``, once committed."""
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def invalidate_models(*models):
+    invalidate(*(model_tag(model) for model in models))
+
+
+class ResponseCache:
+    """Looks up and stores execution results for query operations."""
+
+    def __init__(self, config):
+        self.enabled = config['ENABLED']
+        self.timeout = config['TIMEOUT']
+        self.cache = caches[config['CACHE_ALIAS']]
+
+    def key_for(self, schema, query, variables, operation_name):
+        digest, tags = analyze_document(schema, query)
+        versions = _tag_versions(self.cache, tags)
+        payload = json.dumps(
+            [digest, variables or {}, operation_name or '', versions],
+            sort_keys=True, default=str,
+        )
+        return KEY_PREFIX + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def cacheable(self, operation_ast):
+        return (
+            self.enabled
+            and operation_ast is not None
+            and operation_ast.operation == OperationType.QUERY
+        )
+
+    def get(self, key):
+        data = self.cache.get(key)
+        self._count(HITS_KEY if data is not None else MISSES_KEY)
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+    def _count(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 0, None)
+            self.cache.incr(key)
+
+
+def stats(cache=None):
+    """Hit/miss counters shared by every process using the cache."""
+    cache = cache or get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
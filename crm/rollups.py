@@ -0,0 +1,153 @@
+# crm/rollups.py
+
+"""
+Per-day rollups of orders, revenue, new customers and units per product.
+
+``DailyCrmRollup`` and ``DailyProductRollup`` hold one row per local day (and
+product). They are kept current incrementally, in the transaction of the
+write that changes them:
+
+* ``save()``/``delete()`` of orders and customers, and ``order.products``
+  changes, are picked up by the signal handlers in ``crm.signals``;
+* paths that bypass signals (``bulk_create``, set-wise deletes) build a
+  ``RollupDelta`` themselves.
+
+Deltas are applied with multi-row ``INSERT ... ON CONFLICT DO UPDATE`` statements,
+which adds to the stored counts atomically on SQLite and PostgreSQL.
+``QuerySet.update()`` of ``order_date`` or ``total_amount`` is not tracked;
+run ``manage.py rebuild_crm_rollups`` after such changes or a raw backfill.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Customer, DailyCrmRollup, DailyProductRollup, Order
+from .response_cache import invalidate_models
+
+
+def local_day(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def day_start(day):
+    """The first instant of local ``day``."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class RollupDelta:
+    """Changes to the rollups, collected in memory and applied at once."""
+
+    def __init__(self):
+        # day -> [orders, revenue, new_customers]
+        self.days = defaultdict(lambda: [0, Decimal('0'), 0])
+        # (day, product_id) -> units
+        self.units = Counter()
+
+    def add_order(self, order_date, total_amount, sign=1):
+        day = self.days[local_day(order_date)]
+        day[0] += sign
+        day[1] += sign * Decimal(str(total_amount))
+
+    def add_units(self, order_date, product_ids, sign=1):
+        day = local_day(order_date)
+        for product_id in product_ids:
+            self.units[day, product_id] += sign
+
+    def add_customer(self, created_at, sign=1):
+        self.days[local_day(created_at)][2] += sign
+
+    def add_orders(self, orders, sign=1):
+        """Add what a queryset of orders and their order-product rows contributes."""
+        rows = (
+            orders.annotate(day=TruncDate('order_date')).values('day')
+            .annotate(orders=Count('id'), revenue=Sum('total_amount')).order_by()
+        )
+        for row in rows:
+            day = self.days[row['day']]
+            day[0] += sign * row['orders']
+            day[1] += sign * (row['revenue'] or Decimal('0'))
+        units = (
+            Order.products.through.objects.filter(order__in=orders.values('pk'))
+            .annotate(day=TruncDate('order__order_date')).values('day', 'product_id')
+            .annotate(units=Count('id')).order_by()
+        )
+        for row in units:
+            self.units[row['day'], row['product_id']] += sign * row['units']
+
+    def add_customers(self, customers, sign=1):
+        rows = (
+            customers.annotate(day=TruncDate('created_at')).values('day')
+            .annotate(new_customers=Count('id')).order_by()
+        )
+        for row in rows:
+            self.days[row['day']][2] += sign * row['new_customers']
+
+    def apply(self):
+        days = [(day, *values) for day, values in self.days.items() if any(values)]
+        units = [(day, product_id, count) for (day, product_id), count in self.units.items() if count]
+        with transaction.atomic(savepoint=False):
+            _upsert(DailyCrmRollup, ['date'], ['orders', 'revenue', 'new_customers'], days)
+            _upsert(DailyProductRollup, ['date', 'product_id'], ['units'], units)
+        self.days.clear()
+        self.units.clear()
+
+
+def _upsert(model, keys, counters, rows):
+    """Insert ``rows`` or add their counters to the existing rows with the same keys."""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in keys + counters]
+    columns = [quote(field.column) for field in fields]
+    increments = ', '.join(
+        f"{column} = {table}.{column} + EXCLUDED.{column}" for column in columns[len(keys):]
+    )
+    placeholder = f"({', '.join(['%s'] * len(columns))})"
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({', '.join(columns[:len(keys)])}) DO UPDATE SET {increments}",
+                [value for row in batch for value in row],
+            )
+
+
+def rebuild_rollups(start=None, end=None):
+    """
+    Recompute the rollups for the days ``start`` to ``end`` (inclusive dates,
+    both optional) from the orders and customers tables. Cached responses
+    that read orders or customers, such as ``crmStats``, are invalidated.
+    """
+    days = {}
+    if start is not None:
+        days['date__gte'] = start
+    if end is not None:
+        days['date__lte'] = end
+    orders = Order.objects.all()
+    customers = Customer.objects.all()
+    if start is not None:
+        orders = orders.filter(order_date__gte=day_start(start))
+        customers = customers.filter(created_at__gte=day_start(start))
+    if end is not None:
+        orders = orders.filter(order_date__lt=day_start(end + timedelta(days=1)))
+        customers = customers.filter(created_at__lt=day_start(end + timedelta(days=1)))
+
+    delta = RollupDelta()
+    with transaction.atomic():
+        delta.add_orders(orders)
+        delta.add_customers(customers)
+        DailyCrmRollup.objects.filter(**days).delete()
+        DailyProductRollup.objects.filter(**days).delete()
+        delta.apply()
+        # The rollups are rebuilt after writes the response cache didn't see either
+        invalidate_models(Customer, Order)
+    return DailyCrmRollup.objects.filter(**days).count()
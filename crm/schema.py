@@ -2,38 +2,85 @@
 
 import graphene
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
 from crm.models import Customer
 from crm.models import Product
 from crm.models import Order
 from .filters import CustomerFilter, ProductFilter, OrderFilter
+from .async_utils import sync_resolver
+from .fields import CRMConnectionField, CRMFilterConnectionField
+from .loaders import get_loaders
+from .response_cache import invalidate_models
+from .rollups import RollupDelta
+from .stats import compute_crm_stats
+from .validators import is_valid_phone, validate_email, validate_phone, validate_price, validate_stock
 from django.core.exceptions import ValidationError
-from django.core.validators import EmailValidator
-import re
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from decimal import Decimal
 
 
 # GraphQL Types
+# Relations are declared as CRMConnectionFields (instead of the converted
+# DjangoConnectionFields) so they also resolve under async execution
 class CustomerType(DjangoObjectType):
+    orders = CRMConnectionField(lambda: OrderType, required=True)
+
     class Meta:
         model = Customer
         fields = '__all__'
         interfaces = (graphene.relay.Node,)
 
+    def resolve_orders(self, info, window, **kwargs):
+        return get_loaders(info).customer_orders.resolve(self.pk, window)
+
 
 class ProductType(DjangoObjectType):
+    orders = CRMConnectionField(lambda: OrderType, required=True)
+
     class Meta:
         model = Product
         fields = '__all__'
         interfaces = (graphene.relay.Node,)
 
+    def resolve_orders(self, info, window, **kwargs):
+        return get_loaders(info).product_orders.resolve(self.pk, window)
+
 
 class OrderType(DjangoObjectType):
+    products = CRMConnectionField(ProductType, required=True)
+
     class Meta:
         model = Order
         fields = '__all__'
         interfaces = (graphene.relay.Node,)
 
+    def resolve_customer(self, info):
+        return get_loaders(info).customer.resolve(self.customer_id)
+
+    def resolve_products(self, info, window, **kwargs):
+        return get_loaders(info).order_products.resolve(self.pk, window)
+
+
+# Reporting Types
+class StatsPeriod(graphene.Enum):
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+
+
+class CrmStatsBucketType(graphene.ObjectType):
+    period = graphene.DateTime()
+    orders = graphene.Int()
+    revenue = graphene.Decimal()
+    new_customers = graphene.Int()
+
+
+class CrmStatsType(graphene.ObjectType):
+    total_customers = graphene.Int()
+    total_orders = graphene.Int()
+    total_revenue = graphene.Decimal()
+    buckets = graphene.List(CrmStatsBucketType)
+
 
 # Input Types for Mutations
 class CustomerInput(graphene.InputObjectType):
@@ -64,9 +111,8 @@ class CreateCustomer(graphene.Mutation):
 
     def mutate(self, info, input):
         # Validate email format
-        email_validator = EmailValidator()
         try:
-            email_validator(input.email)
+            validate_email(input.email)
         except ValidationError:
             raise Exception("Invalid email format")
 
@@ -75,10 +121,10 @@ class CreateCustomer(graphene.Mutation):
             raise Exception("Email already exists")
 
         # Validate phone format if provided
-        if input.phone:
-            phone_pattern = re.compile(r'^(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}$')
-            if not phone_pattern.match(input.phone):
-                raise Exception("Invalid phone format. Use formats like +1234567890 or 123-456-7890")
+        try:
+            validate_phone(input.phone)
+        except ValidationError as e:
+            raise Exception(e.messages[0])
 
         # Create customer using save()
         customer = Customer(
@@ -92,46 +138,123 @@ class CreateCustomer(graphene.Mutation):
 
 
 class BulkCreateCustomers(graphene.Mutation):
+    """
+    Create many customers at once.
+
+    Rows are validated up front, checked for duplicates (against the database
+    with one ``email__in`` query per batch, and against earlier rows of the
+    same input) and inserted with ``bulk_create``. By default every valid row
+    is created and invalid rows are reported in ``errors``; with
+    ``atomic: true`` nothing is created unless every row is valid.
+    """
     class Arguments:
         input = graphene.List(CustomerInput, required=True)
+        batch_size = graphene.Int(default_value=500)
+        atomic = graphene.Boolean(default_value=False)
 
     customers = graphene.List(CustomerType)
     errors = graphene.List(graphene.String)
 
-    def mutate(self, info, input):
-        customers = []
+    def mutate(self, info, input, batch_size=500, atomic=False):
+        if batch_size is None or batch_size < 1:
+            raise Exception("Batch size must be positive")
+
         errors = []
-        email_validator = EmailValidator()
-        phone_pattern = re.compile(r'^(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}$')
+        candidates = []
+        seen_emails = {}
 
         for idx, customer_input in enumerate(input):
             try:
                 # Validate email
-                email_validator(customer_input.email)
+                validate_email(customer_input.email)
 
-                # Check duplicate email
-                if Customer.objects.filter(email=customer_input.email).exists():
-                    errors.append(f"Row {idx + 1}: Email {customer_input.email} already exists")
+                # Check duplicate email within this input
+                if customer_input.email in seen_emails:
+                    errors.append((idx, f"Row {idx + 1}: Email {customer_input.email} is duplicated "
+                                        f"in row {seen_emails[customer_input.email] + 1}"))
                     continue
 
                 # Validate phone if provided
-                if customer_input.phone and not phone_pattern.match(customer_input.phone):
-                    errors.append(f"Row {idx + 1}: Invalid phone format for {customer_input.email}")
+                if customer_input.phone and not is_valid_phone(customer_input.phone):
+                    errors.append((idx, f"Row {idx + 1}: Invalid phone format for {customer_input.email}"))
                     continue
 
-                # Create customer using save()
-                customer = Customer(
+                seen_emails[customer_input.email] = idx
+                candidates.append((idx, Customer(
                     name=customer_input.name,
                     email=customer_input.email,
                     phone=customer_input.phone if customer_input.phone else None
-                )
-                customer.save()
-                customers.append(customer)
+                )))
 
             except Exception as e:
-                errors.append(f"Row {idx + 1}: {str(e)}")
+                errors.append((idx, f"Row {idx + 1}: {str(e)}"))
 
-        return BulkCreateCustomers(customers=customers, errors=errors)
+        batches = [candidates[i:i + batch_size] for i in range(0, len(candidates), batch_size)]
+        customers = []
+
+        if atomic:
+            with transaction.atomic():
+                for batch in batches:
+                    errors.extend(BulkCreateCustomers._existing_email_errors(batch))
+                if errors:
+                    return BulkCreateCustomers(customers=[], errors=BulkCreateCustomers._sorted(errors))
+                for batch in batches:
+                    customers.extend(Customer.objects.bulk_create(
+                        [customer for _, customer in batch], batch_size=batch_size
+                    ))
+                BulkCreateCustomers._roll_up(customers)
+            # bulk_create sends no post_save, so cached responses are dropped here
+            invalidate_models(Customer)
+            return BulkCreateCustomers(customers=customers, errors=[])
+
+        for batch in batches:
+            batch_errors = BulkCreateCustomers._existing_email_errors(batch)
+            rejected = {idx for idx, _ in batch_errors}
+            errors.extend(batch_errors)
+            batch = [(idx, customer) for idx, customer in batch if idx not in rejected]
+            try:
+                with transaction.atomic():
+                    created = Customer.objects.bulk_create(
+                        [customer for _, customer in batch], batch_size=batch_size
+                    )
+                    BulkCreateCustomers._roll_up(created)
+                customers.extend(created)
+            except IntegrityError:
+                # A concurrent insert won the race; fall back to row by row
+                # so only the conflicting rows are reported
+                for idx, customer in batch:
+                    try:
+                        with transaction.atomic():
+                            customer.save()
+                        customers.append(customer)
+                    except IntegrityError:
+                        errors.append((idx, f"Row {idx + 1}: Email {customer.email} already exists"))
+
+        if customers:
+            invalidate_models(Customer)
+        return BulkCreateCustomers(customers=customers, errors=BulkCreateCustomers._sorted(errors))
+
+    @staticmethod
+    def _existing_email_errors(batch):
+        emails = [customer.email for _, customer in batch]
+        existing = set(Customer.objects.filter(email__in=emails).values_list('email', flat=True))
+        return [
+            (idx, f"Row {idx + 1}: Email {customer.email} already exists")
+            for idx, customer in batch
+            if customer.email in existing
+        ]
+
+    @staticmethod
+    def _roll_up(customers):
+        # bulk_create skips the signal that counts new customers
+        delta = RollupDelta()
+        for customer in customers:
+            delta.add_customer(customer.created_at)
+        delta.apply()
+
+    @staticmethod
+    def _sorted(errors):
+        return [message for _, message in sorted(errors, key=lambda error: error[0])]
 
 
 class CreateProduct(graphene.Mutation):
@@ -141,14 +264,13 @@ class CreateProduct(graphene.Mutation):
     product = graphene.Field(ProductType)
 
     def mutate(self, info, input):
-        # Validate price is positive
-        if input.price <= 0:
-            raise Exception("Price must be positive")
-
-        # Validate stock is non-negative
+        # Validate price is positive and stock non-negative
         stock = input.stock if input.stock is not None else 0
-        if stock < 0:
-            raise Exception("Stock cannot be negative")
+        try:
+            validate_price(input.price)
+            validate_stock(stock)
+        except ValidationError as e:
+            raise Exception(e.messages[0])
 
         # Create product using save()
         product = Product(
@@ -178,56 +300,108 @@ class CreateOrder(graphene.Mutation):
         if not input.product_ids or len(input.product_ids) == 0:
             raise Exception("At least one product must be selected")
 
-        # Validate all products exist and calculate total
-        products = []
-        total_amount = Decimal('0.00')
-
+        # An order holds each product once, so repeated IDs are collapsed
+        # (keeping the client's order) before pricing
+        requested = {}
         for product_id in input.product_ids:
             try:
-                product = Product.objects.get(id=product_id)
-                products.append(product)
-                total_amount += product.price
-            except Product.DoesNotExist:
-                raise Exception(f"Product with ID {product_id} does not exist")
-
-        # Create order using save()
+                requested.setdefault(product_id, Product._meta.pk.to_python(product_id))
+            except ValidationError:
+                requested.setdefault(product_id, None)
+        product_ids = list(dict.fromkeys(pk for pk in requested.values() if pk is not None))
+
+        # Fetch every product in one query and report all missing IDs at once
+        products_by_id = Product.objects.in_bulk(product_ids)
+        missing_ids = [product_id for product_id, pk in requested.items() if pk not in products_by_id]
+        if len(missing_ids) == 1:
+            raise Exception(f"Product with ID {missing_ids[0]} does not exist")
+        if missing_ids:
+            raise Exception(f"Products with IDs {', '.join(str(i) for i in missing_ids)} do not exist")
+
+        products = [products_by_id[product_id] for product_id in product_ids]
+        total_amount = sum((product.price for product in products), Decimal('0.00'))
+
+        # Create the order and its line items together
         order = Order(
             customer=customer,
             total_amount=total_amount
         )
         if input.order_date:
             order.order_date = input.order_date
-        order.save()
-
-        # Associate products
-        order.products.set(products)
+        Through = Order.products.through
+        with transaction.atomic():
+            order.save()
+            Through.objects.bulk_create(
+                [Through(order=order, product=product) for product in products]
+            )
+            # bulk_create sends no m2m_changed, so count the units here
+            delta = RollupDelta()
+            delta.add_units(order.order_date, product_ids)
+            delta.apply()
+
+        # The relations are already in memory; don't let resolvers refetch them
+        loaders = get_loaders(info)
+        loaders.customer.prime_value(customer.pk, customer)
+        loaders.order_products.prime_value(order.pk, products)
 
         return CreateOrder(order=order)
 
 
 class UpdateLowStockProducts(graphene.Mutation):
     """
-    Mutation to update low-stock products (stock < 10).
-    Increments their stock by 10 (simulating restocking).
+    Mutation to update low-stock products (stock < threshold, default 10).
+    Increments their stock by `increment` (default 10, simulating restocking).
     """
     class Arguments:
-        pass
+        threshold = graphene.Int(default_value=10)
+        increment = graphene.Int(default_value=10)
+        chunk_size = graphene.Int(default_value=1000)
     
     products = graphene.List(ProductType)
     message = graphene.String()
     
-    def mutate(self, info):
-        # Query products with stock < 10
-        low_stock_products = Product.objects.filter(stock__lt=10)
-        
+    def mutate(self, info, threshold=10, increment=10, chunk_size=1000):
+        if threshold is None or threshold < 0:
+            raise Exception("Threshold must be zero or more")
+        if increment is None or increment <= 0:
+            raise Exception("Increment must be positive")
+        if chunk_size is None or chunk_size < 1:
+            raise Exception("Chunk size must be positive")
+
         updated_products = []
-        
-        # Increment stock by 10 for each low-stock product
-        for product in low_stock_products:
-            product.stock += 10
-            product.save()
-            updated_products.append(product)
-        
+        last_pk = None
+
+        # Walk the low-stock products in primary-key chunks so each UPDATE
+        # (and the row locks it holds) stays short on very large catalogs
+        while True:
+            low_stock = Product.objects.filter(stock__lt=threshold).order_by('pk')
+            if last_pk is not None:
+                low_stock = low_stock.filter(pk__gt=last_pk)
+
+            with transaction.atomic():
+                chunk = list(low_stock.select_for_update()[:chunk_size])
+                if not chunk:
+                    break
+                last_pk = chunk[-1].pk
+
+                # Exactly the locked rows: a product that dropped below the
+                # threshold since the read isn't locked or returned
+                Product.objects.filter(
+                    pk__in=[product.pk for product in chunk]
+                ).update(stock=F('stock') + increment)
+
+            # The rows are locked, so the new values are known without re-reading
+            for product in chunk:
+                product.stock += increment
+            updated_products.extend(chunk)
+
+            if len(chunk) < chunk_size:
+                break
+
+        # QuerySet.update() sends no post_save, so cached responses are dropped here
+        if updated_products:
+            invalidate_models(Product)
+
         count = len(updated_products)
         message = f"Successfully updated {count} low-stock product(s)"
         
@@ -236,14 +410,35 @@ class UpdateLowStockProducts(graphene.Mutation):
 
 # Query with Filtering
 class Query(graphene.ObjectType):
-    all_customers = DjangoFilterConnectionField(CustomerType, filterset_class=CustomerFilter)
-    all_products = DjangoFilterConnectionField(ProductType, filterset_class=ProductFilter)
-    all_orders = DjangoFilterConnectionField(OrderType, filterset_class=OrderFilter)
+    all_customers = CRMFilterConnectionField(
+        CustomerType, filterset_class=CustomerFilter, keyset_fields=('created_at', 'id')
+    )
+    all_products = CRMFilterConnectionField(
+        ProductType, filterset_class=ProductFilter, keyset_fields=('id',)
+    )
+    all_orders = CRMFilterConnectionField(
+        OrderType, filterset_class=OrderFilter, keyset_fields=('order_date', 'id')
+    )
+    crm_stats = graphene.Field(
+        CrmStatsType,
+        start=graphene.DateTime(),
+        end=graphene.DateTime(),
+        group_by=StatsPeriod(),
+    )
     hello = graphene.String()
     
     def resolve_hello(self, info):
         return "Hello World!"
 
+    @sync_resolver
+    def resolve_crm_stats(self, info, start=None, end=None, group_by=None):
+        # Counts and sums run in the database; only totals cross the wire
+        return compute_crm_stats(
+            start=start,
+            end=end,
+            group_by=group_by.value if group_by else None,
+        )
+
 
 # Mutation
 class Mutation(graphene.ObjectType):
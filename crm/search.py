@@ -0,0 +1,173 @@
+# crm/search.py
+
+"""
+Full-text search for customers, products and orders.
+
+``icontains`` filters compile to ``LIKE '%term%'``, which no b-tree index can
+serve. The ``search`` filter argument goes through a backend with a real text
+index instead:
+
+* ``SQLiteFTS5Backend`` keeps an external-content FTS5 table per model
+  (``crm_customer_fts``, ``crm_product_fts``) in sync with triggers, so rows
+  written by ``save()``, ``delete()``, ``bulk_create()`` and ``update()`` are
+  all indexed. Results are ranked with ``bm25``.
+* ``PostgresSearchBackend`` matches a ``to_tsvector`` expression covered by a
+  GIN index and ranks with ``ts_rank``.
+* ``IContainsBackend`` is the unindexed fallback for other databases.
+
+The FTS5 tables, their triggers and the GIN indexes are created by migration
+``0004_search_index`` as literal SQL, so a change to ``SEARCH_FIELDS`` or to
+the indexed expressions needs a new migration. The backend is picked from
+the database vendor, or set explicitly with
+``CRM_SEARCH_BACKEND = 'dotted.path.to.Backend'``. Every term is matched as a
+prefix, so typeahead input like ``ali`` finds ``Alice``.
+"""
+
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Customer, Order, Product
+
+# Columns indexed per model, with the weight of each in the relevance ranking
+SEARCH_FIELDS = {
+    Customer: {'name': 10.0, 'email': 1.0},
+    Product: {'name': 1.0},
+}
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(term):
+    return TOKEN.findall(term or '')
+
+
+class SearchBackend:
+    def matching(self, model, tokens):
+        """Return a subquery of the primary keys of ``model`` rows matching ``tokens``."""
+        raise NotImplementedError
+
+    def rank(self, queryset, tokens):
+        """Annotate ``search_rank`` (lower is more relevant) and order by it."""
+        return queryset
+
+    def search(self, queryset, term):
+        tokens = tokenize(term)
+        if not tokens:
+            return queryset.none()
+        model = queryset.model
+        if model is Order:
+            return self.search_orders(queryset, tokens)
+        queryset = queryset.filter(pk__in=self.matching(model, tokens))
+        return self.rank(queryset, tokens)
+
+    def search_orders(self, queryset, tokens):
+        # Orders match through their customer's or any of their products' text
+        through = Order.products.through.objects.filter(
+            product_id__in=self.matching(Product, tokens)
+        ).values('order_id')
+        return queryset.filter(
+            Q(customer_id__in=self.matching(Customer, tokens)) | Q(pk__in=through)
+        )
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    @staticmethod
+    def fts_table(model):
+        return f'{model._meta.db_table}_fts'
+
+    @staticmethod
+    def match_expression(tokens):
+        # Quote every token so user input can't inject FTS5 query syntax
+        return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+    def matching(self, model, tokens):
+        fts = self.fts_table(model)
+        return RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [self.match_expression(tokens)])
+
+    def search(self, queryset, term):
+        tokens = tokenize(term)
+        if not tokens or queryset.model not in SEARCH_FIELDS:
+            return super().search(queryset, term)
+        # Join the FTS table once instead of filtering by a subquery and
+        # ranking with a correlated one, which would re-run MATCH per row
+        model = queryset.model
+        table = model._meta.db_table
+        fts = self.fts_table(model)
+        weights = ', '.join(str(weight) for weight in SEARCH_FIELDS[model].values())
+        return queryset.extra(
+            tables=[fts],
+            where=[f'{fts}.rowid = "{table}"."id"', f'{fts} MATCH %s'],
+            params=[self.match_expression(tokens)],
+            select={'search_rank': f'bm25({fts}, {weights})'},
+        ).order_by('search_rank', 'pk')
+
+
+class PostgresSearchBackend(SearchBackend):
+    CONFIG = 'simple'
+
+    def vector(self, model):
+        # Must match the expression indexed by the migrations exactly for the GIN index to be used
+        document = " || ' ' || ".join(f"coalesce({field}, '')" for field in SEARCH_FIELDS[model])
+        return f"to_tsvector('{self.CONFIG}', {document})"
+
+    @staticmethod
+    def tsquery(tokens):
+        # Strip everything but word characters so input can't inject tsquery syntax
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def matching(self, model, tokens):
+        table = model._meta.db_table
+        return RawSQL(
+            f"SELECT id FROM {table} WHERE {self.vector(model)} @@ to_tsquery('{self.CONFIG}', %s)",
+            [self.tsquery(tokens)],
+        )
+
+    def rank(self, queryset, tokens):
+        model = queryset.model
+        table = model._meta.db_table
+        weights = dict(zip(sorted(set(SEARCH_FIELDS[model].values()), reverse=True), 'ABCD'))
+        weighted = ' || '.join(
+            f"setweight(to_tsvector('{self.CONFIG}', coalesce(\"{table}\".{field}, '')), '{weights[weight]}')"
+            for field, weight in SEARCH_FIELDS[model].items()
+        )
+        # ts_rank grows with relevance; negate so lower sorts first everywhere
+        rank = RawSQL(f"-ts_rank({weighted}, to_tsquery('{self.CONFIG}', %s))", [self.tsquery(tokens)])
+        return queryset.annotate(search_rank=rank).order_by('search_rank', 'pk')
+
+
+class IContainsBackend(SearchBackend):
+    def matching(self, model, tokens):
+        # Every token must appear in at least one of the fields
+        return model.objects.filter(reduce(and_, (
+            reduce(or_, (Q(**{f'{field}__icontains': token}) for field in SEARCH_FIELDS[model]))
+            for token in tokens
+        ))).values('pk')
+
+    def rank(self, queryset, tokens):
+        return queryset.order_by('pk')
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(db_connection=None):
+    path = getattr(settings, 'CRM_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    vendor = (db_connection or connection).vendor
+    return VENDOR_BACKENDS.get(vendor, IContainsBackend)()
+
+
+def search(queryset, term):
+    """Filter ``queryset`` to rows matching ``term``, most relevant first."""
+    return get_backend().search(queryset, term)
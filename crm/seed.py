@@ -0,0 +1,247 @@
+# crm/seed.py
+
+"""
+Deterministic synthetic customers, products and orders at benchmark scale.
+
+``seed_crm`` adds ``customers`` customers and ``products`` products, then
+``orders`` orders drawn over every customer and product in the database:
+
+* sign-ups fall in the ``days`` before ``end`` with a density growing by
+  ``growth`` (0 is uniform, 1 linear growth), and each order falls between
+  its customer's sign-up and ``end``, skewed the same way;
+* customers and products get log-normal popularity weights
+  (``customer_sigma``, ``product_sigma``), so a few are ordered much more
+  often than the median;
+* baskets hold ``1 + Geometric`` distinct products with mean ``basket_mean``,
+  at most ``max_basket``;
+* prices are log-normal around ``price_median``, and every ``total_amount``
+  is the sum of its basket's prices.
+
+The same ``seed``, parameters, ``end`` and starting database give the same
+rows. Customers and products are written with ``bulk_create``. Orders and
+their ``Order.products`` rows are written as multi-row INSERTs built here,
+since preparing the values per object costs several times the insert itself.
+Each batch of orders is committed with its rollup delta. Customer, product
+and order ids are explicit, so their sequences are reset afterwards (a
+no-op on SQLite, which takes the next id from the table).
+"""
+
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .bulk import explicit_dates
+from .models import Customer, Order, Product
+from .response_cache import invalidate_models
+from .rollups import RollupDelta
+
+DEFAULT_BATCH_SIZE = 20000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+NAIVE_EPOCH = datetime(1970, 1, 1)
+
+
+def _next_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def _reset_sequences(*models):
+    """Move the id sequences of ``models`` past the explicit ids written here."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def _skewed(rng, growth):
+    """A position in [0, 1) with density proportional to ``x ** growth``."""
+    return rng.random() ** (1 / (1 + growth))
+
+
+def _insert(model, fields, rows):
+    """INSERT ``rows`` (tuples of database values for ``fields``) in as few statements as the backend allows."""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in fields]
+    columns = ', '.join(quote(field.column) for field in fields)
+    placeholder = f"({', '.join(['%s'] * len(fields))})"
+    batch_size = connection.ops.bulk_batch_size(fields, rows)
+    with connection.cursor() as cursor:
+        # Past the DEBUG query log, which would format every parameter
+        cursor = cursor.cursor
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            cursor.execute(
+                f"INSERT INTO {quote(model._meta.db_table)} ({columns}) "
+                f"VALUES {', '.join([placeholder] * len(batch))}",
+                [value for row in batch for value in row],
+            )
+
+
+def _db_datetime():
+    """Convert UTC epoch seconds to what the backend stores for a DateTimeField."""
+    if connection.vendor == 'sqlite':
+        # What SQLite's adapt_datetimefield_value produces, without its per-value checks
+        return lambda seconds: str(NAIVE_EPOCH + timedelta(seconds=seconds))
+    return lambda seconds: EPOCH + timedelta(seconds=seconds)
+
+
+def _local_day():
+    """Convert UTC epoch seconds to the local date the rollups use."""
+    tz = timezone.get_current_timezone()
+    if tz.utcoffset(None) == timedelta(0):
+        return lambda seconds: (NAIVE_EPOCH + timedelta(seconds=seconds)).date()
+    return lambda seconds: (EPOCH + timedelta(seconds=seconds)).astimezone(tz).date()
+
+
+def seed_customers(rng, count, start, span, growth, batch_size):
+    pk = _next_pk(Customer)
+    with explicit_dates(Customer._meta.get_field('created_at')):
+        for first in range(0, count, batch_size):
+            customers = []
+            for i in range(pk + first, pk + min(first + batch_size, count)):
+                phone = f"+1{rng.randrange(2000000000, 9999999999)}" if rng.random() < 0.7 else None
+                customers.append(Customer(
+                    id=i, name=f"Customer {i}", email=f"customer{i}@example.com", phone=phone,
+                    created_at=start + timedelta(seconds=int(_skewed(rng, growth) * span)),
+                ))
+            with transaction.atomic():
+                Customer.objects.bulk_create(customers)
+                delta = RollupDelta()
+                for customer in customers:
+                    delta.add_customer(customer.created_at)
+                delta.apply()
+            yield len(customers)
+
+
+def seed_products(rng, count, price_median, price_sigma, batch_size):
+    pk = _next_pk(Product)
+    mu = math.log(price_median)
+    for first in range(0, count, batch_size):
+        products = [
+            Product(
+                id=i, name=f"Product {i}",
+                price=Decimal(max(50, round(rng.lognormvariate(mu, price_sigma) * 100))).scaleb(-2),
+                stock=rng.randrange(0, 200),
+            )
+            for i in range(pk + first, pk + min(first + batch_size, count))
+        ]
+        Product.objects.bulk_create(products)
+        yield len(products)
+
+
+def seed_orders(rng, count, end, growth, customer_sigma, product_sigma, basket_mean, max_basket, batch_size):
+    customers = list(Customer.objects.order_by('pk').values_list('pk', 'created_at'))
+    products = list(Product.objects.order_by('pk').values_list('pk', 'price'))
+    if not customers or not products:
+        raise ValueError("Orders need at least one customer and one product")
+
+    end_seconds = (end - EPOCH).total_seconds()
+    signups = [min((created_at - EPOCH).total_seconds(), end_seconds) for _, created_at in customers]
+    customer_weights = _cumulative(rng.lognormvariate(0, customer_sigma) for _ in customers)
+    product_weights = _cumulative(rng.lognormvariate(0, product_sigma) for _ in products)
+    cents = [int(price * 100) for _, price in products]
+    max_basket = min(max_basket, len(products))
+    # 1 + Geometric(p) has mean 1 / p
+    log_miss = math.log(1 - 1 / basket_mean) if basket_mean > 1 else None
+
+    db_datetime = _db_datetime()
+    local_day = _local_day()
+    customer_indexes = range(len(customers))
+    product_indexes = range(len(products))
+    pk = _next_pk(Order)
+
+    for first in range(0, count, batch_size):
+        size = min(batch_size, count - first)
+        orders, lines = [], []
+        days = defaultdict(lambda: [0, 0])
+        units = Counter()
+        for offset, c in enumerate(rng.choices(customer_indexes, cum_weights=customer_weights, k=size)):
+            order_id = pk + first + offset
+            signup = signups[c]
+            seconds = int(signup + _skewed(rng, growth) * (end_seconds - signup))
+            basket = 1
+            if log_miss is not None:
+                basket = min(max_basket, 1 + int(math.log(1 - rng.random()) / log_miss))
+            picked = set()
+            for p in rng.choices(product_indexes, cum_weights=product_weights, k=basket * 2):
+                picked.add(p)
+                if len(picked) == basket:
+                    break
+            total = sum(cents[p] for p in picked)
+            day = local_day(seconds)
+            days[day][0] += 1
+            days[day][1] += total
+            for p in picked:
+                lines.append((order_id, products[p][0]))
+                units[day, products[p][0]] += 1
+            orders.append((order_id, customers[c][0], str(Decimal(total).scaleb(-2)), db_datetime(seconds)))
+
+        delta = RollupDelta()
+        for day, (day_orders, revenue) in days.items():
+            delta.days[day][0] += day_orders
+            delta.days[day][1] += Decimal(revenue).scaleb(-2)
+        delta.units.update(units)
+        with transaction.atomic():
+            _insert(Order, ['id', 'customer', 'total_amount', 'order_date'], orders)
+            _insert(Order.products.through, ['order', 'product'], lines)
+            delta.apply()
+        yield len(orders), len(lines)
+
+
+def _cumulative(weights):
+    total = 0.0
+    cumulative = []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+
+def seed_crm(customers=0, products=0, orders=0, seed=0, end=None, days=730, growth=1.0,
+             customer_sigma=1.0, product_sigma=1.5, basket_mean=2.5, max_basket=10,
+             price_median=Decimal('25'), price_sigma=1.0, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Add synthetic rows, yielding a progress dict after each committed batch.
+    ``end`` is a date (default: today); history ends at its midnight UTC.
+    """
+    rng = random.Random(seed)
+    end = datetime.combine(end or timezone.now().date(), dt_time.min, tzinfo=dt_timezone.utc)
+    start = end - timedelta(days=days)
+    progress = {'customers': 0, 'products': 0, 'orders': 0, 'order_products': 0, 'orders_per_second': 0.0}
+
+    if connection.vendor == 'sqlite':
+        # A 256 MB page cache for this connection keeps the order indexes in memory
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size = -262144')
+
+    try:
+        for count in seed_customers(rng, customers, start, days * 86400, growth, batch_size):
+            progress['customers'] += count
+            yield dict(progress)
+        for count in seed_products(rng, products, price_median, price_sigma, batch_size):
+            progress['products'] += count
+            yield dict(progress)
+        if orders:
+            began = time.perf_counter()
+            batches = seed_orders(rng, orders, end, growth, customer_sigma, product_sigma,
+                                  basket_mean, max_basket, batch_size)
+            for order_count, line_count in batches:
+                progress['orders'] += order_count
+                progress['order_products'] += line_count
+                progress['orders_per_second'] = progress['orders'] / max(time.perf_counter() - began, 1e-9)
+                yield dict(progress)
+    finally:
+        if any(progress[key] for key in ('customers', 'products', 'orders')):
+            _reset_sequences(Customer, Product, Order)
+            invalidate_models(Customer, Order, Product)
@@ -0,0 +1,97 @@
+# crm/signals.py
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Customer, Order, Product
+from .response_cache import invalidate_models
+from .rollups import RollupDelta, local_day
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+def invalidate_cached_responses(sender, **kwargs):
+    invalidate_models(sender)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def invalidate_cached_order_products(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_models(Order, Product)
+
+
+# Daily rollups (see crm/rollups.py)
+
+@receiver(pre_save, sender=Order)
+def remember_rolled_up_order(sender, instance, **kwargs):
+    if instance.pk is not None and not instance._state.adding:
+        instance._rolled_up = Order.objects.filter(pk=instance.pk).values('order_date', 'total_amount').first()
+
+
+@receiver(post_save, sender=Order)
+def roll_up_saved_order(sender, instance, created, **kwargs):
+    delta = RollupDelta()
+    previous = getattr(instance, '_rolled_up', None)
+    if previous is not None:
+        delta.add_order(previous['order_date'], previous['total_amount'], sign=-1)
+        if local_day(previous['order_date']) != local_day(instance.order_date):
+            product_ids = list(instance.products.values_list('pk', flat=True))
+            delta.add_units(previous['order_date'], product_ids, sign=-1)
+            delta.add_units(instance.order_date, product_ids)
+    if created or previous is not None:
+        delta.add_order(instance.order_date, instance.total_amount)
+    instance._rolled_up = None
+    delta.apply()
+
+
+@receiver(pre_delete, sender=Order)
+def roll_up_deleted_order(sender, instance, **kwargs):
+    # Runs before the order-product rows are deleted
+    delta = RollupDelta()
+    delta.add_order(instance.order_date, instance.total_amount, sign=-1)
+    delta.add_units(instance.order_date, instance.products.values_list('pk', flat=True), sign=-1)
+    delta.apply()
+
+
+@receiver(post_save, sender=Customer)
+def roll_up_new_customer(sender, instance, created, **kwargs):
+    if created:
+        delta = RollupDelta()
+        delta.add_customer(instance.created_at)
+        delta.apply()
+
+
+@receiver(post_delete, sender=Customer)
+def roll_up_deleted_customer(sender, instance, **kwargs):
+    delta = RollupDelta()
+    delta.add_customer(instance.created_at, sign=-1)
+    delta.apply()
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def roll_up_order_products(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # The cleared rows are gone by post_clear, so count them now
+        through = sender.objects.filter(**{'product_id' if reverse else 'order_id': instance.pk})
+        instance._rolled_up_clear = list(through.values_list('order__order_date', 'product_id'))
+        return
+    if action == 'post_clear':
+        pairs = getattr(instance, '_rolled_up_clear', [])
+        sign = -1
+    elif action in ('post_add', 'post_remove') and pk_set:
+        sign = 1 if action == 'post_add' else -1
+        if reverse:
+            dates = Order.objects.filter(pk__in=pk_set).values_list('order_date', flat=True)
+            pairs = [(order_date, instance.pk) for order_date in dates]
+        else:
+            pairs = [(instance.order_date, product_id) for product_id in pk_set]
+    else:
+        return
+    delta = RollupDelta()
+    for order_date, product_id in pairs:
+        delta.add_units(order_date, [product_id], sign=sign)
+    delta.apply()
@@ -0,0 +1,335 @@
+# crm/slow_operations.py
+
+"""
+A log of GraphQL requests slower than a threshold, with their SQL.
+
+``SlowOperationMiddleware`` keeps every SQL statement a request to the
+GraphQL endpoints issues (through a ``connection.execute_wrapper``, up to
+``MAX_STATEMENTS``). When the request took ``THRESHOLD_MS`` or longer it
+EXPLAINs the ``EXPLAIN_TOP`` slowest ``SELECT`` statements on the connection
+that ran them and appends one JSON line to ``LOG_FILE``:
+
+* the operation name, the normalized document (printed with its string
+  and number literals blanked, since inline arguments such as an email or
+  a phone number are personal data) and a fingerprint of it, which
+  whitespace, comments, literals and variable values don't change;
+* the names of the variables, without their values;
+* every statement's SQL and duration, and the plans. Statement parameters
+  carry the same personal data as the variables and are left out.
+
+The file rotates at ``MAX_BYTES``, keeping ``BACKUP_COUNT`` old files.
+``manage.py slow_operations`` summarizes the log by fingerprint. When
+disabled the middleware removes itself at startup.
+
+Settings (all optional)::
+
+    GRAPHQL_SLOW_OPERATIONS = {
+        'ENABLED': False,
+        'THRESHOLD_MS': 1000,
+        'PATH_PREFIX': '/graphql',
+        'LOG_FILE': '/tmp/crm_slow_operations.jsonl',
+        'MAX_BYTES': 10 * 1024 * 1024,
+        'BACKUP_COUNT': 5,
+        'MAX_STATEMENTS': 500,
+        'EXPLAIN_TOP': 3,
+    }
+"""
+
+import hashlib
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from graphql import (
+    FloatValueNode,
+    GraphQLError,
+    IntValueNode,
+    StringValueNode,
+    Visitor,
+    parse,
+    print_ast,
+    visit,
+)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'THRESHOLD_MS': 1000,
+    'PATH_PREFIX': '/graphql',
+    'LOG_FILE': '/tmp/crm_slow_operations.jsonl',
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
+    'MAX_STATEMENTS': 500,
+    'EXPLAIN_TOP': 3,
+}
+
+# Stands in for the parameters of executemany() statements, which aren't explained
+_MANY = object()
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'GRAPHQL_SLOW_OPERATIONS', {}))
+    return config
+
+
+class StripLiterals(Visitor):
+    """Blanks string and number literals, including those in lists, objects and variable defaults."""
+
+    def enter_string_value(self, node, *args):
+        return StringValueNode(value='')
+
+    def enter_int_value(self, node, *args):
+        return IntValueNode(value='0')
+
+    def enter_float_value(self, node, *args):
+        return FloatValueNode(value='0')
+
+
+def normalize(document):
+    """``document`` printed without literals, or None if it doesn't parse."""
+    if document is None:
+        return None
+    try:
+        return print_ast(visit(parse(document), StripLiterals()))
+    except GraphQLError:
+        return None
+
+
+def fingerprint(document):
+    """A short hash of the normalized ``document``, or of its text if it doesn't parse."""
+    if document is None:
+        return None
+    document = normalize(document) or document
+    return hashlib.sha256(document.encode()).hexdigest()[:16]
+
+
+class RequestLog:
+    """The operation and the SQL of one request."""
+
+    __slots__ = ('max_statements', 'document', 'variables', 'operation', 'statements', 'dropped')
+
+    def __init__(self, max_statements):
+        self.max_statements = max_statements
+        self.document = None
+        self.variables = None
+        self.operation = None
+        # [alias, sql, params, seconds]
+        self.statements = []
+        self.dropped = 0
+
+
+_current = ContextVar('crm_slow_operations', default=None)
+
+
+def capture_operation(document, variables, operation_ast):
+    """Note the operation the current request runs, if it is being recorded."""
+    current = _current.get()
+    if current is None:
+        return
+    current.document = document
+    current.variables = variables
+    if operation_ast is not None and operation_ast.name:
+        current.operation = operation_ast.name.value
+
+
+def capture_sql(execute, sql, params, many, context):
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if len(current.statements) < current.max_statements:
+            current.statements.append(
+                [context['connection'].alias, sql, _MANY if many else params, time.perf_counter() - start]
+            )
+        else:
+            current.dropped += 1
+
+
+def _instrument(sender=None, connection=None, **kwargs):
+    if capture_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_sql)
+
+
+def instrument_connections():
+    connection_created.connect(_instrument, dispatch_uid='crm.slow_operations')
+    for connection in connections.all(initialized_only=True):
+        _instrument(connection=connection)
+
+
+def explain(alias, sql, params):
+    """The plan of one statement as a list of lines."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            rows = cursor.fetchall()
+    except DatabaseError as e:
+        return [f'EXPLAIN failed: {e}']
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [' '.join(str(column) for column in row) for row in rows]
+
+
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+def _handler(config):
+    key = (config['LOG_FILE'], config['MAX_BYTES'], config['BACKUP_COUNT'])
+    with _handlers_lock:
+        if key not in _handlers:
+            handler = RotatingFileHandler(
+                config['LOG_FILE'], maxBytes=config['MAX_BYTES'], backupCount=config['BACKUP_COUNT'],
+                encoding='utf-8', delay=True,
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            _handlers[key] = handler
+        return _handlers[key]
+
+
+def build_entry(current, path, seconds, config):
+    statements = current.statements
+    slowest = sorted(
+        (statement for statement in statements if statement[2] is not _MANY
+         and statement[1].lstrip()[:6].upper() == 'SELECT'),
+        key=lambda statement: -statement[3],
+    )[:config['EXPLAIN_TOP']]
+    return {
+        'timestamp': timezone.now().isoformat(),
+        'path': path,
+        'operation': current.operation,
+        'fingerprint': fingerprint(current.document),
+        'duration_ms': round(seconds * 1000, 3),
+        'document': normalize(current.document),
+        'variables': sorted(current.variables or ()),
+        'sql_count': len(statements) + current.dropped,
+        'sql_ms': round(sum(statement[3] for statement in statements) * 1000, 3),
+        'sql_dropped': current.dropped,
+        'sql': [
+            {'alias': alias, 'sql': sql, 'duration_ms': round(seconds * 1000, 3)}
+            for alias, sql, params, seconds in statements
+        ],
+        'explain': [
+            {'sql': sql, 'duration_ms': round(seconds * 1000, 3), 'plan': explain(alias, sql, params)}
+            for alias, sql, params, seconds in slowest
+        ],
+    }
+
+
+def write_entry(entry, config):
+    line = json.dumps(entry, cls=DjangoJSONEncoder)
+    _handler(config).handle(logging.makeLogRecord({'msg': line, 'levelno': logging.INFO}))
+
+
+class SlowOperationMiddleware:
+    """Django middleware logging requests to ``PATH_PREFIX`` slower than ``THRESHOLD_MS``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.config = config
+        self.get_response = get_response
+        self.threshold = config['THRESHOLD_MS'] / 1000
+        instrument_connections()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not request.path.startswith(self.config['PATH_PREFIX']):
+            return self.get_response(request)
+        current = RequestLog(self.config['MAX_STATEMENTS'])
+        token = _current.set(current)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            _current.reset(token)
+            seconds = time.perf_counter() - start
+            if seconds >= self.threshold:
+                self.record(current, request, response, seconds)
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.config['PATH_PREFIX']):
+            return await self.get_response(request)
+        current = RequestLog(self.config['MAX_STATEMENTS'])
+        token = _current.set(current)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            _current.reset(token)
+            seconds = time.perf_counter() - start
+            if seconds >= self.threshold:
+                await sync_to_async(self.record)(current, request, response, seconds)
+
+    def record(self, current, request, response, seconds):
+        entry = build_entry(current, request.path, seconds, self.config)
+        # None when the view raised
+        entry['status'] = getattr(response, 'status_code', None)
+        write_entry(entry, self.config)
+
+
+def read_entries(path):
+    """Yield the entries of ``path`` and its rotated files, oldest first."""
+    paths = [f'{path}.{i}' for i in range(get_config()['BACKUP_COUNT'], 0, -1)] + [path]
+    for name in paths:
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def summarize(entries):
+    """
+    Group ``entries`` by fingerprint, slowest total time first. Each group
+    reports its count, median, maximum and total duration, its mean SQL
+    count and the slowest sample.
+    """
+    groups = {}
+    for entry in entries:
+        groups.setdefault(entry['fingerprint'], []).append(entry)
+    summary = []
+    for key, group in groups.items():
+        durations = [entry['duration_ms'] for entry in group]
+        slowest = max(group, key=lambda entry: entry['duration_ms'])
+        summary.append({
+            'fingerprint': key,
+            'operation': slowest['operation'],
+            'count': len(group),
+            'p50_ms': statistics.median(durations),
+            'max_ms': max(durations),
+            'total_ms': sum(durations),
+            'mean_sql_count': sum(entry['sql_count'] for entry in group) / len(group),
+            'slowest': slowest,
+        })
+    summary.sort(key=lambda group: -group['total_ms'])
+    return summary
@@ -0,0 +1,162 @@
+# crm/stats.py
+
+"""
+Database-side aggregates for CRM reporting.
+
+Counts and revenue are computed with COUNT/SUM in SQL so callers only ever
+receive a handful of numbers. Whole days come from the daily rollups, so
+their cost does not grow with the number of orders either.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import Customer, DailyCrmRollup, Order
+from .rollups import day_start, local_day
+
+PERIOD_FUNCTIONS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+CENTS = Decimal('0.01')
+
+
+def _money(value):
+    # SQLite hands SUM() back without the column's decimal places
+    return (value or Decimal('0')).quantize(CENTS)
+
+
+def _date_range(queryset, field, start=None, end=None):
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
+
+
+def _split_range(start, end):
+    """
+    Split ``[start, end)`` into the whole local days the rollups answer
+    (``first_day`` inclusive to ``last_day`` exclusive, ``None`` for
+    unbounded) and the partial days at its edges, which are read from the
+    raw tables.
+    """
+    if start is not None and end is not None and start >= end:
+        return None, [(start, end)]
+    first_day = last_day = None
+    edges = []
+    if start is not None:
+        first_day = local_day(start)
+        if day_start(first_day) < start:
+            first_day += timedelta(days=1)
+    if end is not None:
+        last_day = local_day(end)
+    if first_day is not None and last_day is not None and first_day >= last_day:
+        # No whole day in the range
+        return None, [(start, end)]
+    if start is not None and day_start(first_day) > start:
+        edges.append((start, day_start(first_day)))
+    if end is not None and day_start(last_day) < end:
+        edges.append((day_start(last_day), end))
+    return (first_day, last_day), edges
+
+
+def _bucket(buckets, period):
+    return buckets.setdefault(period, {
+        'period': period,
+        'orders': 0,
+        'revenue': _money(None),
+        'new_customers': 0,
+    })
+
+
+def _add_rollups(stats, buckets, first_day, last_day, group_by):
+    rollups = DailyCrmRollup.objects.all()
+    if first_day is not None:
+        rollups = rollups.filter(date__gte=first_day)
+    if last_day is not None:
+        rollups = rollups.filter(date__lt=last_day)
+    sums = {'orders': Sum('orders'), 'revenue': Sum('revenue'), 'new_customers': Sum('new_customers')}
+
+    if group_by is None:
+        totals = rollups.aggregate(**sums)
+        rows = [totals]
+    else:
+        rows = rollups.annotate(period=PERIOD_FUNCTIONS[group_by]('date')).values('period').annotate(**sums).order_by()
+
+    for row in rows:
+        stats['total_orders'] += row['orders'] or 0
+        stats['total_revenue'] += row['revenue'] or 0
+        stats['total_customers'] += row['new_customers'] or 0
+        if group_by is not None:
+            bucket = _bucket(buckets, day_start(row['period']))
+            bucket['orders'] += row['orders']
+            bucket['revenue'] = _money(bucket['revenue'] + row['revenue'])
+            bucket['new_customers'] += row['new_customers']
+
+
+def _add_raw(stats, buckets, start, end, group_by):
+    customers = _date_range(Customer.objects.all(), 'created_at', start, end)
+    orders = _date_range(Order.objects.all(), 'order_date', start, end)
+
+    totals = orders.aggregate(total_orders=Count('id'), total_revenue=Sum('total_amount'))
+    stats['total_customers'] += customers.count()
+    stats['total_orders'] += totals['total_orders']
+    stats['total_revenue'] += totals['total_revenue'] or 0
+
+    if group_by is not None:
+        trunc = PERIOD_FUNCTIONS[group_by]
+        order_rows = (
+            orders.annotate(period=trunc('order_date'))
+            .values('period')
+            .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+            .order_by()
+        )
+        for row in order_rows:
+            bucket = _bucket(buckets, row['period'])
+            bucket['orders'] += row['orders']
+            bucket['revenue'] = _money(bucket['revenue'] + row['revenue'])
+        customer_rows = (
+            customers.annotate(period=trunc('created_at'))
+            .values('period')
+            .annotate(new_customers=Count('id'))
+            .order_by()
+        )
+        for row in customer_rows:
+            _bucket(buckets, row['period'])['new_customers'] += row['new_customers']
+
+
+def compute_crm_stats(start=None, end=None, group_by=None):
+    """
+    Return totals for customers, orders and revenue.
+
+    ``start`` is inclusive and ``end`` exclusive; they bound ``Order.order_date``
+    and ``Customer.created_at``. When ``group_by`` is ``'day'``, ``'week'`` or
+    ``'month'`` the result also carries per-period buckets, oldest first.
+
+    Whole days are read from ``DailyCrmRollup`` (see ``crm.rollups``), so
+    the cost follows the number of days covered, not the number of orders;
+    only a partial first or last day is aggregated from the raw tables.
+    """
+    stats = {
+        'total_customers': 0,
+        'total_orders': 0,
+        'total_revenue': Decimal('0'),
+        'buckets': None,
+    }
+    buckets = {}
+    days, edges = _split_range(start, end)
+    if days is not None:
+        _add_rollups(stats, buckets, *days, group_by)
+    for edge_start, edge_end in edges:
+        _add_raw(stats, buckets, edge_start, edge_end, group_by)
+
+    stats['total_revenue'] = _money(stats['total_revenue'])
+    if group_by is not None:
+        stats['buckets'] = [buckets[period] for period in sorted(buckets)]
+    return stats
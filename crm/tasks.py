@@ -2,13 +2,17 @@
 Celery tasks for CRM application.
 """
 
-import requests
-from celery import shared_task
+from celery import chord, shared_task
 from datetime import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
 from decimal import Decimal
 
+from django.core.mail import get_connection
+
+from crm.graphql_client import execute
+from crm.reminders import get_config as get_reminder_config
+from crm.reminders import reminder_message
+from crm.reports import DEFAULT_TOP_N, compute_partition, merge_partitions, partition_bounds
+
 
 @shared_task
 def generate_crm_report():
@@ -21,52 +25,22 @@ def generate_crm_report():
     Logs the report to /tmp/crm_report_log.txt
     """
     try:
-        # Set up the GraphQL client
-        transport = RequestsHTTPTransport(
-            url='http://localhost:8000/graphql',
-            use_json=True,
-        )
-        
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-        
-        # Define the GraphQL query to fetch CRM statistics
-        query = gql("""
+        # Let the schema aggregate; only three numbers come back
+        result = execute("""
             query {
-                allCustomers {
-                    edges {
-                        node {
-                            id
-                        }
-                    }
-                }
-                allOrders {
-                    edges {
-                        node {
-                            id
-                            totalAmount
-                        }
-                    }
+                crmStats {
+                    totalCustomers
+                    totalOrders
+                    totalRevenue
                 }
             }
         """)
         
-        # Execute the query
-        result = client.execute(query)
-        
-        # Calculate statistics
-        customers = result.get('allCustomers', {}).get('edges', [])
-        total_customers = len(customers)
-        
-        orders = result.get('allOrders', {}).get('edges', [])
-        total_orders = len(orders)
-        
-        # Calculate total revenue
-        total_revenue = Decimal('0.00')
-        for order in orders:
-            order_node = order.get('node', {})
-            amount = order_node.get('totalAmount', '0')
-            if amount:
-                total_revenue += Decimal(str(amount))
+        # Extract statistics
+        stats = result.get('crmStats') or {}
+        total_customers = stats.get('totalCustomers') or 0
+        total_orders = stats.get('totalOrders') or 0
+        total_revenue = Decimal(str(stats.get('totalRevenue') or '0'))
         
         # Format timestamp
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -92,4 +66,53 @@ def generate_crm_report():
             log_file.write(error_message + '\n')
         
         print(f"Error generating CRM report: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+@shared_task(rate_limit=get_reminder_config()['RATE_LIMIT'])
+def send_reminder_batch(orders):
+    """
+    Email one chunk of order reminders (see crm/reminders.py) over a single
+    mail connection. Returns the number of messages sent.
+    """
+    from_email = get_reminder_config()['FROM_EMAIL']
+    with get_connection() as connection:
+        return connection.send_messages([reminder_message(order, from_email) for order in orders])
+
+
+@shared_task
+def generate_partitioned_crm_report(start=None, end=None, partitions=8, top_n=DEFAULT_TOP_N):
+    """
+    Report on orders and sign-ups in ``[start, end)`` (ISO 8601 strings, both
+    optional), e.g. for a quarter or a year. The customers are split into
+    ``partitions`` primary-key ranges that workers aggregate in parallel, and
+    ``merge_crm_report`` combines them once all are done (see crm/reports.py).
+    """
+    header = [
+        compute_crm_report_partition.s(first_pk, last_pk, start, end, top_n)
+        for first_pk, last_pk in partition_bounds(partitions)
+    ]
+    callback = merge_crm_report.s(start, end, top_n)
+    if not header:
+        return callback.apply_async(([],))
+    return chord(header)(callback)
+
+
+@shared_task
+def compute_crm_report_partition(first_pk, last_pk, start=None, end=None, top_n=DEFAULT_TOP_N):
+    return compute_partition(first_pk, last_pk, start, end, top_n)
+
+
+@shared_task
+def merge_crm_report(partials, start=None, end=None, top_n=DEFAULT_TOP_N):
+    """Merge the partition results and log the report to /tmp/crm_report_log.txt."""
+    report = merge_partitions(partials, top_n)
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    top = ', '.join(f"{customer['email']} (${customer['revenue']})" for customer in report['top_customers'])
+    report_message = (
+        f"{timestamp} - Report {start or 'start'} to {end or 'now'}: {report['new_customers']} new customers, "
+        f"{report['orders']} orders, ${report['revenue']} revenue. Top customers: {top or 'none'}."
+    )
+    with open('/tmp/crm_report_log.txt', 'a') as log_file:
+        log_file.write(report_message + '\n')
+    return report
@@ -1,3 +1,1729 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.views.decorators.csrf import csrf_exempt
+
+from graphene.utils.str_converters import to_camel_case
+from graphql_relay import offset_to_cursor, to_global_id
+
+from alx_backend_graphql.schema import schema
+from crm.celery import app as celery_app
+from crm.cleanup import delete_inactive_customers
+from crm.bulk import explicit_dates
+from crm.export import stream_export
+from crm.filters import CustomerFilter, OrderFilter, ProductFilter
+from crm.graphql_client import GraphQLClientError, LocalClient
+from crm.importer import get_checkpoint, read_rows, run_import
+from crm.loaders import CRMLoaders
+from crm.metrics import registry as metrics_registry
+from crm.metrics import resolver_middleware
+from crm.models import Customer, DailyCrmRollup, DailyProductRollup, ImportCheckpoint, Product, Order
+from crm.optimizer import page_window
+from crm.persisted_queries import DocumentCache, PersistedQueryStore, get_config, query_hash
+from crm.reminders import send_order_reminders
+from crm.rollups import rebuild_rollups
+from crm.slow_operations import read_entries
+from crm.tasks import generate_partitioned_crm_report
+from crm.response_cache import ResponseCache
+from crm.response_cache import get_config as get_response_cache_config
+from crm.response_cache import stats as response_cache_stats
+from crm.views import AsyncCRMGraphQLView, CRMGraphQLView
+
+
+def seed_orders(count, products_per_order=3):
+    """Create ``count`` orders, each with its own customer and products."""
+    start = Customer.objects.count()
+    for i in range(start, start + count):
+        customer = Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com")
+        products = [
+            Product.objects.create(name=f"Product {i}-{j}", price=Decimal('10.00'), stock=5)
+            for j in range(products_per_order)
+        ]
+        order = Order.objects.create(customer=customer, total_amount=Decimal('30.00'))
+        order.products.set(products)
+
+
+def seed_dataset(customers, orders_per_customer=3, products_per_customer=2):
+    """
+    Bulk insert ``customers`` more customers with a share of the catalog and
+    their orders: baskets of one to four products, totals matching the
+    prices, and order and signup dates spread over the last 90 days.
+    """
+    start = Customer.objects.count()
+    now = datetime(2025, 6, 1, tzinfo=dt_timezone.utc)
+    with explicit_dates(Customer._meta.get_field('created_at'), Order._meta.get_field('order_date')):
+        new_customers = Customer.objects.bulk_create([
+            Customer(
+                name=f"Customer {i}", email=f"customer{i}@example.com", phone=f"+1555{i:07d}",
+                created_at=now - timedelta(days=i % 90, hours=i % 24),
+            )
+            for i in range(start, start + customers)
+        ])
+        Product.objects.bulk_create([
+            Product(name=f"Product {i}", price=Decimal('1.25') * (i % 40 + 1), stock=i % 25)
+            for i in range(start * products_per_customer, (start + customers) * products_per_customer)
+        ])
+        catalog = list(Product.objects.all())
+        baskets = []
+        orders = []
+        for i, customer in enumerate(new_customers):
+            for j in range(orders_per_customer):
+                n = (start + i) * orders_per_customer + j
+                basket = [catalog[(n * 7 + k) % len(catalog)] for k in range(min(n % 4 + 1, len(catalog)))]
+                baskets.append(basket)
+                orders.append(Order(
+                    customer=customer,
+                    total_amount=sum(product.price for product in basket),
+                    order_date=now - timedelta(days=n % 90, minutes=n),
+                ))
+        Order.objects.bulk_create(orders)
+    Through = Order.products.through
+    Through.objects.bulk_create([
+        Through(order_id=order.pk, product_id=product.pk)
+        for order, basket in zip(orders, baskets) for product in basket
+    ])
+    # bulk_create bypasses the incremental rollup maintenance
+    rebuild_rollups()
+
+
+class GraphQLTestMixin:
+    def execute(self, query, variables=None):
+        request = RequestFactory().post('/graphql')
+        result = schema.execute(query, variable_values=variables, context_value=request)
+        self.assertIsNone(result.errors, result.errors)
+        return result.data
+
+
+class DataLoaderTests(GraphQLTestMixin, TestCase):
+    ORDERS_QUERY = """
+        query {
+            allOrders(first: 50) {
+                edges {
+                    node {
+                        totalAmount
+                        customer { email }
+                        products { edges { node { name } } }
+                    }
+                }
+            }
+        }
+    """
+
+    CUSTOMERS_QUERY = """
+        query {
+            allCustomers {
+                edges {
+                    node {
+                        name
+                        orders {
+                            edges {
+                                node {
+                                    customer { email }
+                                    products { edges { node { name orders { edges { node { id } } } } } }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    """
+
+    def assertConstantQueries(self, query, expected):
+        seed_orders(2)
+        with self.assertNumQueries(expected):
+            small = self.execute(query)
+        seed_orders(20)
+        with self.assertNumQueries(expected):
+            large = self.execute(query)
+        return small, large
+
+    def test_order_relations_are_batched(self):
+        # count + page joined with customers + order products
+        _, data = self.assertConstantQueries(self.ORDERS_QUERY, 3)
+        edges = data['allOrders']['edges']
+        self.assertEqual(len(edges), 22)
+        node = edges[0]['node']
+        self.assertEqual(node['customer']['email'], 'customer0@example.com')
+        self.assertEqual(len(node['products']['edges']), 3)
+
+    def test_nested_reverse_relations_are_batched(self):
+        # count + page + customer orders + order products + product orders
+        _, data = self.assertConstantQueries(self.CUSTOMERS_QUERY, 5)
+        order = data['allCustomers']['edges'][0]['node']['orders']['edges'][0]['node']
+        product = order['products']['edges'][0]['node']
+        self.assertEqual(len(product['orders']['edges']), 1)
+
+    def test_customer_orders_customer_round_trip(self):
+        # Prefetched orders point back at their customer; priming them must
+        # not follow that customer's orders again
+        seed_orders(2)
+        query = """
+            query { allOrders { edges { node { id
+                customer { email orders { edges { node { id } } } }
+            } } } }
+        """
+        with self.assertNumQueries(3):
+            data = self.execute(query)
+        for edge in data['allOrders']['edges']:
+            orders = edge['node']['customer']['orders']['edges']
+            self.assertEqual([order['node']['id'] for order in orders], [edge['node']['id']])
+
+    def test_loaders_are_scoped_to_the_request(self):
+        seed_orders(1)
+        self.execute(self.ORDERS_QUERY)
+        Customer.objects.update(email='renamed@example.com')
+        data = self.execute(self.ORDERS_QUERY)
+        node = data['allOrders']['edges'][0]['node']
+        self.assertEqual(node['customer']['email'], 'renamed@example.com')
+
+    def test_loaders_batch_unplanned_instances(self):
+        seed_orders(5)
+        loaders = CRMLoaders()
+        orders = list(Order.objects.all())
+        loaders.prime(orders)
+        with self.assertNumQueries(2):
+            for order in orders:
+                self.assertEqual(loaders.customer.load(order.customer_id).pk, order.customer_id)
+                self.assertEqual(len(loaders.order_products.load(order.pk)), 3)
+
+    def test_relation_loaders_fetch_only_the_page(self):
+        seed_orders(1)
+        customer, product = Customer.objects.get(), Product.objects.first()
+        for _ in range(4):
+            Order.objects.create(customer=customer, total_amount=Decimal('10.00')).products.add(product)
+        orders = list(Order.objects.order_by('pk'))
+        loaders = CRMLoaders()
+        loaders.prime([customer, product])
+        with self.assertNumQueries(1):
+            page = loaders.customer_orders.load(customer.pk, page_window({'first': 2, 'offset': 1}, 100))
+        # Only the page's rows are read, at their positions in the relation
+        self.assertEqual((len(page), page.start, page.rows), (5, 1, orders[1:3]))
+        with self.assertNumQueries(1):
+            page = loaders.product_orders.load(product.pk, page_window({'last': 2}, 100))
+        self.assertEqual((len(page), page.start, page.rows), (5, 3, orders[3:]))
+
+
+class QueryOptimizerTests(GraphQLTestMixin, TestCase):
+    def capture(self, query, variables=None):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.execute(query, variables)
+        return data, [q['sql'] for q in queries.captured_queries]
+
+    def test_only_selected_columns_are_fetched(self):
+        seed_orders(3)
+        data, queries = self.capture("query { allCustomers { edges { node { email } } } }")
+        page = queries[-1]
+        self.assertIn('"crm_customer"."email"', page)
+        self.assertNotIn('"crm_customer"."phone"', page)
+        self.assertNotIn('"crm_customer"."name"', page)
+        self.assertEqual(len(data['allCustomers']['edges']), 3)
+
+    def test_foreign_key_is_joined_with_projection(self):
+        seed_orders(3)
+        data, queries = self.capture("""
+            query { allOrders { edges { node { totalAmount customer { email } } } } }
+        """)
+        self.assertEqual(len(queries), 2)
+        self.assertIn('INNER JOIN "crm_customer"', queries[1])
+        self.assertNotIn('"crm_customer"."phone"', queries[1])
+        emails = [edge['node']['customer']['email'] for edge in data['allOrders']['edges']]
+        self.assertEqual(emails, [f"customer{i}@example.com" for i in range(3)])
+
+    def test_composes_with_filtersets_and_fragments(self):
+        seed_orders(3)
+        query = """
+            query ($name: String) {
+                allOrders(customerName: $name) { edges { node { ...OrderFields } } }
+            }
+            fragment OrderFields on OrderType {
+                customer { name }
+                products { edges { node { ... on ProductType { price } } } }
+            }
+        """
+        with self.assertNumQueries(3):
+            data = self.execute(query, {'name': 'Customer 1'})
+        edges = data['allOrders']['edges']
+        self.assertEqual(len(edges), 1)
+        self.assertEqual(edges[0]['node']['customer']['name'], 'Customer 1')
+        self.assertEqual(len(edges[0]['node']['products']['edges']), 3)
+
+    def test_nested_connections_prefetch_only_the_page(self):
+        seed_orders(1)
+        products = list(Product.objects.order_by('pk'))
+        customer = Customer.objects.get()
+        for _ in range(3):
+            Order.objects.create(customer=customer, total_amount=Decimal('30.00')).products.set(products)
+        order_ids = [to_global_id('OrderType', pk) for pk in Order.objects.order_by('pk').values_list('pk', flat=True)]
+        query = """
+            query ($after: String) {
+                allProducts(first: 2) { edges { node {
+                    first: orders(first: 1, after: $after) { edges { node { id } } pageInfo { hasNextPage } }
+                    last: orders(last: 1) { edges { node { id } } pageInfo { hasPreviousPage } }
+                } } }
+            }
+        """
+        cursor = offset_to_cursor(1)
+        data, queries = self.capture(query, {'after': cursor})
+        # count + page + one windowed prefetch per distinct page
+        self.assertEqual(len(queries), 4)
+        for sql in queries[2:]:
+            self.assertIn('ROW_NUMBER() OVER (PARTITION BY "crm_order_products"."product_id"', sql)
+        for edge in data['allProducts']['edges']:
+            self.assertEqual(edge['node']['first'], {
+                'edges': [{'node': {'id': order_ids[2]}}], 'pageInfo': {'hasNextPage': True},
+            })
+            self.assertEqual(edge['node']['last'], {
+                'edges': [{'node': {'id': order_ids[3]}}], 'pageInfo': {'hasPreviousPage': True},
+            })
+
+
+class CrmStatsTests(GraphQLTestMixin, TestCase):
+    def setUp(self):
+        seed_orders(3)
+        dates = ['2025-01-01T10:00:00+00:00', '2025-01-01T18:00:00+00:00', '2025-02-03T09:00:00+00:00']
+        for order, date in zip(Order.objects.order_by('id'), dates):
+            Order.objects.filter(pk=order.pk).update(order_date=date)
+            Customer.objects.filter(pk=order.customer_id).update(created_at=date)
+        # QuerySet.update() isn't tracked by the rollups
+        rebuild_rollups()
+
+    def test_totals_are_read_from_the_rollups(self):
+        with self.assertNumQueries(1):
+            data = self.execute("query { crmStats { totalCustomers totalOrders totalRevenue } }")
+        self.assertEqual(data['crmStats'], {
+            'totalCustomers': 3,
+            'totalOrders': 3,
+            'totalRevenue': '90.00',
+        })
+
+    def test_date_range_and_monthly_buckets(self):
+        data = self.execute("""
+            query {
+                crmStats(start: "2025-01-01T00:00:00+00:00", end: "2025-03-01T00:00:00+00:00", groupBy: MONTH) {
+                    totalOrders
+                    buckets { period orders revenue newCustomers }
+                }
+            }
+        """)
+        stats = data['crmStats']
+        self.assertEqual(stats['totalOrders'], 3)
+        self.assertEqual(stats['buckets'], [
+            {'period': '2025-01-01T00:00:00+00:00', 'orders': 2, 'revenue': '60.00', 'newCustomers': 2},
+            {'period': '2025-02-01T00:00:00+00:00', 'orders': 1, 'revenue': '30.00', 'newCustomers': 1},
+        ])
+
+    def test_empty_range_reports_zero_revenue(self):
+        data = self.execute('query { crmStats(start: "2030-01-01T00:00:00+00:00") { totalOrders totalRevenue } }')
+        self.assertEqual(data['crmStats'], {'totalOrders': 0, 'totalRevenue': '0.00'})
+
+
+def rollup_snapshot():
+    return (
+        list(DailyCrmRollup.objects.exclude(orders=0, new_customers=0)
+             .order_by('date').values_list('date', 'orders', 'revenue', 'new_customers')),
+        list(DailyProductRollup.objects.exclude(units=0)
+             .order_by('date', 'product_id').values_list('date', 'product_id', 'units')),
+    )
+
+
+class DailyRollupTests(GraphQLTestMixin, TestCase):
+    def assertMatchesRebuild(self):
+        incremental = rollup_snapshot()
+        rebuild_rollups()
+        self.assertEqual(incremental, rollup_snapshot())
+
+    def test_writes_keep_rollups_current(self):
+        seed_orders(3)
+        order = Order.objects.first()
+        order.products.remove(order.products.first())
+        order.total_amount = Decimal('12.50')
+        order.save()
+        Order.objects.last().products.clear()
+        Customer.objects.last().delete()
+        self.execute("""
+            mutation ($customer: ID!, $products: [ID]!) {
+                createOrder(input: {customerId: $customer, productIds: $products}) { order { id } }
+            }
+        """, {'customer': Customer.objects.first().pk, 'products': [Product.objects.first().pk]})
+        self.execute('mutation { bulkCreateCustomers(input: [{name: "Bo", email: "bo@example.com"}]) { errors } }')
+        self.assertEqual(DailyCrmRollup.objects.get().orders, 3)
+        self.assertMatchesRebuild()
+
+    def test_moving_an_order_moves_its_units(self):
+        seed_orders(1)
+        order = Order.objects.get()
+        order.order_date = datetime(2024, 5, 1, tzinfo=dt_timezone.utc)
+        order.save()
+        self.assertEqual(
+            set(DailyProductRollup.objects.exclude(units=0).values_list('date', flat=True)),
+            {order.order_date.date()},
+        )
+        self.assertMatchesRebuild()
+
+    def test_partial_days_are_read_from_orders(self):
+        seed_orders(3)
+        for order, date in zip(Order.objects.order_by('id'), ['2025-01-01T06:00', '2025-01-02T06:00', '2025-01-03T06:00']):
+            Order.objects.filter(pk=order.pk).update(order_date=f'{date}:00+00:00')
+        rebuild_rollups()
+        # 2025-01-02 from the rollups, the afternoon of the 1st and the
+        # morning of the 3rd from the orders table
+        with self.assertNumQueries(1 + 2 * 2):
+            data = self.execute("""
+                query { crmStats(start: "2025-01-01T05:00:00+00:00", end: "2025-01-03T07:00:00+00:00") { totalOrders } }
+            """)
+        self.assertEqual(data['crmStats']['totalOrders'], 3)
+        data = self.execute("""
+            query { crmStats(start: "2025-01-01T07:00:00+00:00", end: "2025-01-03T05:00:00+00:00", groupBy: DAY) {
+                totalOrders buckets { period orders } } }
+        """)
+        self.assertEqual(data['crmStats']['buckets'], [{'period': '2025-01-02T00:00:00+00:00', 'orders': 1}])
+
+    def test_bulk_imports_and_cleanup_keep_rollups_current(self):
+        seed_orders(1)
+        product_ids = ';'.join(str(pk) for pk in Product.objects.values_list('pk', flat=True)[:2])
+        rows = StringIO("name,email,created_at\nAnn,ann@example.com,2019-06-01T00:00:00+00:00\n")
+        list(run_import('customers', read_rows(rows, 'csv'), get_checkpoint('customers', 'c.csv')))
+        rows = StringIO(f"customer_email,product_ids,order_date\nann@example.com,{product_ids},2019-06-02T00:00:00+00:00\n")
+        list(run_import('orders', read_rows(rows, 'csv'), get_checkpoint('orders', 'o.csv')))
+        self.assertMatchesRebuild()
+        call_command('cleanup_inactive_customers', stdout=StringIO())
+        self.assertFalse(Customer.objects.filter(email='ann@example.com').exists())
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command(self):
+        seed_orders(2)
+        DailyCrmRollup.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_crm_rollups', '--start', '2000-01-01', stdout=out)
+        self.assertIn("Rebuilt 1 daily rollups", out.getvalue())
+        self.assertEqual(DailyCrmRollup.objects.get().orders, 2)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_crm_rollups', '--end', 'yesterday')
+
+
+class PartitionedReportTests(TestCase):
+    def setUp(self):
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+        product = Product.objects.create(name="Widget", price=Decimal('1.00'))
+        # customer i spends 10 * (i % 4 + 1) in Q1 and 1000 in Q2
+        for i in range(12):
+            customer = Customer.objects.create(name=f"Customer {i}", email=f"customer{i}@example.com")
+            for date, amount in [('2025-02-01', 10 * (i % 4 + 1)), ('2025-05-01', 1000)]:
+                order = Order.objects.create(customer=customer, total_amount=Decimal(amount) + Decimal('0.25'))
+                order.products.add(product)
+                Order.objects.filter(pk=order.pk).update(order_date=f'{date}T12:00:00+00:00')
+
+    def report(self, partitions):
+        with mock.patch('crm.tasks.open', mock.mock_open(), create=True) as log:
+            result = generate_partitioned_crm_report.delay(
+                '2025-01-01T00:00:00+00:00', '2025-04-01T00:00:00+00:00', partitions=partitions, top_n=3,
+            )
+        return result.get().get(), log
+
+    def test_partitions_merge_to_the_serial_result(self):
+        serial, _ = self.report(1)
+        self.assertEqual(serial['orders'], 12)
+        self.assertEqual(serial['revenue'], '303.00')
+        self.assertEqual([c['email'] for c in serial['top_customers']],
+                         ['customer3@example.com', 'customer7@example.com', 'customer11@example.com'])
+        for partitions in (2, 5, 12, 40):
+            self.assertEqual(self.report(partitions)[0], serial)
+
+    def test_report_is_logged(self):
+        _, log = self.report(4)
+        line = log().write.call_args[0][0]
+        self.assertIn("Report 2025-01-01T00:00:00+00:00 to 2025-04-01T00:00:00+00:00: 0 new customers, "
+                      "12 orders, $303.00 revenue. Top customers: customer3@example.com ($40.25)", line)
+
+
+class KeysetPaginationTests(GraphQLTestMixin, TestCase):
+    QUERY = """
+        query ($first: Int, $after: String, $last: Int, $before: String, $min: Decimal) {
+            allOrders(keyset: true, first: $first, after: $after, last: $last, before: $before,
+                      totalAmount_Gte: $min) {
+                pageInfo { hasNextPage hasPreviousPage endCursor startCursor }
+                edges { node { totalAmount customer { email } } }
+            }
+        }
+    """
+
+    def setUp(self):
+        seed_orders(7)
+        # Several orders share a timestamp so the id tiebreaker matters
+        orders = list(Order.objects.order_by('id'))
+        for index, order in enumerate(orders):
+            Order.objects.filter(pk=order.pk).update(
+                order_date=f'2025-01-0{1 + index // 3}T00:00:00+00:00',
+                total_amount=Decimal(10 * (index + 1)),
+            )
+
+    def emails(self, connection):
+        return [edge['node']['customer']['email'] for edge in connection['edges']]
+
+    def test_forward_pages_cover_every_row_once(self):
+        seen = []
+        after = None
+        while True:
+            page = self.execute(self.QUERY, {'first': 3, 'after': after})['allOrders']
+            seen.extend(self.emails(page))
+            if not page['pageInfo']['hasNextPage']:
+                break
+            after = page['pageInfo']['endCursor']
+        self.assertEqual(seen, [f"customer{i}@example.com" for i in range(7)])
+
+    def test_backward_pages(self):
+        page = self.execute(self.QUERY, {'last': 2})['allOrders']
+        self.assertEqual(self.emails(page), ['customer5@example.com', 'customer6@example.com'])
+        self.assertTrue(page['pageInfo']['hasPreviousPage'])
+        page = self.execute(self.QUERY, {'last': 2, 'before': page['pageInfo']['startCursor']})['allOrders']
+        self.assertEqual(self.emails(page), ['customer3@example.com', 'customer4@example.com'])
+
+    def test_composes_with_filterset_without_counting(self):
+        # page (joined with customers) only; keyset pages never COUNT(*)
+        with self.assertNumQueries(1):
+            page = self.execute(self.QUERY, {'first': 2, 'min': '40'})['allOrders']
+        self.assertEqual(self.emails(page), ['customer3@example.com', 'customer4@example.com'])
+        page = self.execute(self.QUERY, {'first': 5, 'min': '40', 'after': page['pageInfo']['endCursor']})['allOrders']
+        self.assertEqual(self.emails(page), ['customer5@example.com', 'customer6@example.com'])
+        self.assertFalse(page['pageInfo']['hasNextPage'])
+
+    def test_offset_cursors_are_rejected(self):
+        result = schema.execute(
+            'query { allOrders(keyset: true, first: 1, after: "YXJyYXljb25uZWN0aW9uOjA=") { edges { cursor } } }',
+            context_value=RequestFactory().post('/graphql'),
+        )
+        self.assertIn('Invalid keyset cursor', result.errors[0].message)
+
+
+class BulkCreateCustomersTests(GraphQLTestMixin, TestCase):
+    MUTATION = """
+        mutation ($input: [CustomerInput]!, $batchSize: Int, $atomic: Boolean) {
+            bulkCreateCustomers(input: $input, batchSize: $batchSize, atomic: $atomic) {
+                customers { name email }
+                errors
+            }
+        }
+    """
+
+    def rows(self, count, start=0):
+        return [{'name': f"Customer {i}", 'email': f"customer{i}@example.com"} for i in range(start, start + count)]
+
+    def test_reports_errors_per_row_in_input_order(self):
+        Customer.objects.create(name="Existing", email="customer1@example.com")
+        rows = self.rows(3) + [
+            {'name': "Bad email", 'email': "not-an-email"},
+            {'name': "Bad phone", 'email': "phone@example.com", 'phone': "12"},
+            {'name': "Repeat", 'email': "customer2@example.com"},
+        ]
+        result = self.execute(self.MUTATION, {'input': rows})['bulkCreateCustomers']
+        self.assertEqual([c['email'] for c in result['customers']],
+                         ['customer0@example.com', 'customer2@example.com'])
+        self.assertEqual(result['errors'], [
+            "Row 2: Email customer1@example.com already exists",
+            "Row 4: ['Enter a valid email address.']",
+            "Row 5: Invalid phone format for phone@example.com",
+            "Row 6: Email customer2@example.com is duplicated in row 3",
+        ])
+        self.assertEqual(Customer.objects.count(), 3)
+
+    def test_query_count_scales_with_batches_not_rows(self):
+        # per batch: one email__in lookup, then the INSERT and the daily
+        # rollup upsert in a savepoint
+        with self.assertNumQueries(5 * 3):
+            result = self.execute(self.MUTATION, {'input': self.rows(250), 'batchSize': 100})
+        self.assertEqual(len(result['bulkCreateCustomers']['customers']), 250)
+        self.assertEqual(Customer.objects.count(), 250)
+
+    def test_atomic_mode_is_all_or_nothing(self):
+        Customer.objects.create(name="Existing", email="customer3@example.com")
+        result = self.execute(self.MUTATION, {'input': self.rows(5), 'atomic': True})['bulkCreateCustomers']
+        self.assertEqual(result['customers'], [])
+        self.assertEqual(result['errors'], ["Row 4: Email customer3@example.com already exists"])
+        self.assertEqual(Customer.objects.count(), 1)
+
+        result = self.execute(self.MUTATION, {'input': self.rows(3), 'atomic': True})['bulkCreateCustomers']
+        self.assertEqual(len(result['customers']), 3)
+        self.assertEqual(result['errors'], [])
+
+
+class CreateOrderTests(GraphQLTestMixin, TestCase):
+    MUTATION = """
+        mutation ($customer: ID!, $products: [ID]!) {
+            createOrder(input: {customerId: $customer, productIds: $products}) {
+                order { totalAmount customer { email } products { edges { node { name } } } }
+            }
+        }
+    """
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        self.products = [
+            Product.objects.create(name=f"Product {i}", price=Decimal('2.50') * (i + 1))
+            for i in range(20)
+        ]
+
+    def test_large_basket_uses_constant_queries(self):
+        ids = [product.pk for product in self.products]
+        # customer + products + order INSERT + line items INSERT and a daily
+        # rollup upsert for each, in a savepoint
+        with self.assertNumQueries(8):
+            order = self.execute(self.MUTATION, {'customer': self.customer.pk, 'products': ids})['createOrder']['order']
+        self.assertEqual(order['totalAmount'], '525.00')
+        self.assertEqual(order['customer']['email'], 'alice@example.com')
+        self.assertEqual(len(order['products']['edges']), 20)
+        self.assertEqual(Order.objects.get().products.count(), 20)
+
+    def test_duplicate_product_ids_are_counted_once(self):
+        ids = [self.products[0].pk, self.products[1].pk, self.products[0].pk]
+        order = self.execute(self.MUTATION, {'customer': self.customer.pk, 'products': ids})['createOrder']['order']
+        self.assertEqual(order['totalAmount'], '7.50')
+        self.assertEqual([e['node']['name'] for e in order['products']['edges']], ['Product 0', 'Product 1'])
+
+    def test_every_missing_product_is_reported(self):
+        result = schema.execute(
+            self.MUTATION,
+            variable_values={'customer': self.customer.pk, 'products': [self.products[0].pk, 9998, 'abc', 9999]},
+            context_value=RequestFactory().post('/graphql'),
+        )
+        self.assertEqual(result.errors[0].message, "Products with IDs 9998, abc, 9999 do not exist")
+        self.assertFalse(Order.objects.exists())
+
+
+class UpdateLowStockProductsTests(GraphQLTestMixin, TestCase):
+    MUTATION = """
+        mutation ($threshold: Int, $increment: Int, $chunkSize: Int) {
+            updateLowStockProducts(threshold: $threshold, increment: $increment, chunkSize: $chunkSize) {
+                products { name stock }
+                message
+            }
+        }
+    """
+
+    def setUp(self):
+        Product.objects.bulk_create([
+            Product(name=f"Product {i}", price=Decimal('1.00'), stock=i) for i in range(30)
+        ])
+
+    def test_defaults_restock_below_ten(self):
+        # one locked SELECT and one UPDATE, in a savepoint
+        with self.assertNumQueries(4):
+            result = self.execute(self.MUTATION)['updateLowStockProducts']
+        self.assertEqual(result['message'], "Successfully updated 10 low-stock product(s)")
+        self.assertEqual([p['stock'] for p in result['products']], list(range(10, 20)))
+        self.assertEqual(Product.objects.get(name="Product 3").stock, 13)
+        self.assertEqual(Product.objects.get(name="Product 15").stock, 15)
+
+    def test_threshold_increment_and_chunking(self):
+        # three chunks of 8 (the last one short) for 20 matching products
+        with self.assertNumQueries(3 * 4):
+            result = self.execute(self.MUTATION, {'threshold': 20, 'increment': 5, 'chunkSize': 8})
+        products = result['updateLowStockProducts']['products']
+        self.assertEqual(len(products), 20)
+        self.assertEqual(products[0], {'name': 'Product 0', 'stock': 5})
+        self.assertEqual(sorted(Product.objects.values_list('stock', flat=True))[:3], [5, 6, 7])
+
+    def test_updates_only_the_locked_rows(self):
+        Product.objects.filter(name="Product 4").update(stock=50)
+        dropped = []
+
+        def drop_stock_before_update(execute, sql, params, many, context):
+            if not dropped and sql.startswith('UPDATE "crm_product"'):
+                # Another writer drops a product inside the chunk's pk range
+                dropped.append(True)
+                Product.objects.filter(name="Product 4").update(stock=1)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(drop_stock_before_update):
+            result = self.execute(self.MUTATION)['updateLowStockProducts']
+        self.assertNotIn("Product 4", [p['name'] for p in result['products']])
+        self.assertEqual(len(result['products']), 9)
+        self.assertEqual(Product.objects.get(name="Product 4").stock, 1)
+
+    def test_rejects_invalid_arguments(self):
+        for variables, message in [
+            ({'threshold': None}, "Threshold must be zero or more"),
+            ({'threshold': -1}, "Threshold must be zero or more"),
+            ({'increment': 0}, "Increment must be positive"),
+            ({'chunkSize': 0}, "Chunk size must be positive"),
+        ]:
+            with self.subTest(variables=variables):
+                result = schema.execute(self.MUTATION, variable_values=variables,
+                                        context_value=RequestFactory().post('/graphql'))
+                self.assertEqual([error.message for error in result.errors], [message])
+        self.assertEqual(Product.objects.filter(stock__lt=10).count(), 10)
+
+
+class PersistedQueryTests(TestCase):
+    QUERY = "query { hello }"
+
+    def setUp(self):
+        self.document_cache = DocumentCache(maxsize=10)
+        self.store = PersistedQueryStore(get_config())
+        self.view = csrf_exempt(CRMGraphQLView.as_view(
+            document_cache=self.document_cache, persisted_queries=self.store,
+        ))
+
+    def post(self, body, view=None):
+        request = RequestFactory().post('/graphql', json.dumps(body), content_type='application/json')
+        return json.loads((view or self.view)(request).content)
+
+    def persisted(self, sha256):
+        return {'persistedQuery': {'version': 1, 'sha256Hash': sha256}}
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_documents_are_parsed_once(self):
+        for _ in range(3):
+            self.assertEqual(self.post({'query': self.QUERY})['data'], {'hello': 'Hello World!'})
+        self.assertEqual((self.document_cache.misses, self.document_cache.hits), (1, 2))
+
+    def test_automatic_persisted_query_round_trip(self):
+        sha256 = query_hash(self.QUERY)
+        response = self.post({'extensions': self.persisted(sha256)})
+        self.assertEqual(response['errors'][0]['message'], 'PersistedQueryNotFound')
+        self.assertEqual(response['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+
+        response = self.post({'query': self.QUERY, 'extensions': self.persisted(sha256)})
+        self.assertEqual(response['data'], {'hello': 'Hello World!'})
+        response = self.post({'extensions': self.persisted(sha256)})
+        self.assertEqual(response['data'], {'hello': 'Hello World!'})
+
+    def test_hash_must_match_query(self):
+        response = self.post({'query': self.QUERY, 'extensions': self.persisted('0' * 64)})
+        self.assertEqual(response['errors'][0]['extensions']['code'], 'INVALID_PERSISTED_QUERY')
+
+    def test_allow_list_rejects_unknown_documents(self):
+        sha256 = query_hash(self.QUERY)
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as manifest:
+            json.dump({sha256: self.QUERY}, manifest)
+        self.addCleanup(os.remove, manifest.name)
+        config = dict(get_config(), ALLOW_LIST=manifest.name)
+        view = csrf_exempt(CRMGraphQLView.as_view(
+            document_cache=self.document_cache, persisted_queries=PersistedQueryStore(config),
+        ))
+
+        self.assertEqual(self.post({'extensions': self.persisted(sha256)}, view)['data'], {'hello': 'Hello World!'})
+        response = self.post({'query': "query { crmStats { totalOrders } }"}, view)
+        self.assertEqual(response['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_ALLOWED')
+
+    def test_document_cache_is_bounded(self):
+        document_cache = DocumentCache(maxsize=2)
+        graphql_schema = schema.graphql_schema
+        for query in ["{ hello }", "{ crmStats { totalOrders } }", "{ hello crmStats { totalOrders } }"]:
+            document_cache.get_or_parse(graphql_schema, query, query_hash(query))
+        self.assertEqual(len(document_cache), 2)
+        document_cache.get_or_parse(graphql_schema, "{ hello }", query_hash("{ hello }"))
+        self.assertEqual(document_cache.misses, 4)
+
+
+class ResponseCacheTests(TestCase):
+    PRODUCTS = """
+        query ($min: Decimal) {
+            allProducts(price_Gte: $min) { edges { node { name price stock } } }
+        }
+    """
+    CUSTOMERS = "query { allCustomers { edges { node { email } } } }"
+
+    def setUp(self):
+        cache.clear()
+        self.view = csrf_exempt(CRMGraphQLView.as_view(
+            response_cache=ResponseCache(dict(get_response_cache_config(), ENABLED=True)),
+        ))
+        Product.objects.create(name="Widget", price=Decimal('5.00'), stock=3)
+        Customer.objects.create(name="Alice", email="alice@example.com")
+
+    def tearDown(self):
+        cache.clear()
+
+    def post(self, query, variables=None):
+        body = json.dumps({'query': query, 'variables': variables})
+        request = RequestFactory().post('/graphql', body, content_type='application/json')
+        return json.loads(self.view(request).content)
+
+    def test_repeated_query_is_served_from_cache(self):
+        first = self.post(self.PRODUCTS, {'min': '1'})
+        with self.assertNumQueries(0):
+            # Whitespace differences normalize to the same document
+            second = self.post(' '.join(self.PRODUCTS.split()), {'min': '1'})
+        self.assertEqual(first, second)
+        with self.assertNumQueries(2):
+            self.post(self.PRODUCTS, {'min': '2'})
+        self.assertEqual(response_cache_stats(), {'hits': 1, 'misses': 2, 'hit_ratio': 1 / 3})
+
+    def test_saves_invalidate_only_documents_reading_that_model(self):
+        self.post(self.PRODUCTS)
+        self.post(self.CUSTOMERS)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.update(stock=4)
+            Product.objects.get().save()
+        with self.assertNumQueries(0):
+            self.post(self.CUSTOMERS)
+        data = self.post(self.PRODUCTS)['data']
+        self.assertEqual(data['allProducts']['edges'][0]['node']['stock'], 4)
+
+    def test_rollup_rebuild_invalidates_crm_stats(self):
+        stats = "query { crmStats { totalOrders totalRevenue } }"
+        seed_orders(1)
+        self.assertEqual(self.post(stats)['data']['crmStats']['totalRevenue'], '30.00')
+        # Not tracked by the rollups or the cache until the rebuild
+        Order.objects.update(total_amount=Decimal('45.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_crm_rollups', stdout=StringIO())
+        self.assertEqual(self.post(stats)['data']['crmStats']['totalRevenue'], '45.00')
+
+    def test_set_based_mutations_invalidate(self):
+        self.post(self.PRODUCTS)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post("mutation { updateLowStockProducts { message } }")
+        data = self.post(self.PRODUCTS)['data']
+        self.assertEqual(data['allProducts']['edges'][0]['node']['stock'], 13)
+
+        self.post(self.CUSTOMERS)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post('mutation { bulkCreateCustomers(input: [{name: "Bob", email: "bob@example.com"}]) { errors } }')
+        self.assertEqual(len(self.post(self.CUSTOMERS)['data']['allCustomers']['edges']), 2)
+
+
+class QueryCostTests(TestCase):
+    def setUp(self):
+        self.view = csrf_exempt(CRMGraphQLView.as_view())
+
+    def post(self, query, variables=None):
+        body = json.dumps({'query': query, 'variables': variables})
+        request = RequestFactory().post('/graphql', body, content_type='application/json')
+        response = self.view(request)
+        return response.status_code, json.loads(response.content)
+
+    def assertRejected(self, query, code, variables=None):
+        status, body = self.post(query, variables)
+        self.assertEqual(status, 400)
+        self.assertNotIn('data', body)
+        self.assertEqual(body['errors'][0]['extensions']['code'], code)
+        return body['errors'][0]
+
+    def test_cost_multiplies_by_page_size_and_is_reported(self):
+        status, body = self.post("""
+            query ($first: Int) {
+                allCustomers(first: $first) { edges { node { ...Orders } } }
+            }
+            fragment Orders on CustomerType { orders { edges { node { id } } } }
+        """, {'first': 10})
+        self.assertEqual(status, 200)
+        # allCustomers + 10 x orders; nested connections default to 100 rows
+        self.assertEqual(body['extensions']['cost'], {'requested': 11, 'maximum': 5000, 'depth': 7})
+
+    def test_default_page_size(self):
+        seed_orders(25, products_per_order=1)
+        status, body = self.post("query { allCustomers { edges { node { id } } } }")
+        self.assertEqual(len(body['data']['allCustomers']['edges']), 20)
+        self.assertEqual(body['extensions']['cost']['requested'], 1)
+
+    def test_page_size_over_the_maximum_is_rejected(self):
+        error = self.assertRejected(
+            "query ($n: Int) { allOrders(last: $n) { edges { node { id } } } }",
+            'PAGE_SIZE_EXCEEDED', {'n': 500},
+        )
+        self.assertEqual(error['extensions']['maxPageSize'], 100)
+
+    def test_deep_queries_are_rejected(self):
+        self.assertRejected("""
+            query { allOrders(first: 1) { edges { node { customer { orders(first: 1) { edges { node {
+                products(first: 1) { edges { node { orders(first: 1) { edges { node { id } } } } } }
+            } } } } } } } }
+        """, 'QUERY_TOO_DEEP')
+
+    def test_expensive_queries_are_rejected_before_execution(self):
+        seed_orders(1)
+        with self.assertNumQueries(0):
+            error = self.assertRejected("""
+                query { allCustomers(first: 100) { edges { node {
+                    orders(first: 100) { edges { node { products(first: 100) { edges { node { name } } } } } }
+                } } } }
+            """, 'QUERY_TOO_COMPLEX')
+        self.assertEqual(error['extensions']['cost'], 1 + 100 * (1 + 100 * 1))
+
+
+class ExplainFiltersCommandTests(TestCase):
+    def test_range_filters_use_indexes(self):
+        out = StringIO()
+        call_command('explain_filters', '--connection', 'all_products', stdout=out)
+        output = out.getvalue()
+        self.assertIn('crm_product_price_idx', output)
+        self.assertIn('crm_product_stock_idx', output)
+        self.assertNotIn('all_orders', output)
+
+    def test_fail_on_scan(self):
+        # Substring filters can't use a b-tree index
+        with self.assertRaisesMessage(CommandError, 'all_customers.name [count] scans crm_customer'):
+            call_command('explain_filters', '--connection', 'all_customers', '--fail-on-scan', stdout=StringIO())
+
+
+class SearchTests(GraphQLTestMixin, TestCase):
+    QUERY = """
+        query ($q: String) {
+            allCustomers(search: $q) { edges { node { name } } }
+        }
+    """
+
+    def setUp(self):
+        Customer.objects.create(name="Bob Jones", email="bob@alicecorp.com")
+        Customer.objects.create(name="Alice Smith", email="alice@example.com")
+        Customer.objects.create(name="Carol Alison", email="carol@example.com")
+
+    def names(self, term):
+        data = self.execute(self.QUERY, {'q': term})
+        return [edge['node']['name'] for edge in data['allCustomers']['edges']]
+
+    def test_prefix_matches_ranked_by_relevance(self):
+        # Name matches outrank email matches
+        names = self.names('ali')
+        self.assertEqual(set(names[:2]), {"Alice Smith", "Carol Alison"})
+        self.assertEqual(names[2], "Bob Jones")
+        self.assertEqual(self.names('ali smi'), ["Alice Smith"])
+        self.assertEqual(self.names('"ali" OR *'), self.names('ali OR'))
+
+    def test_index_follows_writes(self):
+        alice = Customer.objects.get(name="Alice Smith")
+        alice.name = "Alicia Keys"
+        alice.save()
+        self.assertEqual(self.names('keys'), ["Alicia Keys"])
+        self.assertEqual(self.names('smith'), [])
+        Customer.objects.bulk_create([Customer(name="Dave Keyser", email="dave@example.com")])
+        self.assertEqual(self.names('keys'), ["Alicia Keys", "Dave Keyser"])
+        alice.delete()
+        self.assertEqual(self.names('keys'), ["Dave Keyser"])
+
+    def test_orders_match_customer_and_product_text(self):
+        bob = Customer.objects.get(name="Bob Jones")
+        carol = Customer.objects.get(name="Carol Alison")
+        widget = Product.objects.create(name="Blue Widget", price=Decimal('1.00'))
+        Order.objects.create(customer=bob, total_amount=Decimal('1.00')).products.add(widget)
+        Order.objects.create(customer=carol, total_amount=Decimal('2.00'))
+        data = self.execute("""
+            query ($q: String) { allOrders(search: $q) { edges { node { customer { name } } } } }
+        """, {'q': 'widget'})
+        self.assertEqual([e['node']['customer']['name'] for e in data['allOrders']['edges']], ["Bob Jones"])
+        data = self.execute("""
+            query ($q: String) { allProducts(search: $q) { edges { node { name } } } }
+        """, {'q': 'blu'})
+        self.assertEqual(len(data['allProducts']['edges']), 1)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        seed_orders(12, products_per_order=2)
+        Order.objects.filter(pk__in=Order.objects.order_by('pk').values('pk')[:4]).update(total_amount=Decimal('99.00'))
+
+    def read_export(self, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export')
+            call_command('export_crm', *args, '--output', path, stdout=StringIO())
+            with open(path, 'rb') as export:
+                return export.read()
+
+    def test_ndjson_with_filters(self):
+        lines = self.read_export('orders', '--filter', 'total_amount__gte=50').decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 4)
+        first = Order.objects.order_by('pk').first()
+        self.assertEqual(rows[0]['id'], first.pk)
+        self.assertEqual(rows[0]['customer_email'], first.customer.email)
+        self.assertEqual(rows[0]['total_amount'], '99.00')
+        self.assertEqual(rows[0]['product_ids'], sorted(first.products.values_list('pk', flat=True)))
+
+    def test_gzipped_csv(self):
+        data = gzip.decompress(self.read_export('customers', '--format', 'csv', '--gzip'))
+        rows = list(csv.DictReader(StringIO(data.decode())))
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(rows[0]['email'], 'customer0@example.com')
+
+    def test_one_query_per_chunk(self):
+        # the order rows + one through-table query per chunk of 5
+        with self.assertNumQueries(4):
+            b''.join(stream_export('orders', chunk_size=5))
+
+    def test_invalid_filters_are_rejected(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown filter(s) for orders: colour'):
+            self.read_export('orders', '--filter', 'colour=red')
+        with self.assertRaises(CommandError):
+            self.read_export('orders', '--filter', 'order_date__gte=yesterday')
+
+    def test_streaming_view(self):
+        self.assertEqual(self.client.get('/export/orders').status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get('/export/orders', {'format': 'csv', 'total_amount__gte': '50'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(self.client.get('/export/invoices').status_code, 400)
+
+    def test_view_rejects_bad_parameters_before_streaming(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        for params in [{'chunk_size': '0'}, {'chunk_size': '-5'}, {'chunk_size': 'ten'},
+                       {'format': 'xml'}, {'gzip': 'yes'}]:
+            with self.subTest(**params):
+                response = self.client.get('/export/orders', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.streaming)
+        with self.assertRaisesMessage(ValidationError, 'chunk_size must be a positive integer'):
+            stream_export('orders', chunk_size=0)
+
+    def test_product_name_filter_exports_each_order_once(self):
+        # Both of the first order's products match
+        rows = self.read_export('orders', '--filter', 'product_name=Product 0-').decode().splitlines()
+        self.assertEqual([json.loads(row)['id'] for row in rows], [Order.objects.order_by('pk').first().pk])
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as handle:
+            handle.write(content)
+        return path
+
+    def run_command(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_crm', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_customers_are_validated_with_the_mutation_rules(self):
+        Customer.objects.create(name="Existing", email="taken@example.com")
+        path = self.write('customers.csv', "name,email,phone\n"
+                          "Alice,alice@example.com,+11234567890\n"
+                          "Bob,not-an-email,\n"
+                          "Carol,carol@example.com,12\n"
+                          "Dup,taken@example.com,\n"
+                          "Alice again,alice@example.com,\n"
+                          "Dave,dave@example.com,123-456-7890\n")
+        out, err = self.run_command('customers', path, '--batch-size', '3')
+        self.assertIn("6 rows: 2 imported, 4 rejected", out)
+        self.assertIn("Row 2: Enter a valid email address.", err)
+        self.assertIn("Row 3: Invalid phone format", err)
+        self.assertIn("Row 4: Email taken@example.com already exists", err)
+        self.assertIn("Row 5: Email alice@example.com already exists", err)
+        self.assertEqual(set(Customer.objects.values_list('email', flat=True)),
+                         {"taken@example.com", "alice@example.com", "dave@example.com"})
+
+    def test_malformed_values_reject_only_their_rows(self):
+        path = self.write('products.csv', "name,price,stock\n"
+                          "Good,2.50,3\n"
+                          "Not a number,NaN,1\n"
+                          "Endless,Infinity,1\n"
+                          "Also good,4.00,\n")
+        out, err = self.run_command('products', path)
+        self.assertIn("4 rows: 2 imported, 2 rejected", out)
+        self.assertIn("Row 2: price must be a number", err)
+        self.assertIn("Row 3: price must be a number", err)
+        self.assertEqual(sorted(Product.objects.values_list('name', flat=True)), ["Also good", "Good"])
+
+        path = self.write('customers.ndjson', "\n".join([
+            json.dumps({'name': "Alice", 'email': "alice@example.com", 'phone': "+11234567890"}),
+            json.dumps({'name': "Bob", 'email': "bob@example.com", 'phone': 5551234567}),
+            json.dumps({'name': "Carol", 'email': ["carol@example.com"]}),
+            json.dumps({'name': "Dave", 'email': "dave@example.com"}),
+        ]))
+        out, err = self.run_command('customers', path)
+        self.assertIn("4 rows: 2 imported, 2 rejected", out)
+        self.assertIn("Row 2: phone must be a string", err)
+        self.assertIn("Row 3: email must be a string", err)
+        self.assertEqual(set(Customer.objects.values_list('email', flat=True)),
+                         {"alice@example.com", "dave@example.com"})
+
+    def test_orders_with_line_items(self):
+        customer = Customer.objects.create(name="Alice", email="alice@example.com")
+        p1 = Product.objects.create(name="A", price=Decimal('2.50'))
+        p2 = Product.objects.create(name="B", price=Decimal('4.00'))
+        path = self.write('orders.ndjson', "\n".join([
+            json.dumps({'customer_email': 'alice@example.com', 'product_ids': [p1.pk, p2.pk, p1.pk],
+                        'order_date': '2024-03-01T10:00:00+00:00'}),
+            json.dumps({'customer_id': customer.pk, 'product_ids': [p2.pk], 'total_amount': '3.00'}),
+            json.dumps({'customer_email': 'nobody@example.com', 'product_ids': [p1.pk]}),
+            json.dumps({'customer_id': customer.pk, 'product_ids': [p1.pk, 999]}),
+            "{not json",
+        ]))
+        out, err = self.run_command('orders', path)
+        self.assertIn("2 imported, 3 rejected", out)
+        self.assertIn("Products with IDs 999 do not exist", err)
+        first, second = Order.objects.order_by('pk')
+        self.assertEqual(first.total_amount, Decimal('6.50'))
+        self.assertEqual(first.order_date.isoformat(), '2024-03-01T10:00:00+00:00')
+        self.assertEqual(sorted(first.products.values_list('pk', flat=True)), [p1.pk, p2.pk])
+        self.assertEqual(second.total_amount, Decimal('3.00'))
+
+    def test_interrupted_import_resumes(self):
+        lines = ["name,price,stock"] + [f"Product {i},{i + 1}.00,{i}" for i in range(10)]
+        path = self.write('products.csv', "\n".join(lines) + "\n")
+        # Stop after the first committed batch of 4
+        with open(path, newline='') as stream:
+            progress = run_import('products', read_rows(stream, 'csv'), get_checkpoint('products', path), 4)
+            next(progress)
+            progress.close()
+        self.assertEqual(Product.objects.count(), 4)
+
+        out, _ = self.run_command('products', path, '--batch-size', '4')
+        self.assertIn("Resuming", out)
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertEqual(sorted(Product.objects.values_list('stock', flat=True)), list(range(10)))
+        self.assertEqual(ImportCheckpoint.objects.get().rows_done, 10)
+
+        out, _ = self.run_command('products', path)
+        self.assertIn("Nothing to import", out)
+        self.run_command('products', path, '--restart')
+        self.assertEqual(Product.objects.count(), 20)
+
+
+class AsyncExecutionTests(GraphQLTestMixin, TestCase):
+    QUERY = """
+        query($keyset: Boolean, $first: Int, $after: String, $offset: Int) {
+            allOrders(keyset: $keyset, first: $first, after: $after, offset: $offset) {
+                pageInfo { hasNextPage endCursor }
+                edges {
+                    node {
+                        totalAmount
+                        customer { email orders { edges { node { id } } } }
+                        products { edges { node { name orders { edges { node { id } } } } } }
+                    }
+                }
+            }
+        }
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_orders(6, products_per_order=2)
+
+    # The tests are synchronous so queries are captured on the test's
+    # connection; async_to_sync runs each coroutine in its own event loop
+    def execute_async(self, query, variables=None):
+        request = AsyncRequestFactory().post('/graphql/async')
+        result = async_to_sync(schema.execute_async)(query, variable_values=variables, context_value=request)
+        self.assertIsNone(result.errors, result.errors)
+        return result.data
+
+    def test_matches_sync_execution_with_the_same_queries(self):
+        for variables in [
+            {'first': 4},
+            {'first': 2, 'offset': 3},
+            {'keyset': True, 'first': 4},
+        ]:
+            with self.subTest(**variables):
+                with CaptureQueriesContext(connection) as sync_queries:
+                    expected = self.execute(self.QUERY, variables)
+                with CaptureQueriesContext(connection) as async_queries:
+                    data = self.execute_async(self.QUERY, variables)
+                self.assertEqual(data, expected)
+                self.assertEqual(len(async_queries), len(sync_queries))
+
+    def test_keyset_pages_follow_the_cursor(self):
+        first = self.execute_async(self.QUERY, {'keyset': True, 'first': 4})
+        cursor = first['allOrders']['pageInfo']['endCursor']
+        rest = self.execute_async(self.QUERY, {'keyset': True, 'first': 4, 'after': cursor})
+        self.assertEqual(len(rest['allOrders']['edges']), 2)
+        self.assertFalse(rest['allOrders']['pageInfo']['hasNextPage'])
+
+    def test_unprimed_loads_in_one_tick_share_a_query(self):
+        loaders = CRMLoaders()
+        orders = list(Order.objects.all())
+
+        async def load_all():
+            return await asyncio.gather(*(loaders.customer.aload(order.customer_id) for order in orders))
+
+        with CaptureQueriesContext(connection) as queries:
+            customers = async_to_sync(load_all)()
+        self.assertEqual([c.pk for c in customers], [o.customer_id for o in orders])
+        self.assertEqual(len(queries), 1)
+
+    async def test_view_runs_queries_and_mutations(self):
+        view = csrf_exempt(AsyncCRMGraphQLView.as_view())
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        request = AsyncRequestFactory().post(
+            '/graphql/async', json.dumps({'query': '{ crmStats { totalOrders } }'}),
+            content_type='application/json',
+        )
+        response = await view(request)
+        body = json.loads(response.content)
+        self.assertEqual(body['data'], {'crmStats': {'totalOrders': 6}})
+        self.assertIn('cost', body['extensions'])
+
+        mutation = 'mutation { createCustomer(input: {name: "Ann", email: "ann@example.com"}) { message } }'
+        request = AsyncRequestFactory().post(
+            '/graphql/async', json.dumps({'query': mutation}), content_type='application/json',
+        )
+        body = json.loads((await view(request)).content)
+        self.assertEqual(body['data']['createCustomer']['message'], "Customer created successfully")
+        self.assertTrue(await Customer.objects.filter(email='ann@example.com').aexists())
+
+
+class GraphQLClientTests(TestCase):
+    def setUp(self):
+        self.client = LocalClient()
+
+    def test_local_query_and_mutation(self):
+        self.assertEqual(self.client.execute("query { hello }"), {'hello': 'Hello World!'})
+        Product.objects.create(name="Low", price=Decimal('1.00'), stock=2)
+        data = self.client.execute(
+            "mutation ($increment: Int) { updateLowStockProducts(increment: $increment) { products { stock } } }",
+            {'increment': 4},
+        )
+        self.assertEqual(data['updateLowStockProducts']['products'], [{'stock': 6}])
+
+    def test_errors_raise(self):
+        with self.assertRaises(GraphQLClientError) as raised:
+            self.client.execute("query { nope }")
+        self.assertIn("nope", str(raised.exception))
+        with self.assertRaises(GraphQLClientError):
+            self.client.execute("query A { hello } query B { hello }", operation_name='C')
+
+    def test_documents_are_parsed_once(self):
+        for _ in range(3):
+            self.client.execute("query { hello }")
+        self.assertEqual(len(self.client.document_cache), 1)
+
+    def test_jobs_run_in_process(self):
+        from crm.cron import update_low_stock
+        from crm.tasks import generate_crm_report
+
+        Customer.objects.create(name="Alice", email="alice@example.com")
+        Product.objects.create(name="Low", price=Decimal('1.00'), stock=2)
+        with mock.patch('crm.tasks.open', mock.mock_open(), create=True), \
+                mock.patch('crm.cron.open', mock.mock_open(), create=True):
+            report = generate_crm_report()
+            update_low_stock()
+        self.assertTrue(report.endswith("Report: 1 customers, 0 orders, $0.00 revenue."))
+        self.assertEqual(Product.objects.get().stock, 12)
+
+
+class OrderReminderTests(TestCase):
+    def setUp(self):
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+        log = tempfile.NamedTemporaryFile(suffix='.txt', delete=False)
+        log.close()
+        self.addCleanup(os.unlink, log.name)
+        self.log_file = log.name
+        self.now = datetime(2025, 3, 10, 12, tzinfo=dt_timezone.utc)
+        seed_orders(5)
+        # two orders from last month, three from this week
+        dates = ['2025-02-01', '2025-02-02', '2025-03-07', '2025-03-08', '2025-03-09']
+        for order, date in zip(Order.objects.order_by('id'), dates):
+            Order.objects.filter(pk=order.pk).update(order_date=f'{date}T09:00:00+00:00')
+
+    def send(self):
+        config = {'PAGE_SIZE': 2, 'CHUNK_SIZE': 2, 'LOG_FILE': self.log_file}
+        with override_settings(CRM_ORDER_REMINDERS=config), CaptureQueriesContext(connection) as queries:
+            count = send_order_reminders(now=self.now)
+        return count, len(queries)
+
+    def test_reminds_recent_orders_in_batches(self):
+        count, _ = self.send()
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['customer2@example.com', 'customer3@example.com', 'customer4@example.com'],
+        )
+        with open(self.log_file) as log_file:
+            log = log_file.read()
+        self.assertEqual(log.count("Order ID: "), 3)
+        self.assertIn("customer4@example.com | Date: 2025-03-09T09:00:00+00:00", log)
+        self.assertTrue(log.endswith("Total reminders: 3\n"))
+
+    def test_cost_follows_recent_orders_only(self):
+        _, queries = self.send()
+        seed_orders(20)
+        Order.objects.filter(order_date__gt=self.now).update(order_date='2024-06-01T00:00:00+00:00')
+        mail.outbox = []
+        self.assertEqual(self.send(), (3, queries))
+
+    def test_nothing_recent(self):
+        Order.objects.update(order_date='2024-01-01T00:00:00+00:00')
+        self.assertEqual(self.send()[0], 0)
+        self.assertEqual(mail.outbox, [])
+        with open(self.log_file) as log_file:
+            self.assertIn("No pending orders found in the last 7 days.", log_file.read())
+
+
+class CleanupInactiveCustomersTests(TestCase):
+    OLD = '2020-01-01T00:00:00+00:00'
+
+    def setUp(self):
+        product = Product.objects.create(name="Widget", price=Decimal('5.00'), stock=5)
+        for name, order_dates in [
+            ('lapsed', [self.OLD]),
+            ('returning', [self.OLD, None]),  # one old order and one recent
+            ('recent', [None]),
+            ('never', []),
+        ]:
+            customer = Customer.objects.create(name=name, email=f"{name}@example.com")
+            Customer.objects.filter(pk=customer.pk).update(created_at=self.OLD)
+            for order_date in order_dates:
+                order = Order.objects.create(customer=customer, total_amount=Decimal('5.00'))
+                order.products.add(product)
+                if order_date:
+                    Order.objects.filter(pk=order.pk).update(order_date=order_date)
+        for i in range(3):
+            lapsed = Customer.objects.create(name=f"lapsed{i}", email=f"lapsed{i}@example.com")
+            order = Order.objects.create(customer=lapsed, total_amount=Decimal('5.00'))
+            order.products.add(product)
+            Order.objects.filter(pk=order.pk).update(order_date=self.OLD)
+        # signed up recently and hasn't ordered yet
+        Customer.objects.create(name="new", email="new@example.com")
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('cleanup_inactive_customers', *args, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_only_customers_without_recent_orders(self):
+        output = self.run_command('--batch-size', '2')
+        self.assertIn("Deleted 5 inactive customers and 4 orders", output)
+        self.assertEqual(
+            sorted(Customer.objects.values_list('name', flat=True)), ['new', 'recent', 'returning'],
+        )
+        self.assertEqual(Order.objects.count(), 3)
+        self.assertEqual(Order.products.through.objects.count(), 3)
+
+    def test_batches_are_bounded(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.run_command('--batch-size', '2')
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE FROM "crm_customer"')]
+        # 5 customers in batches of 2
+        self.assertEqual(len(deletes), 3)
+
+    def test_each_batch_invalidates_cached_responses(self):
+        cutoff = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        with mock.patch('crm.cleanup.invalidate_models') as invalidate:
+            batches = delete_inactive_customers(cutoff, batch_size=2)
+            next(batches)
+            invalidate.assert_called_once_with(Customer, Order, Product)
+            list(batches)
+        self.assertEqual(invalidate.call_count, 3)
+
+    def test_batch_rows_are_locked_before_the_recheck(self):
+        with mock.patch('django.db.models.QuerySet.select_for_update', autospec=True,
+                        side_effect=lambda queryset: queryset) as select_for_update:
+            self.run_command('--batch-size', '2')
+        self.assertEqual(select_for_update.call_count, 3)
+        self.assertEqual(Customer.objects.count(), 3)
+
+    def test_dry_run(self):
+        output = self.run_command('--dry-run')
+        self.assertIn("Would delete 5 inactive customers and 4 orders", output)
+        self.assertEqual(Customer.objects.count(), 8)
+
+
+class GraphQLMetricsTests(TestCase):
+    QUERY = """
+        query Customers {
+            allCustomers { edges { node { email orders { edges { node { totalAmount } } } } } }
+        }
+    """
+
+    def setUp(self):
+        metrics_registry.clear()
+        self.addCleanup(metrics_registry.clear)
+        seed_orders(2)
+
+    def post(self, query):
+        return self.client.post('/graphql', json.dumps({'query': query}), content_type='application/json')
+
+    def scrape(self, **headers):
+        response = self.client.get('/metrics', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    @override_settings(GRAPHQL_METRICS={'ENABLED': True})
+    def test_records_an_operation(self):
+        response = self.post(self.QUERY)
+        self.assertEqual(response.status_code, 200)
+        samples = self.scrape()
+
+        self.assertEqual(samples['crm_graphql_request_duration_seconds_count{operation="Customers"}'], 1)
+        with self.assertNumQueries(3):
+            schema.execute(self.QUERY, context_value=RequestFactory().post('/graphql'))
+        self.assertEqual(samples['crm_graphql_sql_queries_sum{operation="Customers"}'], 3)
+        self.assertGreater(samples['crm_graphql_sql_duration_seconds_sum{operation="Customers"}'], 0)
+        self.assertEqual(
+            samples['crm_graphql_response_size_bytes_sum{operation="Customers"}'], len(response.content),
+        )
+        self.assertEqual(samples['crm_graphql_sql_queries_bucket{operation="Customers",le="+Inf"}'], 1)
+        # Root and relation fields are timed, once per request; scalars aren't
+        resolver = 'crm_graphql_resolver_duration_seconds_count{operation="Customers",field="%s"}'
+        self.assertEqual(samples[resolver % 'Query.allCustomers'], 1)
+        self.assertEqual(samples[resolver % 'CustomerType.orders'], 1)
+        self.assertNotIn(resolver % 'CustomerType.email', samples)
+
+    @override_settings(GRAPHQL_METRICS={'ENABLED': True})
+    async def test_records_async_operations(self):
+        response = await self.async_client.post(
+            '/graphql/async', json.dumps({'query': self.QUERY}), content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        samples = await sync_to_async(self.scrape)()
+        self.assertEqual(samples['crm_graphql_sql_queries_sum{operation="Customers"}'], 3)
+        self.assertEqual(
+            samples['crm_graphql_resolver_duration_seconds_count{operation="Customers",field="CustomerType.orders"}'], 1,
+        )
+
+    @override_settings(GRAPHQL_METRICS={'ENABLED': True, 'MAX_OPERATIONS': 1})
+    def test_operation_labels_are_bounded(self):
+        for query in ["query A { hello }", "query B { hello }", "{ hello }", "query A { hello }", "{ nope"]:
+            self.post(query)
+        counts = {
+            name: value for name, value in self.scrape().items()
+            if name.startswith('crm_graphql_request_duration_seconds_count')
+        }
+        self.assertEqual(counts, {
+            'crm_graphql_request_duration_seconds_count{operation="A"}': 2,
+            'crm_graphql_request_duration_seconds_count{operation="other"}': 2,
+            'crm_graphql_request_duration_seconds_count{operation="unknown"}': 1,
+        })
+
+    @override_settings(GRAPHQL_METRICS={'ENABLED': True, 'TOKEN': 'secret'})
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.scrape(HTTP_AUTHORIZATION='Bearer secret')
+
+    def test_disabled(self):
+        self.assertEqual(resolver_middleware(), [])
+        self.assertEqual(self.post(self.QUERY).status_code, 200)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(metrics_registry.render().count('\n'), 10)
+
+
+class SlowOperationTests(TestCase):
+    ORDERS = """
+        query RecentOrders($since: DateTime) {
+            allOrders(orderDate_Gte: $since, first: 5) { edges { node { totalAmount customer { email } } } }
+        }
+    """
+    CREATE = """
+        mutation CreateCustomer($input: CustomerInput!) { createCustomer(input: $input) { message } }
+    """
+
+    def setUp(self):
+        seed_orders(3)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_file = os.path.join(directory.name, 'slow.jsonl')
+        self.config = {'ENABLED': True, 'THRESHOLD_MS': 0, 'LOG_FILE': self.log_file}
+
+    def post(self, query, variables=None, **config):
+        with override_settings(GRAPHQL_SLOW_OPERATIONS=dict(self.config, **config)):
+            # The middleware is loaded with the client's handler
+            response = self.client_class().post(
+                '/graphql', json.dumps({'query': query, 'variables': variables}), content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_records_sql_and_plans_without_variable_values(self):
+        self.post(self.ORDERS, {'since': '2020-01-01T00:00:00Z'})
+        self.post(' '.join(self.ORDERS.split()), {'since': '2021-01-01T00:00:00Z'})
+        self.post(self.CREATE, {'input': {'name': "Ann", 'email': "ann@example.com", 'phone': "+15551234567"}})
+        first, second, create = read_entries(self.log_file)
+
+        self.assertEqual(first['operation'], 'RecentOrders')
+        self.assertEqual(first['variables'], ['since'])
+        # Whitespace doesn't change the fingerprint
+        self.assertEqual(first['fingerprint'], second['fingerprint'])
+        self.assertNotEqual(first['fingerprint'], create['fingerprint'])
+        self.assertEqual(first['sql_count'], len(first['sql']))
+        self.assertTrue(all(statement['sql'] for statement in first['sql']))
+        self.assertTrue(first['explain'])
+        self.assertTrue(all(explained['plan'] for explained in first['explain']))
+        self.assertLessEqual(len(first['explain']), 3)
+
+        self.assertEqual(create['variables'], ['input'])
+        with open(self.log_file) as f:
+            self.assertNotIn("ann@example.com", f.read())
+
+    def test_inline_literals_are_stripped(self):
+        query = """
+            query Find($first: Int = %d) {
+                allCustomers(email: "%s", first: $first) { edges { node { name } } }
+                allProducts(stock_Gte: %d) { edges { node { name } } }
+            }
+        """
+        self.post(query % (5, "ann@example.com", 1))
+        self.post(query % (10, "bob@example.com", 20))
+        ann, bob = read_entries(self.log_file)
+        self.assertEqual(ann['fingerprint'], bob['fingerprint'])
+        self.assertEqual(ann['document'], bob['document'])
+        self.assertIn('allCustomers(email: "", first: $first)', ann['document'])
+        self.assertIn('($first: Int = 0)', ann['document'])
+        self.assertIn('allProducts(stock_Gte: 0)', ann['document'])
+        with open(self.log_file) as f:
+            self.assertNotIn("example.com", f.read())
+
+    def test_fast_operations_are_not_logged(self):
+        self.post(self.ORDERS, THRESHOLD_MS=60000)
+        self.assertFalse(os.path.exists(self.log_file))
+
+    def test_log_rotates(self):
+        for _ in range(6):
+            self.post(self.ORDERS, MAX_BYTES=4000, BACKUP_COUNT=2)
+        self.assertTrue(os.path.exists(self.log_file + '.2'))
+        self.assertFalse(os.path.exists(self.log_file + '.3'))
+        self.assertLess(os.path.getsize(self.log_file), 4000 * 2)
+
+    def test_summary_command(self):
+        for _ in range(2):
+            self.post(self.ORDERS)
+        self.post("query { hello }")
+        out = StringIO()
+        call_command('slow_operations', '--file', self.log_file, '--plans', stdout=out)
+        lines = out.getvalue().splitlines()
+        # Ranked by measured time, so either group may come first
+        orders = next(line for line in lines[1:3] if "RecentOrders" in line)
+        self.assertEqual(orders.split()[2], '2')
+        self.assertTrue(any(line.startswith('        ') for line in lines))
+        self.assertEqual(lines[-1], "2 fingerprint(s), 3 slow request(s)")
+
+
+class QueryCountRegressionTests(GraphQLTestMixin, TestCase):
+    """
+    Every operation of the schema issues the same number of queries on a
+    small and a six times larger dataset, and no more than its budget.
+    Raising a budget should come with a reason in the review.
+    """
+
+    # Enough customers that the small run fills an offset page too
+    SIZES = (20, 120)
+
+    # connection -> (filterset, node selection, argument literal per filter)
+    CONNECTIONS = {
+        'allCustomers': (CustomerFilter, "name orders { edges { node { totalAmount products { edges { node { name } } } } } }", {
+            'name': '"Customer"',
+            'email': '"example.com"',
+            'created_at': '"2025-06-01T00:00:00Z"',
+            'phone': '"+15550000001"',
+            'created_at__gte': '"2025-03-01T00:00:00Z"',
+            'created_at__lte': '"2025-06-01T00:00:00Z"',
+            'phone_pattern': '"+1555"',
+            'search': '"Customer"',
+        }),
+        'allProducts': (ProductFilter, "name price orders { edges { node { customer { email } } } }", {
+            'name': '"Product"',
+            'price': '"2.50"',
+            'stock': '3',
+            'price__gte': '"5"',
+            'price__lte': '"40"',
+            'stock__gte': '2',
+            'stock__lte': '20',
+            'search': '"Product"',
+        }),
+        'allOrders': (OrderFilter, "totalAmount customer { email } products { edges { node { name price } } }", {
+            'total_amount': '"1.25"',
+            'order_date': '"2025-06-01T00:00:00Z"',
+            'total_amount__gte': '"10"',
+            'total_amount__lte': '"100"',
+            'order_date__gte': '"2025-03-01T00:00:00Z"',
+            'order_date__lte': '"2025-06-01T00:00:00Z"',
+            'customer_name': '"Customer"',
+            'product_name': '"Product"',
+            'product_id': '1',
+            'search': '"Product"',
+        }),
+    }
+
+    # count + page + one query per relation level; to-one relations are joined
+    CONNECTION_BUDGET = {'allCustomers': 4, 'allProducts': 3, 'allOrders': 3}
+
+    def assertConstantQueries(self, budget, run):
+        counts = []
+        for customers in self.SIZES:
+            # Each size starts from the same rows, and rows a mutation adds don't carry over
+            with transaction.atomic():
+                seed_dataset(customers)
+                with CaptureQueriesContext(connection) as queries:
+                    run()
+                counts.append(len(queries))
+                transaction.set_rollback(True)
+        self.assertEqual(counts[0], counts[1], f"query count grows with the data: {counts}")
+        self.assertLessEqual(counts[1], budget)
+
+    def connection_query(self, name, arguments=''):
+        selection = self.CONNECTIONS[name][1]
+        return f"query {{ {name}{arguments} {{ edges {{ node {{ {selection} }} }} }} }}"
+
+    def test_every_filter_has_a_case(self):
+        for name, (filterset, _, values) in self.CONNECTIONS.items():
+            self.assertEqual(set(values), set(filterset.base_filters), name)
+
+    def test_connections(self):
+        for name in self.CONNECTIONS:
+            for arguments in ['', '(first: 10, offset: 5)', '(keyset: true, first: 10)']:
+                with self.subTest(name, arguments=arguments):
+                    query = self.connection_query(name, arguments)
+
+                    def run():
+                        # An empty page would skip the relation queries
+                        self.assertTrue(self.execute(query)[name]['edges'])
+
+                    self.assertConstantQueries(self.CONNECTION_BUDGET[name], run)
+
+    def test_connection_filters(self):
+        for name, (_, _, values) in self.CONNECTIONS.items():
+            for filter_name, value in values.items():
+                with self.subTest(name, filter=filter_name):
+                    query = self.connection_query(name, f"({to_camel_case(filter_name)}: {value})")
+
+                    def run():
+                        # An empty page would skip the relation queries
+                        self.assertTrue(self.execute(query)[name]['edges'])
+
+                    self.assertConstantQueries(self.CONNECTION_BUDGET[name], run)
+
+    def test_crm_stats(self):
+        # whole days are read from the rollups; a partial first day adds
+        # aggregates over the raw orders and customers
+        for arguments, budget in [
+            ('', 1),
+            ('(groupBy: DAY)', 1),
+            ('(groupBy: MONTH, start: "2025-04-01T12:00:00Z")', 5),
+        ]:
+            with self.subTest(arguments=arguments):
+                query = f"query {{ crmStats{arguments} {{ totalCustomers totalOrders totalRevenue buckets {{ orders revenue }} }} }}"
+                self.assertConstantQueries(budget, lambda: self.execute(query))
+
+    def test_create_customer(self):
+        emails = iter(range(100))
+        mutation = 'mutation ($email: String!) { createCustomer(input: {name: "New", email: $email}) { customer { id } message } }'
+        # email check + INSERT + rollup upsert
+        self.assertConstantQueries(3, lambda: self.execute(mutation, {'email': f"new{next(emails)}@example.com"}))
+
+    def test_bulk_create_customers(self):
+        batches = iter(range(100))
+
+        def run():
+            batch = next(batches)
+            rows = [{'name': "New", 'email': f"new{batch}-{i}@example.com"} for i in range(10)]
+            result = self.execute(BulkCreateCustomersTests.MUTATION, {'input': rows})
+            self.assertEqual(result['bulkCreateCustomers']['errors'], [])
+
+        # one batch: see BulkCreateCustomersTests
+        self.assertConstantQueries(5, run)
+
+    def test_create_product(self):
+        mutation = 'mutation { createProduct(input: {name: "New", price: "9.99", stock: 3}) { product { id name } } }'
+        self.assertConstantQueries(1, lambda: self.execute(mutation))
+
+    def test_create_order(self):
+        seed_dataset(1)
+        variables = {
+            'customer': Customer.objects.get().pk,
+            'products': list(Product.objects.values_list('pk', flat=True)[:2]),
+        }
+        self.assertConstantQueries(8, lambda: self.execute(CreateOrderTests.MUTATION, variables))
+
+    def test_update_low_stock_products(self):
+        self.assertConstantQueries(4, lambda: self.execute(UpdateLowStockProductsTests.MUTATION))
+
+
+class SeedCrmTests(TestCase):
+    END = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+    def seed(self, *args):
+        out = StringIO()
+        call_command('seed_crm', '--customers', '40', '--products', '15', '--orders', '300',
+                     '--end', '2025-01-01', '--days', '90', '--batch-size', '64', *args, stdout=out)
+        return out.getvalue()
+
+    def snapshot(self):
+        return (
+            list(Customer.objects.order_by('pk').values_list('pk', 'email', 'phone', 'created_at')),
+            list(Product.objects.order_by('pk').values_list('pk', 'price', 'stock')),
+            list(Order.objects.order_by('pk').values_list('pk', 'customer_id', 'total_amount', 'order_date')),
+            list(Order.products.through.objects.order_by('order_id', 'product_id').values_list('order_id', 'product_id')),
+        )
+
+    def test_same_seed_same_rows(self):
+        output = self.seed('--seed', '7')
+        self.assertIn("40 customers, 15 products, 300 orders", output)
+        first = self.snapshot()
+        Customer.objects.all().delete()
+        Product.objects.all().delete()
+        self.seed('--seed', '7')
+        self.assertEqual(self.snapshot(), first)
+        Customer.objects.all().delete()
+        self.seed('--seed', '8')
+        self.assertNotEqual(self.snapshot()[2], first[2])
+
+    def test_orders_are_consistent(self):
+        self.seed('--max-basket', '4')
+        start = self.END - timedelta(days=90)
+        orders = Order.objects.select_related('customer').prefetch_related('products')
+        self.assertEqual(len(orders), 300)
+        for order in orders:
+            prices = [product.price for product in order.products.all()]
+            self.assertTrue(1 <= len(prices) <= 4)
+            self.assertEqual(order.total_amount, sum(prices))
+            self.assertTrue(start <= order.customer.created_at <= order.order_date <= self.END)
+        # Sizes vary with a mean near --basket-mean
+        sizes = [len(order.products.all()) for order in orders]
+        self.assertGreater(len(set(sizes)), 1)
+        self.assertAlmostEqual(sum(sizes) / len(sizes), 2.5, delta=0.5)
+
+    def test_adds_to_existing_data_and_keeps_rollups_current(self):
+        seed_orders(2)
+        self.seed()
+        self.seed('--seed', '1', '--customers', '0', '--products', '0')
+        self.assertEqual(Order.objects.count(), 602)
+        incremental = rollup_snapshot()
+        rebuild_rollups()
+        self.assertEqual(incremental, rollup_snapshot())
+
+    def test_rows_created_after_seeding_get_new_ids(self):
+        self.seed()
+        customer = Customer.objects.create(name="Later", email="later@example.com")
+        product = Product.objects.create(name="Later", price=Decimal('1.00'), stock=1)
+        order = Order.objects.create(customer=customer, total_amount=Decimal('1.00'))
+        order.products.add(product)
+        self.assertEqual(customer.pk, 41)
+        self.assertEqual(product.pk, 16)
+        self.assertEqual(order.pk, 301)
+
+    def test_sequences_are_reset(self):
+        with mock.patch.object(connection.ops, 'sequence_reset_sql', return_value=[]) as reset:
+            self.seed()
+        reset.assert_called_once()
+        self.assertEqual(set(reset.call_args.args[1]), {Customer, Product, Order})
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(CommandError):
+            call_command('seed_crm', '--orders', '1', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_crm', '--end', 'tomorrow', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('seed_crm', '--price-median', 'cheap', stdout=StringIO())
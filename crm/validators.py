@@ -0,0 +1,43 @@
+# crm/validators.py
+
+"""
+Field rules shared by the GraphQL mutations and ``manage.py import_crm``.
+
+Each ``validate_*`` function raises ``django.core.exceptions.ValidationError``
+with the message the mutations report to clients.
+"""
+
+import re
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.validators import EmailValidator
+
+PHONE_PATTERN = re.compile(r'^(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}$')
+PHONE_MESSAGE = "Invalid phone format. Use formats like +1234567890 or 123-456-7890"
+
+email_validator = EmailValidator()
+
+
+def validate_email(value):
+    email_validator(value)
+
+
+def is_valid_phone(value):
+    return isinstance(value, str) and bool(PHONE_PATTERN.match(value))
+
+
+def validate_phone(value):
+    """Empty phone numbers are allowed; anything else must match ``PHONE_PATTERN``."""
+    if value and not is_valid_phone(value):
+        raise ValidationError(PHONE_MESSAGE)
+
+
+def validate_price(value):
+    if value is None or not Decimal(value).is_finite() or Decimal(value) <= 0:
+        raise ValidationError("Price must be positive")
+
+
+def validate_stock(value):
+    if value is not None and value < 0:
+        raise ValidationError("Stock cannot be negative")
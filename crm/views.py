@@ -1,3 +1,393 @@
-from django.shortcuts import render
+import inspect
+from dataclasses import dataclass
+from typing import Any, Optional
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBadRequest
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    DocumentNode,
+    ExecutionResult,
+    GraphQLError,
+    OperationDefinitionNode,
+    OperationType,
+    execute,
+    get_operation_ast,
+    validate_schema,
+)
+
+from .export import DEFAULT_CHUNK_SIZE, FORMATS, stream_export
+from .metrics import resolver_middleware, set_operation
+from .persisted_queries import (
+    DocumentCache,
+    PersistedQueryError,
+    PersistedQueryStore,
+    get_config,
+    resolve_query,
+)
+from .query_cost import QueryCostError, analyze
+from .query_cost import get_config as get_cost_config
+from .response_cache import ResponseCache
+from .slow_operations import capture_operation
+from .response_cache import get_config as get_response_cache_config
+
+
+@dataclass
+class PreparedOperation:
+    """A parsed, validated and costed operation that still has to run."""
+    document: DocumentNode
+    operation_ast: Optional[OperationDefinitionNode]
+    variables: Any
+    operation_name: Optional[str]
+    extensions: dict
+    cache_key: Optional[str] = None
+
+
+class CRMGraphQLView(GraphQLView):
+    """
+    GraphQLView with persisted-query support, a parsed-document cache, static
+    cost limits and an opt-in response cache for queries.
+
+    See ``crm.persisted_queries``, ``crm.query_cost`` and ``crm.response_cache``
+    for the protocols and settings. Execution itself matches graphene-django's
+    view, except that the operation's cost is reported under
+    ``extensions.cost``. Requests are labelled with their operation for
+    ``crm.metrics`` and ``crm.slow_operations``.
+    """
+
+    document_cache = None
+    persisted_queries = None
+    response_cache = None
+
+    def __init__(self, *args, document_cache=None, persisted_queries=None,
+                 response_cache=None, cost_config=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cost_config = cost_config or get_cost_config()
+        # Unless given explicitly, both are shared by every request this
+        # process serves
+        cls = type(self)
+        if cls.document_cache is None:
+            cls.document_cache = DocumentCache(get_config()['CACHE_SIZE'])
+        if cls.persisted_queries is None:
+            cls.persisted_queries = PersistedQueryStore(get_config())
+        if cls.response_cache is None:
+            cls.response_cache = ResponseCache(get_response_cache_config())
+        if document_cache is not None:
+            self.document_cache = document_cache
+        if persisted_queries is not None:
+            self.persisted_queries = persisted_queries
+        if response_cache is not None:
+            self.response_cache = response_cache
+
+    def get_middleware(self, request):
+        # Resolver timings are only wrapped in while crm.metrics is recording
+        return list(self.middleware or []) + resolver_middleware()
+
+    def get_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        return self.encode_response(request, execution_result, id, show_graphiql)
+
+    def encode_response(self, request, execution_result, id=None, show_graphiql=False):
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response["errors"] = [
+                    self.format_error(e) for e in execution_result.errors
+                ]
+
+            if execution_result.errors and any(
+                not getattr(e, "path", None) for e in execution_result.errors
+            ):
+                status_code = 400
+            else:
+                response["data"] = execution_result.data
+
+            if execution_result.extensions:
+                response["extensions"] = execution_result.extensions
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        prepared = self.prepare_request(request, data, query, variables, operation_name, show_graphiql)
+        if not isinstance(prepared, PreparedOperation):
+            return prepared
+        return self.execute_prepared(request, prepared)
+
+    def prepare_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        """
+        Resolve, parse, validate and cost the operation and look it up in the
+        response cache. Returns a ``PreparedOperation`` to execute, or the
+        ``ExecutionResult`` (or ``None``) to respond with right away.
+        """
+        if 'extensions' not in data and 'extensions' in request.GET:
+            data = {'extensions': request.GET['extensions']}
+        try:
+            query, sha256 = resolve_query(self.persisted_queries, data, query)
+        except PersistedQueryError as e:
+            return ExecutionResult(data=None, errors=[e])
+
+        if not query:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest("Must provide query string."))
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        try:
+            document, validation_errors = self.document_cache.get_or_parse(
+                schema, query, sha256, self.validation_rules,
+                graphene_settings.MAX_VALIDATION_ERRORS,
+            )
+        except GraphQLError as e:
+            return ExecutionResult(errors=[e])
+
+        operation_ast = get_operation_ast(document, operation_name)
+        set_operation(operation_ast)
+        capture_operation(query, variables, operation_ast)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+
+        try:
+            cost = analyze(schema, document, operation_ast, variables, self.cost_config)
+        except QueryCostError as e:
+            return ExecutionResult(data=None, errors=[e])
+        extensions = {'cost': {
+            'requested': cost.cost,
+            'maximum': self.cost_config['MAX_COST'],
+            'depth': cost.depth,
+        }}
+
+        cache_key = None
+        if self.response_cache.cacheable(operation_ast):
+            cache_key = self.response_cache.key_for(schema, query, variables, operation_name)
+            data = self.response_cache.get(cache_key)
+            if data is not None:
+                return ExecutionResult(data=data, extensions=extensions)
+
+        return PreparedOperation(
+            document=document,
+            operation_ast=operation_ast,
+            variables=variables,
+            operation_name=operation_name,
+            extensions=extensions,
+            cache_key=cache_key,
+        )
+
+    def execute_options(self, request, prepared):
+        execute_options = {
+            "root_value": self.get_root_value(request),
+            "context_value": self.get_context(request),
+            "variable_values": prepared.variables,
+            "operation_name": prepared.operation_name,
+            "middleware": self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            execute_options["execution_context_class"] = self.execution_context_class
+        return execute_options
+
+    def execute_prepared(self, request, prepared):
+        schema = self.schema.graphql_schema
+        operation_ast = prepared.operation_ast
+        try:
+            execute_options = self.execute_options(request, prepared)
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, prepared.document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                result.extensions = prepared.extensions
+                return result
+
+            result = execute(schema, prepared.document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        if prepared.cache_key is not None and not result.errors:
+            self.response_cache.set(prepared.cache_key, result.data)
+        result.extensions = prepared.extensions
+        return result
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """
+    ``CRMGraphQLView`` executing queries with async resolvers, for the ASGI
+    application (``alx_backend_graphql_crm.asgi``).
+
+    Connections are counted and paged with the async ORM and relations are
+    batched per event-loop tick by the DataLoaders, so a request waiting on
+    the database doesn't hold a thread. Parsing, validation, costing and the
+    response cache run in one worker-thread hop before execution. Mutations
+    run the synchronous path in a worker thread, so their transactions and
+    ``ATOMIC_MUTATIONS`` behave exactly as in ``CRMGraphQLView``.
+    """
+
+    view_is_async = True
+
+    @method_decorator(ensure_csrf_cookie)
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            show_graphiql = self.graphiql and self.can_display_graphiql(request, data)
+            if show_graphiql:
+                # GraphiQL is a static page; render it with the sync view
+                return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+            if self.batch:
+                responses = [await self.aget_response(request, entry) for entry in data]
+                result = "[{}]".format(
+                    ",".join([response[0] for response in responses])
+                )
+                status_code = (
+                    responses
+                    and max(responses, key=lambda response: response[1])[1]
+                    or 200
+                )
+            else:
+                result, status_code = await self.aget_response(request, data, show_graphiql)
+
+            return HttpResponse(
+                status=status_code, content=result, content_type="application/json"
+            )
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(
+                request, {"errors": [self.format_error(e)]}
+            )
+            return response
+
+    async def aget_response(self, request, data, show_graphiql=False):
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        prepared = await sync_to_async(self.prepare_request)(
+            request, data, query, variables, operation_name, show_graphiql
+        )
+        if isinstance(prepared, PreparedOperation):
+            if prepared.operation_ast is not None and prepared.operation_ast.operation != OperationType.QUERY:
+                execution_result = await sync_to_async(self.execute_prepared)(request, prepared)
+            else:
+                execution_result = await self.aexecute_prepared(request, prepared)
+        else:
+            execution_result = prepared
+        return self.encode_response(request, execution_result, id, show_graphiql)
+
+    async def aexecute_prepared(self, request, prepared):
+        try:
+            result = execute(
+                self.schema.graphql_schema, prepared.document, **self.execute_options(request, prepared)
+            )
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        if prepared.cache_key is not None and not result.errors:
+            await sync_to_async(self.response_cache.set)(prepared.cache_key, result.data)
+        result.extensions = prepared.extensions
+        return result
+
+
+@require_GET
+@staff_member_required
+def export_view(request, kind):
+    """
+    Stream ``kind`` (customers, products or orders) as NDJSON or CSV.
+
+    ``format``, ``gzip`` and ``chunk_size`` are read from the query string;
+    every other parameter is a filter argument of the kind's filterset, e.g.
+    ``/export/orders?format=csv&gzip=1&order_date__gte=2025-01-01``.
+    """
+    params = request.GET.dict()
+    fmt = params.pop('format', 'ndjson')
+    gzip = params.pop('gzip', '')
+    try:
+        chunk_size = int(params.pop('chunk_size', DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        chunk_size = 0
+    if fmt not in FORMATS:
+        return JsonResponse({'errors': [f"Unknown format {fmt!r}; choose from {', '.join(FORMATS)}"]}, status=400)
+    if gzip not in ('', '0', '1', 'false', 'true'):
+        return JsonResponse({'errors': ["gzip must be 1, 0, true or false"]}, status=400)
+    if chunk_size < 1:
+        return JsonResponse({'errors': ["chunk_size must be a positive integer"]}, status=400)
+    compress = gzip in ('1', 'true')
+    try:
+        blocks = stream_export(kind, params, fmt, chunk_size=chunk_size, compress=compress)
+    except ValidationError as e:
+        return JsonResponse({'errors': e.messages}, status=400)
+
+    response = StreamingHttpResponse(blocks, content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    return response